@@ -0,0 +1,133 @@
+"""
+Micro-benchmark de la conversión DataFrame -> Documents de ``Unstructured_UF_Loader``.
+
+Compara la implementación fila a fila anterior (dos ``DataFrame.apply(axis=1)``) con la conversión
+columnar actual, en modo completo y en modo perezoso, y comprueba que generan los mismos Documents.
+
+Uso (desde ``src/Ingestion``)::
+
+    python -m benchmarks.bench_df_to_documents --elements 100000
+"""
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import pandas as pd
+from llama_index.core import Document
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo
+from pandas import DataFrame
+
+from lib.DirectoryLoader import Unstructured_UF_Loader
+
+_BLOCK_TYPES = ['Title', 'NarrativeText', 'ListItem', 'FigureCaption', 'UncategorizedText']
+_WORDS = 'retrieval augmented generation dense passage index query answer knowledge model'.split()
+
+
+def make_elements(elements: int, seed: int = 0) -> DataFrame:
+    """DataFrame de elementos con el esquema de ``convert_to_dataframe`` y el título ya asignado."""
+    rng = random.Random(seed)
+    return DataFrame({
+        'text': [' '.join(rng.choices(_WORDS, k=rng.randint(5, 60))) for _ in range(elements)],
+        'type': rng.choices(_BLOCK_TYPES, k=elements),
+        'filetype': 'application/pdf',
+        'languages': [['eng'] for _ in range(elements)],
+        'page_number': [i // 50 + 1 for i in range(elements)],
+        'filename': 'benchmark.pdf',
+        'title': 'benchmark',
+        'image_path': None,
+    })
+
+
+def rowwise_df_to_documents(df: DataFrame) -> List[Document]:
+    """Implementación fila a fila previa, como referencia."""
+    df['node_id'] = df.apply(lambda row: f"{row.name}_{row['title']}", axis=1)
+    df['previous_node_id'] = df['node_id'].shift(1)
+    df['next_node_id'] = df['node_id'].shift(-1)
+    df['block_hash'] = [
+        Unstructured_UF_Loader._block_hash(block_type, text, image_path)
+        for block_type, text, image_path in zip(df['type'], df['text'], df['image_path'])
+    ]
+    df['block_occurrence'] = df.groupby('block_hash').cumcount()
+
+    def create_document(row):
+        document = Document(
+            id_=row['node_id'],
+            text=row['text'],
+            metadata={
+                'block_type': row['type'],
+                'file_type': row['filetype'],
+                'languages': row['languages'],
+                'page_number': row['page_number'],
+                'file_name': row['filename'],
+                'title_of_the_document': row['title'],
+                'image_path': row['image_path'],
+                'block_hash': row['block_hash'],
+                'block_occurrence': row['block_occurrence'],
+                'source_id': row['title']
+            },
+            excluded_llm_metadata_keys=['block_hash', 'block_occurrence', 'source_id'],
+            excluded_embed_metadata_keys=['block_hash', 'block_occurrence', 'source_id']
+        )
+        if pd.notna(row['previous_node_id']):
+            document.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=row['previous_node_id'])
+        if pd.notna(row['next_node_id']):
+            document.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=row['next_node_id'])
+        return document
+
+    return df.apply(create_document, axis=1).tolist()
+
+
+def _measure(function: Callable[[], int]) -> Tuple[float, float, int]:
+    """Devuelve los segundos, el pico de memoria en MB y el resultado de la función."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def _same_documents(expected: List[Document], actual: List[Document]) -> bool:
+    return len(expected) == len(actual) and all(
+        a.id_ == b.id_ and a.text == b.text and a.metadata == b.metadata
+        and {k: v.node_id for k, v in a.relationships.items()} == {k: v.node_id for k, v in b.relationships.items()}
+        for a, b in zip(expected, actual)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--elements', type=int, default=100_000, help='Número de elementos del DataFrame')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = make_elements(args.elements, args.seed)
+    with tempfile.TemporaryDirectory() as image_dir:
+        loader = Unstructured_UF_Loader(image_path_output=image_dir)
+
+        # Las métricas de memoria se toman sin conservar los Documents para comparar el pico de cada modo
+        runs = [
+            ('rowwise', lambda: len(rowwise_df_to_documents(df.copy()))),
+            ('columnar', lambda: len(loader._df_to_documents(df.copy()))),
+            ('columnar lazy', lambda: sum(1 for _ in loader._df_to_documents(df.copy(), lazy=True))),
+        ]
+        print(f"{'mode':<14} {'elements':>9} {'seconds':>9} {'elements/s':>11} {'peak MB':>9}")
+        for name, function in runs:
+            elapsed, peak, count = _measure(function)
+            print(f"{name:<14} {count:>9} {elapsed:>9.2f} {count / elapsed:>11.0f} {peak:>9.1f}")
+
+        start = time.perf_counter()
+        next(iter(loader._df_to_documents(df.copy(), lazy=True)))
+        print(f"primer Document en modo perezoso: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        sample = df.head(1000)
+        same = _same_documents(rowwise_df_to_documents(sample.copy()), loader._df_to_documents(sample.copy()))
+        print(f"mismos Documents que la implementación fila a fila: {'sí' if same else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+"""
+Benchmark de rendimiento de la ingestión completa: particionado (o documentos sintéticos) y las
+mismas transformaciones que ``main.py``, con un LLM y un modelo de embeddings falsos.
+
+Informa documentos/segundo, páginas/segundo, latencia p50/p95 de cada etapa, pico de memoria (RSS)
+y número de llamadas al LLM y al modelo de embeddings.
+
+Uso (desde ``src/Ingestion``)::
+
+    python -m benchmarks.bench_ingestion --pdf-directory ../../unstructured/project/papers --synthetic-docs 20
+    python -m benchmarks.bench_ingestion --synthetic-docs 50 --llm-latency 0.2 --llm-error-rate 0.01 --output out.json
+    python -m benchmarks.bench_ingestion --synthetic-docs 50 --llm-latency 0.2 --async --async-concurrency 256
+    python -m benchmarks.bench_ingestion --synthetic-docs 50 --llm-latency 0.2 --table-quality 0.8
+
+Con ``--async`` los documentos se transforman a la vez en un único bucle de eventos mediante ``acall``
+(las etapas sin versión asíncrona propia se ejecutan en un hilo aparte).
+
+No requiere credenciales de GCP ni ``Config``: los backends falsos son deterministas y sus latencias
+y tasas de error se configuran por línea de comandos.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core import Document
+from pandas import DataFrame
+
+from lib.DirectoryLoader import Unstructured_UF_Loader
+from lib.Pipeline import build_transformations
+from lib.library_custom.llama_index.ingestion import acall_transformation
+
+from .fakes import FakeEmbedding, FakeLLM
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+LOAD_STAGE = '00_load'
+
+_SYNTHETIC_BLOCKS = (
+    ('Title', 0.10),
+    ('NarrativeText', 0.60),
+    ('ListItem', 0.10),
+    ('FigureCaption', 0.05),
+    ('UncategorizedText', 0.05),
+    ('Table', 0.05),
+    ('Image', 0.05),
+)
+
+_WORDS = (
+    'retrieval augmented generation model documents index query answer knowledge passage '
+    'language dense vector training evaluation dataset results table figure method section'
+).split()
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso en MB, o ``None`` si la plataforma no lo permite."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo devuelve en KB y macOS en bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    values = np.asarray(samples, dtype=float)
+    return {
+        'count': int(values.size),
+        'total': float(values.sum()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+    }
+
+
+def _count_pages(documents: List[Document]) -> int:
+    """Cuenta las páginas distintas por archivo presentes en los Documents."""
+    return len({(doc.metadata.get('file_name'), doc.metadata.get('page_number')) for doc in documents})
+
+
+def _synthetic_table(rng: random.Random) -> Tuple[str, str]:
+    """
+    Texto OCR y ``text_as_html`` de una tabla sintética. Una de cada cuatro tiene filas con celdas
+    perdidas, como las tablas cuya estructura el particionado no infiere bien.
+    """
+    columns = rng.randint(2, 5)
+    rows = [rng.choices(_WORDS, k=columns) for _ in range(rng.randint(3, 8))]
+    text = ' '.join(' '.join(row) for row in rows)
+    broken = rng.random() < 0.25
+    html_rows = []
+    for index, row in enumerate(rows):
+        cells = row[:rng.randint(1, columns)] if broken and index else row
+        tag = 'th' if index == 0 else 'td'
+        html_rows.append('<tr>' + ''.join(f'<{tag}>{cell}</{tag}>' for cell in cells) + '</tr>')
+    return text, '<table>' + ''.join(html_rows) + '</table>'
+
+
+def make_synthetic_dataframe(title: str,
+                             pages: int,
+                             blocks_per_page: int,
+                             image_dir: str,
+                             rng: random.Random) -> DataFrame:
+    """
+    Genera un DataFrame con el mismo esquema que ``convert_to_dataframe`` de unstructured.
+    Los bloques Image y Table apuntan a recortes con bytes aleatorios para que se hasheen y se transcriban;
+    los Table llevan además el ``text_as_html`` que infiere hi_res.
+
+    :param title:
+    :param pages:
+    :param blocks_per_page:
+    :param image_dir:
+    :param rng:
+    :return:
+    """
+    block_types = [block_type for block_type, _ in _SYNTHETIC_BLOCKS]
+    weights = [weight for _, weight in _SYNTHETIC_BLOCKS]
+    rows = []
+    for page_number in range(1, pages + 1):
+        for block_number, block_type in enumerate(rng.choices(block_types, weights, k=blocks_per_page)):
+            words = rng.randint(3, 8) if block_type in ('Title', 'FigureCaption') else rng.randint(20, 120)
+            text = ' '.join(rng.choices(_WORDS, k=words))
+            # Pies de figura y encabezados numerados como los de un artículo, para el pre-clasificador de reglas
+            if block_type == 'FigureCaption':
+                text = f'Figure {block_number + 1}: {text}'
+            elif block_type == 'Title':
+                text = f'{page_number}.{block_number + 1} {text.capitalize()}'
+            table_html = None
+            if block_type == 'Table':
+                text, table_html = _synthetic_table(rng)
+            image_path = None
+            if block_type in ('Table', 'Image'):
+                image_path = os.path.join(image_dir, f'{title}-p{page_number}-b{block_number}.png')
+                with open(image_path, 'wb') as image_file:
+                    image_file.write(rng.randbytes(2048))
+            rows.append({
+                'text': text,
+                'type': block_type,
+                'filetype': 'application/pdf',
+                'languages': ['eng'],
+                'page_number': page_number,
+                'filename': f'{title}.pdf',
+                'image_path': image_path,
+                'text_as_html': table_html,
+            })
+    return DataFrame(rows)
+
+
+def _write_metadata(meta_dir: str, title: str):
+    """Escribe el JSON de metadata que ``DictionaryToMetadata`` espera para cada documento."""
+    with open(os.path.join(meta_dir, f'{title}.json'), 'w') as meta_file:
+        json.dump({'author': 'benchmark', 'category': 'synthetic', 'year': 2024}, meta_file)
+
+
+def _run_transformations(transformations, documents: List[Document], stage_times: Dict[str, List[float]]):
+    """Aplica las transformaciones en orden midiendo el tiempo de cada etapa."""
+    nodes = documents
+    for index, transformation in enumerate(transformations, start=1):
+        start = time.perf_counter()
+        nodes = transformation(nodes)
+        stage_times[f'{index:02d}_{type(transformation).__name__}'].append(time.perf_counter() - start)
+    return nodes
+
+
+async def _arun_transformations(transformations, documents: List[Document], stage_times: Dict[str, List[float]]):
+    """Versión asíncrona de ``_run_transformations``, como la ejecuta ``CheckpointedIngestionPipeline.arun``."""
+    nodes = documents
+    for index, transformation in enumerate(transformations, start=1):
+        start = time.perf_counter()
+        nodes = await acall_transformation(transformation, nodes)
+        stage_times[f'{index:02d}_{type(transformation).__name__}'].append(time.perf_counter() - start)
+    return nodes
+
+
+async def _arun_documents(transformations, loaded: List[Tuple[str, List[Document]]],
+                          stage_times: Dict[str, List[float]]) -> List[Optional[list]]:
+    """Transforma todos los documentos a la vez; ``None`` para los que fallan."""
+    async def run_one(title: str, documents: List[Document]) -> Optional[list]:
+        try:
+            return await _arun_transformations(transformations, documents, stage_times)
+        except Exception as e:
+            logger.error(f'Error procesando {title}: {e}')
+            return None
+
+    return await asyncio.gather(*(run_one(title, documents) for title, documents in loaded))
+
+
+def run_benchmark(pdf_files: List[str],
+                  synthetic_docs: int,
+                  pages_per_doc: int,
+                  blocks_per_page: int,
+                  llm: FakeLLM,
+                  embed_model: FakeEmbedding,
+                  seed: int = 0,
+                  batch_size: int = 1,
+                  rule_confidence: Optional[float] = None,
+                  table_quality: Optional[float] = None,
+                  use_async: bool = False,
+                  async_concurrency: int = 64) -> dict:
+    """
+    Ejecuta el loader y las transformaciones sobre cada documento y devuelve las métricas.
+
+    :param pdf_files: PDFs reales a particionar (requiere unstructured).
+    :param synthetic_docs: Número de documentos sintéticos.
+    :param pages_per_doc: Páginas de cada documento sintético.
+    :param blocks_per_page: Bloques por página de los documentos sintéticos.
+    :param llm:
+    :param embed_model:
+    :param seed:
+    :param batch_size: Bloques de texto clasificados por petición al LLM (1 desactiva los lotes).
+    :param rule_confidence: Confianza mínima del pre-clasificador de reglas (``None`` lo desactiva).
+    :param table_quality: Calidad mínima de una tabla convertida desde su HTML para no transcribirla (``None`` lo desactiva).
+    :param use_async: Carga todos los documentos y los transforma a la vez con ``acall``.
+    :param async_concurrency: Peticiones al LLM en vuelo en la ruta asíncrona.
+    :return:
+    """
+    rng = random.Random(seed)
+    stage_times: Dict[str, List[float]] = defaultdict(list)
+    documents_ok = 0
+    documents_failed = 0
+    pages = 0
+    nodes_out = 0
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        image_dir = os.path.join(work_dir, 'images')
+        meta_dir = os.path.join(work_dir, 'meta')
+        os.makedirs(image_dir)
+        os.makedirs(meta_dir)
+
+        loader = Unstructured_UF_Loader(image_path_output=image_dir)
+        transformations = build_transformations(
+            gcp_model=llm, embed_model=embed_model, meta_folder_path=meta_dir, batch_size=batch_size,
+            rule_confidence=rule_confidence, table_quality_threshold=table_quality, async_concurrency=async_concurrency
+        )
+
+        jobs: List[Tuple[str, Optional[str]]] = [(os.path.splitext(os.path.basename(f))[0], f) for f in pdf_files]
+        jobs += [(f'synthetic-{i:04d}', None) for i in range(synthetic_docs)]
+
+        start = time.perf_counter()
+        loaded: List[Tuple[str, List[Document]]] = []
+        for title, file_path in jobs:
+            _write_metadata(meta_dir, title)
+            try:
+                load_start = time.perf_counter()
+                if file_path is not None:
+                    documents = loader.load_from(files=[file_path])
+                else:
+                    df = make_synthetic_dataframe(title, pages_per_doc, blocks_per_page, image_dir, rng)
+                    documents = loader._dataframe_to_documents(f'{title}.pdf', df)
+                stage_times[LOAD_STAGE].append(time.perf_counter() - load_start)
+
+                if use_async:
+                    loaded.append((title, documents))
+                    continue
+                nodes = _run_transformations(transformations, documents, stage_times)
+            except Exception as e:
+                documents_failed += 1
+                logger.error(f'Error procesando {title}: {e}')
+                continue
+            documents_ok += 1
+            pages += _count_pages(documents)
+            nodes_out += len(nodes)
+        if loaded:
+            results = asyncio.run(_arun_documents(transformations, loaded, stage_times))
+            for (_, documents), nodes in zip(loaded, results):
+                if nodes is None:
+                    documents_failed += 1
+                    continue
+                documents_ok += 1
+                pages += _count_pages(documents)
+                nodes_out += len(nodes)
+        elapsed = time.perf_counter() - start
+        loader.close()
+
+    return {
+        'documents': documents_ok,
+        'documents_failed': documents_failed,
+        'pages': pages,
+        'nodes': nodes_out,
+        'seconds': elapsed,
+        'documents_per_second': documents_ok / elapsed if elapsed else 0.0,
+        'pages_per_second': pages / elapsed if elapsed else 0.0,
+        'stages': {stage: _percentiles(samples) for stage, samples in sorted(stage_times.items())},
+        'peak_rss_mb': _peak_rss_mb(),
+        'llm': llm.stats,
+        'embedding': embed_model.stats,
+    }
+
+
+def _print_report(result: dict):
+    print(f"documentos: {result['documents']} (fallidos: {result['documents_failed']})  "
+          f"páginas: {result['pages']}  nodos: {result['nodes']}  tiempo: {result['seconds']:.2f} s")
+    print(f"docs/s: {result['documents_per_second']:.3f}  páginas/s: {result['pages_per_second']:.3f}  "
+          f"pico RSS: {result['peak_rss_mb'] or float('nan'):.1f} MB")
+    print(f"LLM: {result['llm']}  embeddings: {result['embedding']}")
+    print(f"{'etapa':<48} {'n':>5} {'p50 (s)':>9} {'p95 (s)':>9} {'total (s)':>10}")
+    for stage, stats in result['stages'].items():
+        print(f"{stage:<48} {stats['count']:>5} {stats['p50']:>9.4f} {stats['p95']:>9.4f} {stats['total']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pdf-directory', help='Directorio con PDFs reales (requiere unstructured)')
+    parser.add_argument('--synthetic-docs', type=int, default=10, help='Número de documentos sintéticos')
+    parser.add_argument('--pages-per-doc', type=int, default=10, help='Páginas por documento sintético')
+    parser.add_argument('--blocks-per-page', type=int, default=20, help='Bloques por página sintética')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Segundos simulados por llamada al LLM')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='Probabilidad de fallo del LLM')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='Bloques de texto clasificados por petición al LLM (1 desactiva los lotes)')
+    parser.add_argument('--rule-confidence', type=float, default=None,
+                        help='Confianza mínima del pre-clasificador de reglas para omitir el LLM')
+    parser.add_argument('--table-quality', type=float, default=None,
+                        help='Calidad mínima de una tabla convertida desde su HTML para omitir el modelo multimodal')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Transforma todos los documentos a la vez en un bucle de eventos (acall)')
+    parser.add_argument('--async-concurrency', type=int, default=64,
+                        help='Peticiones al LLM en vuelo en la ruta asíncrona')
+    parser.add_argument('--embed-latency', type=float, default=0.0, help='Segundos simulados por lote de embeddings')
+    parser.add_argument('--embed-error-rate', type=float, default=0.0, help='Probabilidad de fallo de los embeddings')
+    parser.add_argument('--embed-dimension', type=int, default=768, help='Dimensión de los embeddings falsos')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los documentos y errores simulados')
+    parser.add_argument('--output', help='Archivo JSON donde guardar los resultados')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    pdf_files = []
+    if args.pdf_directory:
+        pdf_files = sorted(
+            os.path.join(args.pdf_directory, f) for f in os.listdir(args.pdf_directory) if f.lower().endswith('.pdf')
+        )
+    if not pdf_files and not args.synthetic_docs:
+        raise SystemExit('No hay documentos que procesar')
+
+    result = run_benchmark(
+        pdf_files=pdf_files,
+        synthetic_docs=args.synthetic_docs,
+        pages_per_doc=args.pages_per_doc,
+        blocks_per_page=args.blocks_per_page,
+        llm=FakeLLM(latency=args.llm_latency, error_rate=args.llm_error_rate, seed=args.seed),
+        embed_model=FakeEmbedding(
+            dimension=args.embed_dimension,
+            latency=args.embed_latency,
+            error_rate=args.embed_error_rate,
+            seed=args.seed
+        ),
+        seed=args.seed,
+        batch_size=args.batch_size,
+        rule_confidence=args.rule_confidence,
+        table_quality=args.table_quality,
+        use_async=args.use_async,
+        async_concurrency=args.async_concurrency
+    )
+    _print_report(result)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(result, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
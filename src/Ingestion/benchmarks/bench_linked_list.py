@@ -0,0 +1,98 @@
+"""
+Micro-benchmark de ``LinkedListManager``: asignación de títulos de sección y eliminación por tipo de bloque.
+
+Compara la búsqueda hacia atrás anterior (``find_nearest_title_parent`` por nodo, O(n·longitud de
+sección)) con el recorrido único hacia delante sobre la vista ordenada, y comprueba que asignan los
+mismos títulos. La referencia es cuadrática en secciones largas, así que se mide sobre
+``--reference-nodes`` nodos.
+
+Uso (desde ``src/Ingestion``)::
+
+    python -m benchmarks.bench_linked_list --nodes 100000 --section-length 5000
+"""
+import argparse
+import random
+import time
+from typing import Callable, List, Tuple
+
+from llama_index.core import Document
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo
+
+from lib.library_custom.llama_index.transformations._LinkedListManager import LinkedListManager
+
+_BLOCK_TYPES = ['NarrativeText', 'ListItem', 'FigureCaption', 'UncategorizedText']
+
+
+def make_documents(nodes: int, section_length: int, documents: int = 1, seed: int = 0) -> List[Document]:
+    """Nodos encadenados con PREVIOUS/NEXT como los genera el loader, con un Title cada ``section_length``."""
+    rng = random.Random(seed)
+    result = []
+    per_document = max(1, nodes // documents)
+    for document in range(documents):
+        chain = []
+        for i in range(per_document):
+            block_type = 'Title' if i % section_length == 0 else rng.choice(_BLOCK_TYPES)
+            chain.append(Document(
+                id_=f'{document}-{i}',
+                text=f'Section {i // section_length}' if block_type == 'Title' else 'text',
+                metadata={'block_type': block_type}
+            ))
+        for previous, current in zip(chain, chain[1:]):
+            current.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=previous.node_id)
+            previous.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=current.node_id)
+        result.extend(chain)
+    return result
+
+
+def reference_assign_section_titles(manager: LinkedListManager):
+    """Implementación previa, como referencia."""
+    for node_id, node in manager.nodes.items():
+        nearest_title_node = manager.find_nearest_title_parent(node)
+        if nearest_title_node:
+            node.metadata['section_title'] = nearest_title_node.text
+
+
+def _measure(function: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def _section_titles(nodes: List[Document]) -> List[Tuple[str, str]]:
+    return [(node.node_id, node.metadata.get('section_title')) for node in nodes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=100_000, help='Número de nodos')
+    parser.add_argument('--section-length', type=int, default=5000, help='Nodos por sección')
+    parser.add_argument('--documents', type=int, default=1, help='Número de listas (documentos)')
+    parser.add_argument('--reference-nodes', type=int, default=20_000,
+                        help='Nodos sobre los que se mide la implementación previa')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<22} {'nodes':>8} {'seconds':>9} {'nodes/s':>11}")
+    sizes = sorted({min(args.reference_nodes, args.nodes), args.nodes})
+    for nodes in sizes:
+        if nodes <= args.reference_nodes:
+            documents = make_documents(nodes, args.section_length, args.documents, args.seed)
+            manager = LinkedListManager(documents)
+            elapsed = _measure(lambda: reference_assign_section_titles(manager))
+            print(f"{'backward walk':<22} {nodes:>8} {elapsed:>9.3f} {nodes / elapsed:>11.0f}")
+            expected = _section_titles(documents)
+
+        documents = make_documents(nodes, args.section_length, args.documents, args.seed)
+        manager = LinkedListManager(documents)
+        elapsed = _measure(manager.assign_section_titles)
+        print(f"{'forward traversal':<22} {nodes:>8} {elapsed:>9.3f} {nodes / elapsed:>11.0f}")
+        if nodes <= args.reference_nodes:
+            same = _section_titles(documents) == expected
+            print(f"mismos títulos que la implementación previa: {'sí' if same else 'NO'}")
+
+        elapsed = _measure(lambda: manager.remove_nodes_by_block_type(['UncategorizedText']))
+        print(f"{'remove (shared view)':<22} {nodes:>8} {elapsed:>9.3f} {nodes / elapsed:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
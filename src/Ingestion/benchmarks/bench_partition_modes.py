@@ -0,0 +1,96 @@
+"""
+Benchmark de particionado de PDFs: páginas/segundo del modo ``thread`` frente al modo ``process``
+de ``Unstructured_UF_Loader``, y de la estrategia ``hi_res`` frente a la ``adaptive``.
+
+Uso (desde ``src/Ingestion``)::
+
+    python -m benchmarks.bench_partition_modes --directory ../../unstructured/project/papers --workers 4 8 16 --strategies hi_res adaptive
+
+No requiere credenciales de GCP: solo ejecuta el particionado ``hi_res`` y la conversión a Documents.
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from typing import List
+
+from lib.Concurrency import get_governor
+from lib.DirectoryLoader import Unstructured_UF_Loader
+
+logger = logging.getLogger(__name__)
+
+
+def _count_pages(documents) -> int:
+    """Cuenta las páginas distintas por archivo presentes en los Documents."""
+    pages = {(doc.metadata.get('file_name'), doc.metadata.get('page_number')) for doc in documents}
+    return len(pages)
+
+
+def run_benchmark(files: List[str], mode: str, workers: int, repeat: int = 1, strategy: str = 'hi_res') -> dict:
+    """
+    Ejecuta el loader sobre los archivos y devuelve el tiempo y las páginas por segundo.
+
+    :param files:
+    :param mode:
+    :param workers:
+    :param repeat:
+    :param strategy: ``'hi_res'`` or ``'adaptive'``.
+    :return:
+    """
+    # En modo hilo el particionado usa el pool compartido del planificador
+    get_governor().configure(partition=workers)
+    with tempfile.TemporaryDirectory() as image_dir:
+        loader = Unstructured_UF_Loader(
+            image_path_output=image_dir, execution_mode=mode, max_workers=workers, partition_strategy=strategy
+        )
+        try:
+            # Primera pasada de calentamiento: carga de modelos (y arranque del pool de procesos)
+            loader.load_from(files=files[:1])
+            elapsed = 0.0
+            pages = 0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                documents = loader.load_from(files=files)
+                elapsed += time.perf_counter() - start
+                pages += _count_pages(documents)
+        finally:
+            loader.close()
+    return {
+        'mode': mode,
+        'strategy': strategy,
+        'workers': workers,
+        'files': len(files) * repeat,
+        'pages': pages,
+        'seconds': elapsed,
+        'pages_per_second': pages / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--directory', required=True, help='Directorio con los PDFs de prueba')
+    parser.add_argument('--workers', type=int, nargs='+', default=[4], help='Número de workers a probar')
+    parser.add_argument('--modes', nargs='+', default=['thread', 'process'], help='Modos a comparar')
+    parser.add_argument('--strategies', nargs='+', default=['hi_res'], help='Estrategias a comparar (hi_res, adaptive)')
+    parser.add_argument('--repeat', type=int, default=1, help='Veces que se procesa el conjunto de archivos')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    files = sorted(
+        os.path.join(args.directory, f) for f in os.listdir(args.directory) if f.lower().endswith('.pdf')
+    )
+    if not files:
+        raise SystemExit(f'No hay PDFs en {args.directory}')
+
+    print(f"{'mode':<8} {'strategy':<9} {'workers':>7} {'files':>6} {'pages':>6} {'seconds':>9} {'pages/s':>8}")
+    for workers in args.workers:
+        for mode in args.modes:
+            for strategy in args.strategies:
+                result = run_benchmark(files, mode, workers, args.repeat, strategy)
+                print(f"{result['mode']:<8} {result['strategy']:<9} {result['workers']:>7} {result['files']:>6} "
+                      f"{result['pages']:>6} {result['seconds']:>9.2f} {result['pages_per_second']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Sustitutos deterministas del LLM de GCP y del modelo de embeddings para los benchmarks.
+
+Ambos simulan la latencia y la tasa de errores configuradas y cuentan las llamadas,
+de forma que el pipeline de ingestión se puede medir sin credenciales ni red.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import LLM
+from langchain_core.pydantic_v1 import PrivateAttr
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.bridge.pydantic import PrivateAttr as LlamaPrivateAttr
+
+_CLASSIFICATION_PATTERN = re.compile(r'^Classification:\s*(\S+)', re.MULTILINE)
+_BATCH_BLOCK_PATTERN = re.compile(r'<block id="(\d+)" classification="([^"]*)">')
+
+
+class FakeBackendError(RuntimeError):
+    """Error simulado por los backends falsos."""
+
+
+class _CallStats:
+    """Contador de llamadas, errores y tiempo simulado compartido entre hilos."""
+
+    def __init__(self, latency: float, error_rate: float, seed: int):
+        self._latency = latency
+        self._error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.items = 0
+        self.errors = 0
+        self.input_chars = 0
+
+    def record(self, items: int = 1, input_chars: int = 0):
+        """Registra una llamada, espera la latencia simulada y lanza un error según la tasa configurada."""
+        failed = self._count(items, input_chars)
+        if self._latency:
+            time.sleep(self._latency)
+        if failed:
+            raise FakeBackendError('Error simulado por el backend falso')
+
+    async def arecord(self, items: int = 1, input_chars: int = 0):
+        """Como ``record``, pero la latencia simulada cede el bucle de eventos."""
+        failed = self._count(items, input_chars)
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        if failed:
+            raise FakeBackendError('Error simulado por el backend falso')
+
+    def _count(self, items: int, input_chars: int) -> bool:
+        with self._lock:
+            self.calls += 1
+            self.items += items
+            self.input_chars += input_chars
+            failed = self._random.random() < self._error_rate
+            if failed:
+                self.errors += 1
+        return failed
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {'calls': self.calls, 'items': self.items, 'errors': self.errors, 'input_chars': self.input_chars}
+
+
+class FakeLLM(LLM):
+    """
+    LLM de LangChain que responde sin llamar a Vertex AI.
+
+    - Con ``image_path`` devuelve una transcripción fija de la imagen.
+    - Con el prompt de evaluación de bloques devuelve el JSON que espera ``create_chain_evaluation``,
+      manteniendo la clasificación original del bloque.
+    - Con el prompt de evaluación por lotes devuelve una evaluación por bloque, como espera
+      ``create_chain_batch_evaluation``.
+    """
+
+    latency: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+    _stats: Any = PrivateAttr(default=None)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._stats = _CallStats(self.latency, self.error_rate, self.seed)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Llamadas, elementos y errores simulados hasta el momento."""
+        return self._stats.as_dict()
+
+    def _call(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[CallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> str:
+        batch_blocks = _BATCH_BLOCK_PATTERN.findall(prompt)
+        self._stats.record(items=max(1, len(batch_blocks)), input_chars=len(prompt))
+        return self._answer(prompt, batch_blocks, **kwargs)
+
+    async def _acall(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> str:
+        batch_blocks = _BATCH_BLOCK_PATTERN.findall(prompt)
+        await self._stats.arecord(items=max(1, len(batch_blocks)), input_chars=len(prompt))
+        return self._answer(prompt, batch_blocks, **kwargs)
+
+    @staticmethod
+    def _answer(prompt: str, batch_blocks: List[tuple], **kwargs: Any) -> str:
+        if kwargs.get('image_path'):
+            return f"Transcripción simulada de {kwargs['image_path']}"
+        if batch_blocks:
+            return json.dumps({'blocks': [
+                {'id': int(block_id), 'makes_sense': True, 'block_type': block_type,
+                 'description': f'Bloque {block_type} simulado'}
+                for block_id, block_type in batch_blocks
+            ]})
+
+        match = _CLASSIFICATION_PATTERN.search(prompt)
+        block_type = match.group(1) if match else 'NarrativeText'
+        return json.dumps({
+            'makes_sense': True,
+            'block_type': block_type,
+            'description': f'Bloque {block_type} simulado'
+        })
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {'latency': self.latency, 'error_rate': self.error_rate, 'seed': self.seed}
+
+    @property
+    def _llm_type(self) -> str:
+        return 'fake'
+
+
+class FakeEmbedding(BaseEmbedding):
+    """
+    Modelo de embeddings de Llama-Index que genera vectores deterministas a partir del hash del texto.
+    Cada lote cuenta como una llamada, igual que una petición al servicio real.
+    """
+
+    dimension: int = Field(default=768, description="Dimensión de los vectores generados")
+    latency: float = Field(default=0.0, description="Segundos simulados por llamada")
+    error_rate: float = Field(default=0.0, description="Probabilidad de fallo de cada llamada")
+    seed: int = Field(default=0, description="Semilla de los errores simulados")
+
+    _stats: Any = LlamaPrivateAttr(default=None)
+
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault('model_name', 'fake-embedding')
+        super().__init__(**kwargs)
+        self._stats = _CallStats(self.latency, self.error_rate, self.seed)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return 'FakeEmbedding'
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Llamadas, textos y errores simulados hasta el momento."""
+        return self._stats.as_dict()
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        rng = random.Random(seed)
+        return [rng.uniform(-1.0, 1.0) for _ in range(self.dimension)]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        self._stats.record()
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        self._stats.record()
+        return self._vector(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._stats.record(len(texts))
+        return [self._vector(text) for text in texts]
@@ -1,4 +1,5 @@
 import os
+import socket
 from dataclasses import dataclass
 
 from lib.Config.Config import _Config
@@ -12,6 +13,41 @@ class _ConfigIngestion(_Config):
     _out_dir: str = 'nodes'
     _images_dir: str = 'img'
     _meta_dir: str = 'metadata'
+    _cache_dir: str = 'cache'
+    _manifest_file_name: str = 'manifest.sqlite'
+    _tombstones_file_name: str = 'tombstones.jsonl'
+    _queue_file_name: str = 'queue.sqlite'
+    _pipeline_version: str = '1'
+    _num_workers: int = 4
+    _loader_execution_mode: str = 'thread'
+    _loader_max_workers: int = None
+    _loader_pages_per_shard: int = 50
+    _loader_partition_strategy: str = 'adaptive'
+    _postprocessor_context_window: int = 1
+    _postprocessor_batch_size: int = 20
+    _postprocessor_max_batch_tokens: int = 8000
+    _postprocessor_rule_confidence: float = 0.9
+    _postprocessor_table_quality: float = 0.8
+    _postprocessor_async_concurrency: int = 64
+    _llm_cache_mode: str = 'use'
+    _llm_cache_max_mb: int = 1024
+    _llm_requests_per_minute: float = 300
+    _llm_tokens_per_minute: float = 2_000_000
+    _llm_max_attempts: int = 6
+    _llm_circuit_failures: int = 10
+    _llm_circuit_reset_seconds: float = 30.0
+    _partition_concurrency: int = os.cpu_count() or 4
+    _llm_concurrency: int = 8
+    _embedding_concurrency: int = 4
+    _distributed: bool = False
+    _leases_file_name: str = 'leases.sqlite'
+    _lease_seconds: float = 60.0
+    _lease_max_attempts: int = 3
+    _lease_failed_retry_seconds: float = 600.0
+    _node_state_dir: str = 'state'
+    _metrics_dir: str = 'metrics'
+    _metrics_host: str = '127.0.0.1'
+    _metrics_port: int = 9464
 
     def __init__(self):
         self._log_level = logging.INFO
@@ -49,4 +85,213 @@ class _ConfigIngestion(_Config):
         os.makedirs(path, exist_ok=True)
         return path
 
+    # ---- Cache Directory ----
+    @property
+    def cache_dir(self) -> str:
+        """
+        Get the directory of the persistent ingestion caches. They are SQLite files in WAL mode,
+        which does not work on network file systems, so in distributed mode it is under the node's state_dir.
+        """
+        path = os.path.join(self.state_dir, self._cache_dir)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    # ---- Node State Directory ----
+    @property
+    def state_dir(self) -> str:
+        """
+        Get the directory of the manifest, the job queue and the caches. In distributed mode every node
+        keeps its own under ``state/<host>``, since they are local SQLite files and only leases are shared.
+        """
+        if not self._distributed:
+            return self.base_dir
+        path = os.path.join(self.base_dir, self._node_state_dir, socket.gethostname())
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    # ---- Manifest ----
+    @property
+    def manifest_path(self) -> str:
+        """Get the path of the ingestion manifest."""
+        return os.path.join(self.state_dir, self._manifest_file_name)
+
+    # ---- Tombstones ----
+    @property
+    def tombstones_path(self) -> str:
+        """
+        Get the path of the log of deleted nodes. In distributed mode every node appends to its own
+        ``tombstones.<host>.jsonl``, since appends from several hosts to one shared file are not atomic.
+        """
+        if not self._distributed:
+            return os.path.join(self.out_dir, self._tombstones_file_name)
+        stem, extension = os.path.splitext(self._tombstones_file_name)
+        return os.path.join(self.out_dir, f'{stem}.{socket.gethostname()}{extension}')
+
+    # ---- Queue ----
+    @property
+    def queue_path(self) -> str:
+        """Get the path of the ingestion job queue."""
+        return os.path.join(self.state_dir, self._queue_file_name)
+
+    # ---- Number of Workers ----
+    @property
+    def num_workers(self) -> int:
+        """Get the number of workers that drain the ingestion queue."""
+        return self._num_workers
+
+    # ---- Loader Execution ----
+    @property
+    def loader_execution_mode(self) -> str:
+        """Get the PDF partition execution mode of the loader ('thread' or 'process')."""
+        return self._loader_execution_mode
+
+    @property
+    def loader_max_workers(self) -> int:
+        """Get the number of processes of the loader in 'process' mode (``None`` uses the partition concurrency)."""
+        return self._loader_max_workers
+
+    @property
+    def loader_pages_per_shard(self) -> int:
+        """Get the size of the page windows large PDFs are split into."""
+        return self._loader_pages_per_shard
+
+    @property
+    def loader_partition_strategy(self) -> str:
+        """Get the PDF partition strategy of the loader ('hi_res' or 'adaptive')."""
+        return self._loader_partition_strategy
+
+    # ---- Post-Processor ----
+    @property
+    def postprocessor_context_window(self) -> int:
+        """Get the number of following blocks given to the model when reclassifying a block."""
+        return self._postprocessor_context_window
+
+    @property
+    def postprocessor_batch_size(self) -> int:
+        """Get the maximum number of text blocks classified per LLM request (1 disables batching)."""
+        return self._postprocessor_batch_size
+
+    @property
+    def postprocessor_max_batch_tokens(self) -> int:
+        """Get the approximate token budget of the blocks of a batch request and their answers."""
+        return self._postprocessor_max_batch_tokens
+
+    @property
+    def postprocessor_rule_confidence(self) -> float:
+        """Get the minimum confidence of the rule-based pre-classifier to skip the LLM (``None`` disables it)."""
+        return self._postprocessor_rule_confidence
+
+    @property
+    def postprocessor_table_quality(self) -> float:
+        """Get the minimum quality of a table converted from its inferred HTML to skip the multimodal model (``None`` disables it)."""
+        return self._postprocessor_table_quality
+
+    @property
+    def postprocessor_async_concurrency(self) -> int:
+        """Get the maximum LLM requests in flight per event loop when the pipeline runs with arun."""
+        return self._postprocessor_async_concurrency
+
+    # ---- LLM Response Cache ----
+    @property
+    def llm_cache_mode(self) -> str:
+        """Get the LLM response cache mode: 'use', 'bypass' or 'refresh'."""
+        return self._llm_cache_mode
+
+    @property
+    def llm_cache_max_bytes(self) -> int:
+        """Get the maximum size of the cached LLM responses in bytes."""
+        return self._llm_cache_max_mb * 1024 ** 2
+
+    # ---- LLM Rate Limits ----
+    @property
+    def llm_requests_per_minute(self) -> float:
+        """Get the client-side limit of LLM requests per minute."""
+        return self._llm_requests_per_minute
+
+    @property
+    def llm_tokens_per_minute(self) -> float:
+        """Get the client-side limit of estimated LLM input tokens per minute."""
+        return self._llm_tokens_per_minute
+
+    @property
+    def llm_max_attempts(self) -> int:
+        """Get the attempts of an LLM call on transient errors."""
+        return self._llm_max_attempts
+
+    @property
+    def llm_circuit_failures(self) -> int:
+        """Get the consecutive transient LLM errors that open the circuit."""
+        return self._llm_circuit_failures
+
+    @property
+    def llm_circuit_reset_seconds(self) -> float:
+        """Get the seconds the LLM circuit stays open before a probe call."""
+        return self._llm_circuit_reset_seconds
+
+    # ---- Concurrency ----
+    @property
+    def partition_concurrency(self) -> int:
+        """Get the number of PDF page windows partitioned at once across every file."""
+        return self._partition_concurrency
+
+    @property
+    def llm_concurrency(self) -> int:
+        """Get the number of concurrent LLM calls across every file."""
+        return self._llm_concurrency
+
+    @property
+    def embedding_concurrency(self) -> int:
+        """Get the number of concurrent embedding calls across every file."""
+        return self._embedding_concurrency
+
+    # ---- Distributed Ingestion ----
+    @property
+    def distributed(self) -> bool:
+        """Whether several nodes ingest the same source directory, leasing files from a shared coordinator."""
+        return self._distributed
+
+    @property
+    def leases_path(self) -> str:
+        """Get the path of the lease coordinator shared by every node."""
+        return os.path.join(self.base_dir, self._leases_file_name)
+
+    @property
+    def lease_seconds(self) -> float:
+        """Get the time after which the lease of a node that stopped heartbeating expires."""
+        return self._lease_seconds
+
+    @property
+    def lease_max_attempts(self) -> int:
+        """Get the number of attempts across the cluster before a failed file version is not retried."""
+        return self._lease_max_attempts
+
+    @property
+    def lease_failed_retry_seconds(self) -> float:
+        """Get the time after which a failed file version can be leased again."""
+        return self._lease_failed_retry_seconds
+
+    # ---- Metrics ----
+    @property
+    def metrics_dir(self) -> str:
+        """Get the directory of the per-run metrics summaries."""
+        path = os.path.join(self.base_dir, self._metrics_dir)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @property
+    def metrics_host(self) -> str:
+        """Get the host of the local metrics endpoint."""
+        return self._metrics_host
+
+    @property
+    def metrics_port(self) -> int:
+        """Get the port of the local metrics endpoint (``None`` disables it)."""
+        return self._metrics_port
+
+    # ---- Pipeline Version ----
+    @property
+    def pipeline_version(self) -> str:
+        """Get the pipeline version. Bump it when the transformations change to reprocess every file."""
+        return self._pipeline_version
+
 Config = _ConfigIngestion()
\ No newline at end of file
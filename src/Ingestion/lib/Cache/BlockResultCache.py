@@ -0,0 +1,86 @@
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Set
+
+from ._SQLiteStore import SQLiteStore
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+# Máximo de parámetros por consulta ``IN (...)``
+_CHUNK_SIZE = 500
+
+
+class BlockResultCache(SQLiteStore):
+    """
+    Resultados del post-procesado (LLM / transcripción) de cada bloque de un documento,
+    indexados por documento y hash de contenido del bloque.
+
+    Permite comparar los bloques de una nueva versión de un documento con los de la
+    ejecución anterior y repetir el trabajo del LLM solo para los bloques nuevos o modificados.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        :param db_path: Ruta del archivo SQLite.
+        """
+        super().__init__(db_path, [
+            """
+            CREATE TABLE IF NOT EXISTS blocks (
+                source TEXT NOT NULL,
+                block_hash TEXT NOT NULL,
+                result TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, block_hash)
+            )
+            """
+        ])
+
+    def hashes(self, source: str) -> Set[str]:
+        """Devuelve los hashes de bloque guardados para un documento."""
+        return {row[0] for row in self._query('SELECT block_hash FROM blocks WHERE source = ?', (source,))}
+
+    def get_many(self, source: str, block_hashes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Devuelve los resultados guardados para los hashes indicados.
+
+        :param source: Documento (título) al que pertenecen los bloques.
+        :param block_hashes:
+        :return: Diccionario ``block_hash -> resultado``.
+        """
+        block_hashes = list(block_hashes)
+        results = {}
+        for start in range(0, len(block_hashes), _CHUNK_SIZE):
+            chunk = block_hashes[start:start + _CHUNK_SIZE]
+            rows = self._query(
+                f'SELECT block_hash, result FROM blocks WHERE source = ? '
+                f'AND block_hash IN ({", ".join("?" * len(chunk))})',
+                [source, *chunk]
+            )
+            results.update({block_hash: json.loads(result) for block_hash, result in rows})
+        return results
+
+    def put(self, source: str, block_hash: str, result: Dict[str, Any]):
+        """
+        Guarda el resultado del post-procesado de un bloque.
+
+        :param source:
+        :param block_hash:
+        :param result: Diccionario serializable en JSON (texto y metadata resultantes).
+        """
+        self._execute(
+            'INSERT OR REPLACE INTO blocks (source, block_hash, result, updated_at) VALUES (?, ?, ?, ?)',
+            (source, block_hash, json.dumps(result, ensure_ascii=False, default=str), time.time())
+        )
+
+    def prune(self, source: str, keep: Set[str]) -> int:
+        """Elimina los bloques de un documento que ya no están en ``keep``; devuelve cuántos se eliminaron."""
+        stale = [(source, block_hash) for block_hash in self.hashes(source) - set(keep)]
+        if stale:
+            self._executemany('DELETE FROM blocks WHERE source = ? AND block_hash = ?', stale)
+        return len(stale)
+
+    def remove_source(self, source: str) -> int:
+        """Elimina todos los bloques de un documento."""
+        return self._execute('DELETE FROM blocks WHERE source = ?', (source,))
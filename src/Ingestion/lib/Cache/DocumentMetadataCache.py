@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+class _Entry(NamedTuple):
+    signature: Tuple[int, int]
+    text: str
+    data: Optional[Mapping]
+
+
+class DocumentMetadataCache:
+    """
+    JSON de metadata de cada documento (``<carpeta>/<título>.json``), leído una vez y compartido
+    por todas las transformaciones y los hilos en lugar de abrirlo y parsearlo por nodo.
+
+    - Cada consulta compara la fecha de modificación y el tamaño del archivo con los de la
+      lectura guardada y lo vuelve a leer solo si cambiaron.
+    - El diccionario parseado se entrega como vista de solo lectura: es el mismo objeto para
+      todos los nodos y nadie puede modificarlo por error.
+    - Se guardan como máximo ``max_documents`` documentos, descartando los usados hace más tiempo.
+    """
+
+    def __init__(self, max_documents: int = 256):
+        """
+        :param max_documents: Número máximo de documentos en memoria.
+        """
+        self._max_documents = max_documents
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._hits = 0
+        self._loads = 0
+
+    @staticmethod
+    def path(meta_folder_path: str, title: str) -> str:
+        """Ruta del JSON de metadata de un documento."""
+        return os.path.join(meta_folder_path, f"{title}.json")
+
+    def get_text(self, json_path: str) -> str:
+        """Devuelve el contenido del JSON tal cual (``""`` si no se puede leer), p. ej. para un prompt."""
+        return self._entry(json_path).text
+
+    def get(self, json_path: str) -> Mapping:
+        """
+        Devuelve el JSON parseado como vista de solo lectura compartida.
+
+        :param json_path:
+        :return:
+        :raises json.JSONDecodeError: Si el archivo no existe o no es un JSON válido.
+        """
+        entry = self._entry(json_path)
+        if entry.data is None:
+            # Se repite el error de parseo para que quien llama lo vea, como sin la caché
+            json.loads(entry.text)
+        return entry.data
+
+    def stats(self) -> dict:
+        """Consultas servidas desde memoria, lecturas de disco y documentos guardados."""
+        with self._lock:
+            return {'hits': self._hits, 'loads': self._loads, 'documents': len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    ########################################################
+
+    def _entry(self, json_path: str) -> _Entry:
+        key = os.path.abspath(json_path)
+        try:
+            stat = os.stat(key)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and signature is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+
+        # Se lee fuera del lock; si dos hilos leen a la vez el mismo archivo ambos obtienen lo mismo
+        entry = self._load(json_path, signature)
+        with self._lock:
+            self._loads += 1
+            if signature is not None:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_documents:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.pop(key, None)
+        return entry
+
+    @staticmethod
+    def _load(json_path: str, signature: Optional[Tuple[int, int]]) -> _Entry:
+        try:
+            with open(json_path, 'r') as archivo:
+                text = archivo.read()
+                logger.debug("JSON metadata loaded successfully")
+        except Exception as e:
+            logger.error("Failed to load JSON metadata from %s: %s", json_path, e)
+            text = ""
+        try:
+            data = MappingProxyType(json.loads(text))
+        except (ValueError, TypeError):
+            data = None
+        return _Entry(signature, text, data)
+
+
+_default_metadata_cache = DocumentMetadataCache()
+
+
+def get_metadata_cache() -> DocumentMetadataCache:
+    """Devuelve la caché de metadata de documentos compartida por todas las transformaciones."""
+    return _default_metadata_cache
@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ._SQLiteStore import SQLiteStore
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+# Máximo de parámetros por consulta ``IN (...)``
+_CHUNK_SIZE = 500
+
+
+class EmbeddingCache(SQLiteStore):
+    """
+    Embeddings calculados, indexados por modelo y hash del texto embebido.
+    Los vectores se guardan como float32 y la caché se limita a ``max_entries`` entradas,
+    descartando las usadas hace más tiempo.
+    """
+
+    def __init__(self, db_path: str, max_entries: Optional[int] = 2_000_000):
+        """
+        :param db_path: Ruta del archivo SQLite.
+        :param max_entries: Número máximo de embeddings guardados (``None`` sin límite).
+        """
+        super().__init__(db_path, [
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model_name TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used_at REAL NOT NULL,
+                PRIMARY KEY (model_name, text_hash)
+            )
+            """,
+            'CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used_at)'
+        ])
+        self._max_entries = max_entries
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Hash del texto usado como clave."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, model_name: str, text_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Devuelve los embeddings guardados para los hashes indicados."""
+        text_hashes = list(dict.fromkeys(text_hashes))
+        now = time.time()
+        results = {}
+        for start in range(0, len(text_hashes), _CHUNK_SIZE):
+            chunk = text_hashes[start:start + _CHUNK_SIZE]
+            placeholders = ", ".join("?" * len(chunk))
+            rows = self._query(
+                f'SELECT text_hash, vector FROM embeddings WHERE model_name = ? AND text_hash IN ({placeholders})',
+                [model_name, *chunk]
+            )
+            results.update({
+                text_hash: np.frombuffer(vector, dtype=np.float32).tolist() for text_hash, vector in rows
+            })
+            if rows:
+                self._executemany(
+                    'UPDATE embeddings SET last_used_at = ? WHERE model_name = ? AND text_hash = ?',
+                    [(now, model_name, text_hash) for text_hash, _ in rows]
+                )
+        return results
+
+    def put_many(self, model_name: str, embeddings: Dict[str, List[float]]):
+        """Guarda embeddings (``text_hash -> vector``) y aplica el límite de tamaño."""
+        if not embeddings:
+            return
+        now = time.time()
+        self._executemany(
+            'INSERT OR REPLACE INTO embeddings (model_name, text_hash, vector, last_used_at) VALUES (?, ?, ?, ?)',
+            [
+                (model_name, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for text_hash, vector in embeddings.items()
+            ]
+        )
+        self._evict()
+
+    def _evict(self):
+        if self._max_entries is None:
+            return
+        count = self._query('SELECT COUNT(*) FROM embeddings')[0][0]
+        if count > self._max_entries:
+            self._execute(
+                'DELETE FROM embeddings WHERE rowid IN '
+                '(SELECT rowid FROM embeddings ORDER BY last_used_at LIMIT ?)',
+                (count - self._max_entries,)
+            )
@@ -0,0 +1,298 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ._SQLiteStore import SQLiteStore
+
+try:
+    from PIL import Image
+except ImportError:  # Sin Pillow solo se reutilizan los recortes idénticos byte a byte
+    Image = None
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+# El hash perceptual de 64 bits se divide en 8 bandas de 8 bits: dos hashes a distancia de
+# Hamming <= 7 comparten al menos una banda, así que basta buscar candidatos por banda exacta
+_BANDS = 8
+_BAND_BITS = 64 // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+_HASH_SIZE = 8
+# Los candidatos se confirman con un dHash de 256 bits, que distingue detalles que el de 64 no ve
+_DETAIL_HASH_SIZE = 16
+# Diferencia relativa máxima de la relación de aspecto de dos recortes casi idénticos
+_MAX_ASPECT_DIFFERENCE = 0.05
+# Un recorte es de texto (tablas, párrafos, capturas) si casi todos sus píxeles son claros u
+# oscuros y los oscuros no dominan: solo se reutiliza si es idéntico byte a byte
+_TEXT_EXTREME_SHARE = 0.9
+_TEXT_MAX_DARK_SHARE = 0.35
+
+
+@dataclass(frozen=True)
+class ImageKey:
+    """
+    Clave de un recorte: el espacio de nombres (modelo y prompt), el hash de contenido y, para
+    los recortes que admiten reutilización aproximada, el hash perceptual de 64 bits, el de 256
+    bits y el tamaño en píxeles (``None`` si no se calcularon).
+    """
+    namespace: str
+    content_hash: str
+    phash: Optional[int]
+    detail_hash: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+class ImageTranscriptionCache(SQLiteStore):
+    """
+    Transcripciones de los recortes de imágenes y tablas, compartidas entre archivos y ejecuciones.
+
+    Un recorte se reconoce por el hash de su contenido o, si no hay coincidencia exacta, por su
+    hash perceptual: logos o figuras reutilizadas en otra versión del documento que difieren solo
+    por el recorte o la compresión reutilizan el texto ya generado en lugar de repetir la llamada
+    multimodal. Los candidatos del dHash de 64 bits se confirman con un dHash de 256 bits y
+    comparando el tamaño y la relación de aspecto.
+
+    Las tablas y los recortes con aspecto de texto solo se reutilizan si son idénticos: dos tablas
+    con la misma rejilla y valores distintos tienen hashes perceptuales casi iguales.
+    """
+
+    def __init__(self,
+                 db_path: str,
+                 max_distance: int = 5,
+                 max_detail_distance: int = 12,
+                 max_size_difference: float = 0.1
+                 ):
+        """
+        :param db_path: Ruta del archivo SQLite.
+        :param max_distance: Distancia de Hamming máxima entre hashes perceptuales de 64 bits para
+            buscar candidatos (0 desactiva la búsqueda aproximada; como máximo 7).
+        :param max_detail_distance: Distancia de Hamming máxima entre los hashes de 256 bits para
+            considerar dos recortes iguales.
+        :param max_size_difference: Diferencia relativa máxima del ancho y del alto de los recortes.
+        """
+        if not 0 <= max_distance < _BANDS:
+            raise ValueError(f"max_distance debe estar entre 0 y {_BANDS - 1}: {max_distance}")
+        band_columns = ', '.join(f'b{band} INTEGER' for band in range(_BANDS))
+        super().__init__(db_path, [
+            f"""
+            CREATE TABLE IF NOT EXISTS images (
+                namespace TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                phash INTEGER,
+                {band_columns},
+                detail_hash TEXT,
+                width INTEGER,
+                height INTEGER,
+                result TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, content_hash)
+            )
+            """,
+            *(
+                f'CREATE INDEX IF NOT EXISTS idx_images_b{band} ON images (namespace, b{band})'
+                for band in range(_BANDS)
+            )
+        ])
+        self._add_missing_columns()
+        self._max_distance = max_distance
+        self._max_detail_distance = max_detail_distance
+        self._max_size_difference = max_size_difference
+        self._flights: Dict[Tuple[str, Any], threading.Event] = {}
+        self._flights_lock = threading.Lock()
+
+    def key(self, image_path: str, namespace: str, approximate: bool = True) -> ImageKey:
+        """
+        Calcula la clave de un recorte.
+
+        :param image_path:
+        :param namespace: Identifica el modelo y el prompt con los que se transcribe.
+        :param approximate: ``False`` para los recortes que solo se reutilizan si son idénticos
+            (tablas). Los recortes con aspecto de texto también se tratan así.
+        :return:
+        """
+        with open(image_path, 'rb') as image_file:
+            data = image_file.read()
+        namespace_hash = hashlib.sha256(namespace.encode('utf-8')).hexdigest()
+        content_hash = hashlib.sha256(data).hexdigest()
+        if not approximate or not self._max_distance:
+            return ImageKey(namespace=namespace_hash, content_hash=content_hash, phash=None)
+        return ImageKey(namespace_hash, content_hash, *self._perceptual_hashes(image_path))
+
+    def get(self, key: ImageKey) -> Optional[Dict[str, Any]]:
+        """Devuelve el resultado guardado para el recorte (exacto o casi idéntico) o ``None``."""
+        row = self._query(
+            'SELECT content_hash, result FROM images WHERE namespace = ? AND content_hash = ?',
+            (key.namespace, key.content_hash)
+        )
+        if not row and key.phash is not None and self._max_distance:
+            row = self._find_similar(key)
+        if not row:
+            return None
+        content_hash, result = row[0]
+        self._execute(
+            'UPDATE images SET hits = hits + 1 WHERE namespace = ? AND content_hash = ?',
+            (key.namespace, content_hash)
+        )
+        return json.loads(result)
+
+    def put(self, key: ImageKey, result: Dict[str, Any]):
+        """
+        Guarda el resultado de la transcripción de un recorte.
+
+        :param key:
+        :param result: Diccionario serializable en JSON.
+        """
+        bands = self._bands(key.phash) if key.phash is not None else [None] * _BANDS
+        detail_hash = f'{key.detail_hash:064x}' if key.detail_hash is not None else None
+        self._execute(
+            f'INSERT OR REPLACE INTO images (namespace, content_hash, phash, '
+            f'{", ".join(f"b{band}" for band in range(_BANDS))}, detail_hash, width, height, result, updated_at) '
+            f'VALUES ({", ".join("?" * (_BANDS + 8))})',
+            (key.namespace, key.content_hash, self._to_signed(key.phash), *bands,
+             detail_hash, key.width, key.height,
+             json.dumps(result, ensure_ascii=False, default=str), time.time())
+        )
+
+    def get_or_compute(self, key: ImageKey, compute: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Devuelve el resultado guardado o lo calcula y lo guarda. Si otro hilo ya está calculando el
+        mismo recorte (p. ej. un logo repetido en todas las páginas) se espera a su resultado.
+
+        :param key:
+        :param compute: Función que genera el resultado (la llamada al modelo).
+        :return: El resultado y si provenía de la caché.
+        """
+        result = self.get(key)
+        if result is not None:
+            return result, True
+
+        flight_key = (key.namespace, key.phash if key.phash is not None else key.content_hash)
+        with self._flights_lock:
+            event = self._flights.get(flight_key)
+            owner = event is None
+            if owner:
+                event = self._flights[flight_key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            result = self.get(key)
+            if result is not None:
+                return result, True
+            # El cálculo del otro hilo falló: se intenta de nuevo sin coordinación
+            result = compute()
+            self.put(key, result)
+            return result, False
+
+        try:
+            result = compute()
+            self.put(key, result)
+            return result, False
+        finally:
+            with self._flights_lock:
+                self._flights.pop(flight_key, None)
+            event.set()
+
+    ########################################################
+
+    def _add_missing_columns(self):
+        """Añade las columnas del hash de 256 bits y del tamaño a las cachés creadas sin ellas."""
+        columns = {row[1] for row in self._query('PRAGMA table_info(images)')}
+        for column, column_type in (('detail_hash', 'TEXT'), ('width', 'INTEGER'), ('height', 'INTEGER')):
+            if column not in columns:
+                self._execute(f'ALTER TABLE images ADD COLUMN {column} {column_type}')
+
+    def _find_similar(self, key: ImageKey) -> list:
+        """
+        Busca los recortes con el hash perceptual de 64 bits a distancia <= ``max_distance`` y se
+        queda con el más parecido que también pasa la comparación del hash de 256 bits y del tamaño.
+        """
+        bands = self._bands(key.phash)
+        query = ' UNION '.join(
+            f'SELECT content_hash, result, phash, detail_hash, width, height FROM images '
+            f'WHERE namespace = ? AND b{band} = ? AND detail_hash IS NOT NULL'
+            for band in range(_BANDS)
+        )
+        params = [value for band in bands for value in (key.namespace, band)]
+        best = None
+        for content_hash, result, phash, detail_hash, width, height in self._query(query, params):
+            if bin(key.phash ^ (phash & 0xFFFFFFFFFFFFFFFF)).count('1') > self._max_distance:
+                continue
+            if not self._similar_size(key.width, key.height, width, height):
+                continue
+            distance = bin(key.detail_hash ^ int(detail_hash, 16)).count('1')
+            if distance <= self._max_detail_distance and (best is None or distance < best[0]):
+                best = (distance, content_hash, result)
+        if best is None:
+            return []
+        logger.debug(f'Recorte casi idéntico reutilizado (distancia {best[0]} de {_DETAIL_HASH_SIZE ** 2} bits)')
+        return [best[1:]]
+
+    def _similar_size(self, width: int, height: int, other_width: int, other_height: int) -> bool:
+        if not (width and height and other_width and other_height):
+            return False
+        if abs(width - other_width) > self._max_size_difference * max(width, other_width):
+            return False
+        if abs(height - other_height) > self._max_size_difference * max(height, other_height):
+            return False
+        aspect, other_aspect = width / height, other_width / other_height
+        return abs(aspect - other_aspect) <= _MAX_ASPECT_DIFFERENCE * max(aspect, other_aspect)
+
+    @classmethod
+    def _perceptual_hashes(cls, image_path: str) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+        """
+        Hashes perceptuales de 64 y 256 bits y tamaño de un recorte, o ``None`` si no se pudieron
+        calcular o el recorte tiene aspecto de texto.
+        """
+        if Image is None:
+            return None, None, None, None
+        try:
+            with Image.open(image_path) as image:
+                gray = image.convert('L')
+                width, height = gray.size
+                if cls._is_text_like(gray):
+                    return None, None, None, None
+                return cls._dhash(gray, _HASH_SIZE), cls._dhash(gray, _DETAIL_HASH_SIZE), width, height
+        except Exception as e:
+            logger.debug(f'No se pudo calcular el hash perceptual de {image_path}: {e}')
+            return None, None, None, None
+
+    @staticmethod
+    def _dhash(gray: Any, size: int) -> int:
+        """dHash de ``size``x``size`` bits: compara el brillo de píxeles vecinos de la imagen reducida a (size+1)x(size)."""
+        pixels = list(gray.resize((size + 1, size), Image.LANCZOS).getdata())
+        value = 0
+        for row in range(size):
+            for column in range(size):
+                left = pixels[row * (size + 1) + column]
+                right = pixels[row * (size + 1) + column + 1]
+                value = (value << 1) | int(left > right)
+        return value
+
+    @staticmethod
+    def _is_text_like(gray: Any) -> bool:
+        """
+        Si casi todos los píxeles son claros u oscuros y los oscuros no dominan, como en texto impreso.
+        El histograma es de la imagen completa: al reducirla las líneas finas se vuelven grises.
+        """
+        histogram = gray.histogram()
+        total = sum(histogram)
+        dark = sum(histogram[:64]) / total
+        light = sum(histogram[192:]) / total
+        return dark + light >= _TEXT_EXTREME_SHARE and dark <= _TEXT_MAX_DARK_SHARE
+
+    @staticmethod
+    def _bands(phash: int) -> list:
+        return [(phash >> (band * _BAND_BITS)) & _BAND_MASK for band in range(_BANDS)]
+
+    @staticmethod
+    def _to_signed(phash: Optional[int]) -> Optional[int]:
+        """SQLite guarda enteros de 64 bits con signo."""
+        if phash is None:
+            return None
+        return phash - (1 << 64) if phash >= (1 << 63) else phash
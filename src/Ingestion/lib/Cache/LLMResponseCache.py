@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ._SQLiteStore import SQLiteStore
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+# Filas leídas por consulta al buscar las respuestas a descartar
+_EVICTION_CHUNK = 500
+
+
+class LLMResponseCache(SQLiteStore):
+    """
+    Respuestas del LLM indexadas por modelo, parámetros de generación, hash del prompt y hash
+    del contenido de la imagen adjunta, para no volver a pagar prompts idénticos al repetir una
+    ingestión tras un fallo o al reprocesar un documento con cambios pequeños.
+
+    El tamaño se limita por número de entradas y por bytes de respuesta, descartando las usadas
+    hace más tiempo (LRU).
+    """
+
+    def __init__(self,
+                 db_path: str,
+                 max_entries: Optional[int] = 500_000,
+                 max_bytes: Optional[int] = 1024 ** 3
+                 ):
+        """
+        :param db_path: Ruta del archivo SQLite.
+        :param max_entries: Número máximo de respuestas guardadas (``None`` sin límite).
+        :param max_bytes: Tamaño máximo total de las respuestas en bytes (``None`` sin límite).
+        """
+        super().__init__(db_path, [
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                last_used_at REAL NOT NULL
+            )
+            """,
+            'CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used_at)'
+        ])
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def key(model_name: str,
+            params: Dict[str, Any],
+            prompt: str,
+            image_path: Optional[str] = None
+            ) -> str:
+        """
+        Calcula la clave de una petición.
+
+        :param model_name:
+        :param params: Parámetros de generación que cambian la respuesta (serializables en JSON).
+        :param prompt:
+        :param image_path: Imagen adjunta; la clave usa el hash de su contenido, no la ruta.
+        :return:
+        """
+        image_hash = None
+        if image_path:
+            with open(image_path, 'rb') as image_file:
+                image_hash = hashlib.sha256(image_file.read()).hexdigest()
+        material = json.dumps({
+            'model_name': model_name,
+            'params': params,
+            'prompt': hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+            'image': image_hash,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la respuesta guardada o ``None``, y la marca como usada."""
+        rows = self._query('SELECT response FROM responses WHERE key = ?', (key,))
+        with self._stats_lock:
+            if rows:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if not rows:
+            return None
+        self._execute(
+            'UPDATE responses SET hits = hits + 1, last_used_at = ? WHERE key = ?', (time.time(), key)
+        )
+        return rows[0][0]
+
+    def put(self, key: str, model_name: str, response: str):
+        """Guarda una respuesta y aplica los límites de tamaño."""
+        self._execute(
+            'INSERT OR REPLACE INTO responses (key, model_name, response, size, last_used_at) VALUES (?, ?, ?, ?, ?)',
+            (key, model_name, response, len(response.encode('utf-8')), time.time())
+        )
+        self._evict()
+
+    def stats(self) -> Dict[str, float]:
+        """Aciertos y fallos de esta ejecución, tasa de aciertos y tamaño actual de la caché."""
+        entries, size = self._query('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses')[0]
+        with self._stats_lock:
+            hits, misses = self._hits, self._misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    ########################################################
+
+    def _evict(self):
+        if self._max_entries is None and self._max_bytes is None:
+            return
+        # Las escrituras solo ocurren tras una llamada al modelo, así que el recuento completo es barato en comparación
+        count, size = self._query('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses')[0]
+        excess_entries = count - self._max_entries if self._max_entries is not None else 0
+        excess_bytes = size - self._max_bytes if self._max_bytes is not None else 0
+        if excess_entries <= 0 and excess_bytes <= 0:
+            return
+        stale = []
+        freed = 0
+        while len(stale) < excess_entries or freed < excess_bytes:
+            rows = self._query(
+                'SELECT key, size FROM responses ORDER BY last_used_at LIMIT ? OFFSET ?',
+                (max(excess_entries - len(stale), _EVICTION_CHUNK), len(stale))
+            )
+            if not rows:
+                break
+            for key, entry_size in rows:
+                if len(stale) >= excess_entries and freed >= excess_bytes:
+                    break
+                stale.append((key,))
+                freed += entry_size
+        self._executemany('DELETE FROM responses WHERE key = ?', stale)
+        logger.debug(f'Caché de respuestas del LLM: {len(stale)} respuestas descartadas ({freed} bytes)')
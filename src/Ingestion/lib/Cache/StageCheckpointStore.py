@@ -0,0 +1,117 @@
+import json
+import logging
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+from ._SQLiteStore import SQLiteStore
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+def _json_default(value: Any) -> Any:
+    """Convierte los tipos de numpy que llegan en la metadata desde los DataFrames."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class StageCheckpointStore(SQLiteStore):
+    """
+    Puntos de control de las etapas del pipeline de ingestión.
+
+    Cada punto de control guarda los nodos de salida de una etapa (JSON comprimido con zlib)
+    bajo una clave que depende de la entrada de la etapa y de su configuración. Se guarda
+    también el nombre de la etapa y el hash de su configuración para poder invalidar
+    solo las etapas cuya configuración cambió.
+    """
+
+    def __init__(self, db_path: str, max_entries: Optional[int] = 10000):
+        """
+        :param db_path: Ruta del archivo SQLite.
+        :param max_entries: Número máximo de puntos de control; se descartan los usados hace más tiempo.
+        """
+        super().__init__(db_path, [
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                config_hash TEXT NOT NULL,
+                nodes BLOB NOT NULL,
+                node_count INTEGER NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """,
+            'CREATE INDEX IF NOT EXISTS idx_checkpoints_stage ON checkpoints (stage, config_hash)',
+            'CREATE INDEX IF NOT EXISTS idx_checkpoints_last_used ON checkpoints (last_used_at)'
+        ])
+        self._max_entries = max_entries
+
+    def contains(self, key: str) -> bool:
+        """Indica si existe un punto de control para la clave."""
+        return bool(self._query('SELECT 1 FROM checkpoints WHERE key = ?', (key,)))
+
+    def get(self, key: str) -> Optional[List[BaseNode]]:
+        """Devuelve los nodos guardados para la clave, o ``None`` si no existe."""
+        rows = self._query('SELECT nodes FROM checkpoints WHERE key = ?', (key,))
+        if not rows:
+            return None
+        self._execute('UPDATE checkpoints SET last_used_at = ? WHERE key = ?', (time.time(), key))
+        records = json.loads(zlib.decompress(rows[0][0]).decode('utf-8'))
+        return [json_to_doc(record) for record in records]
+
+    def put(self, key: str, stage: str, config_hash: str, nodes: Sequence[BaseNode]):
+        """
+        Guarda los nodos de salida de una etapa.
+
+        :param key: Clave de la entrada y la configuración de la etapa.
+        :param stage: Nombre de la etapa.
+        :param config_hash: Hash de la configuración de la etapa.
+        :param nodes:
+        """
+        data = json.dumps([doc_to_json(node) for node in nodes], ensure_ascii=False, default=_json_default)
+        self._execute(
+            'INSERT OR REPLACE INTO checkpoints (key, stage, config_hash, nodes, node_count, last_used_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, stage, config_hash, zlib.compress(data.encode('utf-8')), len(nodes), time.time())
+        )
+        self._evict()
+
+    def config_hashes(self) -> Dict[str, set]:
+        """Devuelve, por etapa, los hashes de configuración que tienen puntos de control."""
+        config_hashes: Dict[str, set] = {}
+        for stage, config_hash in self._query('SELECT DISTINCT stage, config_hash FROM checkpoints'):
+            config_hashes.setdefault(stage, set()).add(config_hash)
+        return config_hashes
+
+    def invalidate(self, stage: str, keep_config_hash: Optional[str] = None) -> int:
+        """
+        Elimina los puntos de control de una etapa, salvo los de ``keep_config_hash``.
+
+        :param stage:
+        :param keep_config_hash:
+        :return: Número de puntos de control eliminados.
+        """
+        if keep_config_hash is None:
+            return self._execute('DELETE FROM checkpoints WHERE stage = ?', (stage,))
+        return self._execute(
+            'DELETE FROM checkpoints WHERE stage = ? AND config_hash != ?', (stage, keep_config_hash)
+        )
+
+    def _evict(self):
+        if self._max_entries is None:
+            return
+        count = self._query('SELECT COUNT(*) FROM checkpoints')[0][0]
+        if count > self._max_entries:
+            self._execute(
+                'DELETE FROM checkpoints WHERE key IN '
+                '(SELECT key FROM checkpoints ORDER BY last_used_at LIMIT ?)',
+                (count - self._max_entries,)
+            )
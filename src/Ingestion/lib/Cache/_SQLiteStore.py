@@ -0,0 +1,54 @@
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, List, Sequence
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+class SQLiteStore:
+    """
+    Base de los almacenes persistentes en SQLite: una conexión compartida entre hilos,
+    protegida por un lock, en modo WAL.
+    """
+
+    def __init__(self, db_path: str, schema: Sequence[str]):
+        """
+        :param db_path: Ruta del archivo SQLite.
+        :param schema: Sentencias ``CREATE ... IF NOT EXISTS`` a ejecutar al abrir.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in schema:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def close(self):
+        """Cierra la conexión con la base de datos."""
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        """Ejecuta una sentencia de escritura y devuelve el número de filas afectadas."""
+        with self._lock:
+            rowcount = self._conn.execute(sql, params).rowcount
+            self._conn.commit()
+        return rowcount
+
+    def _executemany(self, sql: str, rows: Sequence[Sequence[Any]]) -> int:
+        """Ejecuta una sentencia de escritura para varias filas en una sola transacción."""
+        with self._lock:
+            rowcount = self._conn.executemany(sql, rows).rowcount
+            self._conn.commit()
+        return rowcount
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        """Ejecuta una consulta y devuelve todas las filas."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
@@ -0,0 +1,6 @@
+from .BlockResultCache import BlockResultCache
+from .DocumentMetadataCache import DocumentMetadataCache, get_metadata_cache
+from .EmbeddingCache import EmbeddingCache
+from .ImageTranscriptionCache import ImageTranscriptionCache
+from .LLMResponseCache import LLMResponseCache
+from .StageCheckpointStore import StageCheckpointStore
\ No newline at end of file
@@ -0,0 +1,266 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from ..Metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+PARTITION = 'partition'
+LLM = 'llm'
+EMBEDDING = 'embedding'
+
+# Intervalo entre comprobaciones de las ranuras asíncronas (no hay notificación entre hilos)
+_ASYNC_POLL_SECONDS = 0.05
+
+DEFAULT_BUDGETS = {
+    PARTITION: os.cpu_count() or 4,
+    LLM: 8,
+    EMBEDDING: 4,
+}
+
+
+class _Budget:
+    """
+    Límite de concurrencia de un tipo de trabajo, con su pool de hilos compartido y sus contadores.
+    Las ranuras son reentrantes por hilo: un hilo que ya tiene una ranura no espera por otra.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self._limit = limit
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_use = 0
+        self._waiting = 0
+        self._queued = 0
+        self._running = 0
+        self._acquired_total = 0
+        self._wait_seconds_total = 0.0
+        self._peak_in_use = 0
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int):
+        with self._condition:
+            self._limit = limit
+            executor, self._executor = self._executor, None
+            self._condition.notify_all()
+        if executor is not None:
+            # Las tareas ya enviadas terminan en el pool anterior; las nuevas usan uno del nuevo tamaño
+            executor.shutdown(wait=False)
+
+    def acquire(self):
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        if depth:
+            return
+        start = time.perf_counter()
+        with self._condition:
+            self._waiting += 1
+            while self._in_use >= self._limit:
+                self._condition.wait()
+            self._waiting -= 1
+            self._take(start)
+
+    def release(self):
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        self._release()
+
+    async def acquire_async(self):
+        """
+        Como ``acquire``, pero cediendo el bucle de eventos mientras espera. No es reentrante: las
+        corrutinas de un bucle comparten hilo, así que la profundidad por hilo no sirve.
+        """
+        start = time.perf_counter()
+        with self._condition:
+            self._waiting += 1
+        try:
+            while True:
+                with self._condition:
+                    if self._in_use < self._limit:
+                        self._take(start)
+                        return
+                await asyncio.sleep(_ASYNC_POLL_SECONDS)
+        finally:
+            with self._condition:
+                self._waiting -= 1
+
+    def release_async(self):
+        self._release()
+
+    def _take(self, start: float):
+        """Ocupa una ranura; se llama con ``_condition`` tomada."""
+        self._in_use += 1
+        self._acquired_total += 1
+        self._wait_seconds_total += time.perf_counter() - start
+        self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+    def _release(self):
+        with self._condition:
+            self._in_use -= 1
+            self._condition.notify()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        with self._condition:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._limit, thread_name_prefix=f'governor-{self.name}')
+            executor = self._executor
+            self._queued += 1
+        context = contextvars.copy_context()
+        future = executor.submit(context.run, self._run_task, fn, *args, **kwargs)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future):
+        if future.cancelled():
+            with self._condition:
+                self._queued -= 1
+
+    def _run_task(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._condition:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._condition:
+                self._running -= 1
+
+    def metrics(self) -> Dict[str, float]:
+        with self._condition:
+            busy = max(self._in_use, self._running)
+            return {
+                'limit': self._limit,
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'running': self._running,
+                'queued': self._queued,
+                'peak_in_use': self._peak_in_use,
+                'acquired_total': self._acquired_total,
+                'wait_seconds_total': self._wait_seconds_total,
+                'saturation': busy / self._limit if self._limit else 0.0,
+            }
+
+    def shutdown(self):
+        with self._condition:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+class ConcurrencyGovernor:
+    """
+    Planificador compartido por todos los componentes de la ingestión, con un presupuesto de
+    concurrencia independiente por tipo de trabajo: particionado (CPU), llamadas al LLM y
+    llamadas de embeddings.
+
+    - ``submit(budget, fn, ...)`` ejecuta una tarea en el pool compartido del presupuesto, cuyo
+      tamaño es el límite, en lugar de que cada componente abra su propio pool.
+    - ``slot(budget)`` limita una sección (p. ej. la llamada al servicio) sin importar desde qué
+      hilo se haga, de modo que el límite es global aunque los pools estén anidados;
+      ``aslot(budget)`` hace lo mismo desde una corrutina y comparte las mismas ranuras.
+
+    Las tareas enviadas conservan el contexto (``contextvars``) de quien las envía, así que las
+    métricas se siguen atribuyendo a la etapa y el archivo correctos.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None):
+        """
+        :param budgets: Límite de cada presupuesto; los que falten usan ``DEFAULT_BUDGETS``.
+        """
+        self._lock = threading.Lock()
+        self._budgets: Dict[str, _Budget] = {}
+        self.configure(**{**DEFAULT_BUDGETS, **(budgets or {})})
+
+    def configure(self, **limits: int):
+        """
+        Fija el límite de uno o varios presupuestos, p. ej. ``configure(llm=16, embedding=4)``.
+        """
+        for name, limit in limits.items():
+            if limit is None:
+                continue
+            if limit < 1:
+                raise ValueError(f"El límite de concurrencia de '{name}' debe ser al menos 1: {limit}")
+            with self._lock:
+                budget = self._budgets.get(name)
+                if budget is None:
+                    self._budgets[name] = _Budget(name, limit)
+                    continue
+            if budget.limit != limit:
+                budget.set_limit(limit)
+                logger.info(f"Límite de concurrencia de '{name}': {limit}")
+
+    def limit(self, budget: str) -> int:
+        """Devuelve el límite de un presupuesto."""
+        return self._budget(budget).limit
+
+    @contextmanager
+    def slot(self, budget: str) -> Iterator[None]:
+        """Ocupa una ranura del presupuesto durante el bloque; espera si están todas ocupadas."""
+        budget = self._budget(budget)
+        budget.acquire()
+        try:
+            yield
+        finally:
+            budget.release()
+
+    @asynccontextmanager
+    async def aslot(self, budget: str) -> AsyncIterator[None]:
+        """Como ``slot`` para corrutinas: la espera de la ranura cede el bucle de eventos."""
+        budget = self._budget(budget)
+        await budget.acquire_async()
+        try:
+            yield
+        finally:
+            budget.release_async()
+
+    def submit(self, budget: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Ejecuta ``fn`` en el pool compartido del presupuesto."""
+        return self._budget(budget).submit(fn, *args, **kwargs)
+
+    def metrics(self) -> Dict[str, float]:
+        """Ocupación, cola, espera y saturación de cada presupuesto, con claves ``<presupuesto>_<métrica>``."""
+        with self._lock:
+            budgets = list(self._budgets.values())
+        return {
+            f'{budget.name}_{key}': value
+            for budget in budgets
+            for key, value in budget.metrics().items()
+        }
+
+    def shutdown(self):
+        """Cierra los pools compartidos esperando a las tareas en curso."""
+        with self._lock:
+            budgets = list(self._budgets.values())
+        for budget in budgets:
+            budget.shutdown()
+
+    ########################################################
+
+    def _budget(self, name: str) -> _Budget:
+        try:
+            return self._budgets[name]
+        except KeyError:
+            raise ValueError(f"Presupuesto de concurrencia desconocido: '{name}'") from None
+
+
+_default_governor = ConcurrencyGovernor()
+get_metrics().register_gauges('concurrency', _default_governor.metrics)
+
+
+def get_governor() -> ConcurrencyGovernor:
+    """Devuelve el planificador compartido por todos los componentes de la ingestión."""
+    return _default_governor
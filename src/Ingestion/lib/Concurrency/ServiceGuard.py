@@ -0,0 +1,430 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..Metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+# Intervalo máximo entre comprobaciones de las esperas asíncronas (no hay notificación entre hilos)
+_ASYNC_POLL_SECONDS = 0.5
+# Códigos HTTP / gRPC que indican un fallo transitorio del servicio
+_RETRYABLE_HTTP_CODES = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_GRPC_CODES = {'RESOURCE_EXHAUSTED', 'UNAVAILABLE', 'DEADLINE_EXCEEDED', 'INTERNAL', 'ABORTED'}
+# Nombres de excepción de ``google.api_core.exceptions`` y de los clientes HTTP, para clasificar
+# sin importar las librerías del servicio
+_RETRYABLE_EXCEPTION_NAMES = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError', 'BadGateway',
+    'GatewayTimeout', 'DeadlineExceeded', 'Aborted', 'RetryError', 'ConnectTimeout', 'ReadTimeout',
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """El circuito del servicio sigue abierto tras la espera máxima: el servicio no responde."""
+
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Clasifica un error de una llamada al servicio.
+
+    :param error:
+    :return: Si se debe reintentar y la espera indicada por el servicio (``Retry-After``) en segundos.
+    """
+    retry_after = _retry_after(error)
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True, retry_after
+    if type(error).__name__ in _RETRYABLE_EXCEPTION_NAMES:
+        return True, retry_after
+    code = getattr(error, 'code', None)
+    if callable(code):  # grpc.RpcError
+        try:
+            code = code()
+        except Exception:
+            code = None
+    code = getattr(code, 'name', code)
+    status_code = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if code in _RETRYABLE_HTTP_CODES or code in _RETRYABLE_GRPC_CODES or status_code in _RETRYABLE_HTTP_CODES:
+        return True, retry_after
+    return False, None
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Lee ``Retry-After`` (segundos o fecha HTTP) de la respuesta o del propio error."""
+    value = getattr(error, 'retry_after', None)
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if value is None and headers is not None:
+        try:
+            value = headers.get('Retry-After') or headers.get('retry-after')
+        except Exception:
+            value = None
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _TokenBucket:
+    """
+    Cubo de fichas que se rellena a ``rate_per_minute`` fichas por minuto, con capacidad para
+    ``burst_seconds`` segundos de ritmo. ``None`` desactiva el límite.
+    """
+
+    def __init__(self, rate_per_minute: Optional[float], burst_seconds: float):
+        self._condition = threading.Condition()
+        self._rate = None
+        self._capacity = 0.0
+        self._burst_seconds = burst_seconds
+        self._tokens = 0.0
+        self._updated_at = time.monotonic()
+        self.set_rate(rate_per_minute)
+
+    def set_rate(self, rate_per_minute: Optional[float]):
+        with self._condition:
+            self._rate = rate_per_minute / 60.0 if rate_per_minute else None
+            self._capacity = max(1.0, self._rate * self._burst_seconds) if self._rate else 0.0
+            self._tokens = min(self._tokens, self._capacity) if self._tokens else self._capacity
+            self._condition.notify_all()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Espera hasta disponer de ``amount`` fichas y las consume; devuelve los segundos esperados."""
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                wait = self._try_take(amount)
+                if not wait:
+                    break
+                self._condition.wait(wait)
+        return time.monotonic() - start
+
+    async def acquire_async(self, amount: float = 1.0) -> float:
+        """Como ``acquire``, pero cediendo el bucle de eventos mientras espera."""
+        start = time.monotonic()
+        while True:
+            with self._condition:
+                wait = self._try_take(amount)
+            if not wait:
+                break
+            await asyncio.sleep(min(wait, _ASYNC_POLL_SECONDS))
+        return time.monotonic() - start
+
+    def _try_take(self, amount: float) -> float:
+        """Consume las fichas si hay suficientes y devuelve 0; si no, los segundos que faltan."""
+        if self._rate is None:
+            return 0.0
+        # Una petición mayor que la capacidad pasa con el cubo lleno, dejándolo en negativo
+        needed = min(amount, self._capacity)
+        self._refill()
+        if self._tokens >= needed:
+            self._tokens -= amount
+            return 0.0
+        return (needed - self._tokens) / self._rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+
+class _CircuitBreaker:
+    """
+    Tras ``failure_threshold`` fallos transitorios seguidos el circuito se abre durante
+    ``reset_seconds``: las llamadas esperan en lugar de insistir. Después deja pasar una única
+    llamada de prueba (semiabierto); si funciona se cierra y si falla se vuelve a abrir.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self._condition = threading.Condition()
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._opened_total = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def opened_total(self) -> int:
+        return self._opened_total
+
+    def wait_until_allowed(self, max_wait: Optional[float]) -> bool:
+        """
+        Espera a que el circuito permita una llamada; lanza ``CircuitOpenError`` si se supera ``max_wait``.
+
+        :return: Si la llamada es la de prueba (circuito semiabierto).
+        """
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        with self._condition:
+            while True:
+                wait = self._try_enter(deadline)
+                if not wait:
+                    return self._state == self.HALF_OPEN
+                self._condition.wait(wait)
+
+    async def wait_until_allowed_async(self, max_wait: Optional[float]) -> bool:
+        """Como ``wait_until_allowed``, pero cediendo el bucle de eventos mientras espera."""
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+        while True:
+            with self._condition:
+                wait = self._try_enter(deadline)
+                if not wait:
+                    return self._state == self.HALF_OPEN
+            await asyncio.sleep(min(wait, _ASYNC_POLL_SECONDS))
+
+    def _try_enter(self, deadline: Optional[float]) -> float:
+        """Devuelve 0 si la llamada puede pasar (tomando la prueba si está semiabierto) o los segundos a esperar."""
+        if self._state == self.CLOSED:
+            return 0.0
+        now = time.monotonic()
+        reopen_at = self._opened_at + self.reset_seconds
+        if self._state == self.OPEN and now >= reopen_at:
+            self._state = self.HALF_OPEN
+        if self._state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return 0.0
+        if deadline is not None and now >= deadline:
+            raise CircuitOpenError(f'Circuito abierto desde hace {now - self._opened_at:.0f} s')
+        wait = max(0.05, reopen_at - now) if self._state == self.OPEN else self.reset_seconds
+        if deadline is not None:
+            wait = min(wait, deadline - now)
+        return wait
+
+    def record_success(self):
+        with self._condition:
+            if self._state != self.CLOSED:
+                logger.info('Circuito del LLM cerrado: el servicio responde de nuevo')
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._opened_total += 1
+                    logger.warning(f'Circuito del LLM abierto durante {self.reset_seconds:.0f} s '
+                                   f'tras {self._failures} fallos seguidos')
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+                self._condition.notify_all()
+
+    def release_probe(self):
+        """Libera la llamada de prueba cuando terminó con un error que no es del servicio."""
+        with self._condition:
+            self._probing = False
+            self._condition.notify_all()
+
+
+class ServiceGuard:
+    """
+    Protección compartida de las llamadas a un servicio con cuota (Gemini):
+
+    - Limitador de ritmo en el cliente, por peticiones y por tokens por minuto (cubos de fichas),
+      para no superar la cuota en lugar de descubrirla con errores 429.
+    - Reintentos con espera exponencial con jitter completo, respetando ``Retry-After``, solo para
+      los errores transitorios (``classify_error``); el resto se propaga en el primer intento.
+    - Circuito que, ante fallos seguidos, detiene a todos los hilos durante un tiempo y deja pasar
+      una llamada de prueba, en vez de que cientos de hilos reintenten a la vez.
+    """
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_attempts: int = 6,
+                 base_delay: float = 1.0,
+                 max_delay: float = 60.0,
+                 failure_threshold: int = 10,
+                 reset_seconds: float = 30.0,
+                 max_open_wait: Optional[float] = 600.0,
+                 burst_seconds: float = 5.0
+                 ):
+        """
+        :param requests_per_minute: Peticiones por minuto (``None`` sin límite).
+        :param tokens_per_minute: Tokens de entrada estimados por minuto (``None`` sin límite).
+        :param max_attempts: Intentos por llamada ante errores transitorios.
+        :param base_delay: Espera base del primer reintento en segundos.
+        :param max_delay: Espera máxima entre reintentos.
+        :param failure_threshold: Fallos transitorios seguidos que abren el circuito.
+        :param reset_seconds: Tiempo que el circuito permanece abierto antes de la llamada de prueba.
+        :param max_open_wait: Espera máxima de una llamada con el circuito abierto (``None`` sin límite).
+        :param burst_seconds: Segundos de ritmo que se pueden consumir de golpe.
+        """
+        self._requests = _TokenBucket(requests_per_minute, burst_seconds)
+        self._tokens = _TokenBucket(tokens_per_minute, burst_seconds)
+        self._breaker = _CircuitBreaker(failure_threshold, reset_seconds)
+        self._max_attempts = max_attempts
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._max_open_wait = max_open_wait
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {
+            'calls_total': 0,
+            'retries_total': 0,
+            'retryable_errors_total': 0,
+            'fatal_errors_total': 0,
+            'throttle_seconds_total': 0.0,
+            'backoff_seconds_total': 0.0,
+        }
+
+    def configure(self,
+                  requests_per_minute: Optional[float] = None,
+                  tokens_per_minute: Optional[float] = None,
+                  max_attempts: Optional[int] = None,
+                  failure_threshold: Optional[int] = None,
+                  reset_seconds: Optional[float] = None
+                  ):
+        """Ajusta los límites; los parámetros ``None`` no cambian."""
+        if requests_per_minute is not None:
+            self._requests.set_rate(requests_per_minute)
+        if tokens_per_minute is not None:
+            self._tokens.set_rate(tokens_per_minute)
+        if max_attempts is not None:
+            self._max_attempts = max(1, max_attempts)
+        if failure_threshold is not None:
+            self._breaker.failure_threshold = max(1, failure_threshold)
+        if reset_seconds is not None:
+            self._breaker.reset_seconds = reset_seconds
+
+    def call(self, fn: Callable[..., Any], *args: Any, tokens: float = 0, **kwargs: Any) -> Any:
+        """
+        Ejecuta ``fn`` respetando el ritmo, el circuito y la política de reintentos.
+
+        :param fn: La llamada al servicio.
+        :param tokens: Tokens estimados de la petición, para el límite por tokens.
+        :return: El resultado de ``fn``.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = self._breaker.wait_until_allowed(self._max_open_wait)
+            try:
+                self._record_throttle(self._requests.acquire(1) + (self._tokens.acquire(tokens) if tokens else 0.0))
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._handle_error(e, attempt, probe)
+            except BaseException:
+                self._abandon(probe)
+                raise
+            else:
+                self._breaker.record_success()
+                return result
+            time.sleep(delay)
+
+    async def acall(self, fn: Callable[..., Awaitable[Any]], *args: Any, tokens: float = 0, **kwargs: Any) -> Any:
+        """
+        Versión asíncrona de ``call`` para corrutinas: las esperas del ritmo, del circuito y de los
+        reintentos ceden el bucle de eventos en lugar de bloquear un hilo.
+
+        :param fn: Función asíncrona que hace la llamada al servicio.
+        :param tokens: Tokens estimados de la petición, para el límite por tokens.
+        :return: El resultado de ``await fn(...)``.
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            probe = await self._breaker.wait_until_allowed_async(self._max_open_wait)
+            try:
+                throttled = await self._requests.acquire_async(1)
+                if tokens:
+                    throttled += await self._tokens.acquire_async(tokens)
+                self._record_throttle(throttled)
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._handle_error(e, attempt, probe)
+            except BaseException:
+                self._abandon(probe)
+                raise
+            else:
+                self._breaker.record_success()
+                return result
+            await asyncio.sleep(delay)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Espera antes del reintento ``attempt`` (desde 1): exponencial con jitter completo, para que
+        los hilos que fallaron a la vez no reintenten a la vez, y nunca menor que ``Retry-After``.
+        """
+        delay = random.uniform(0, min(self._max_delay, self._base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self._max_delay * 5))
+        return delay
+
+    def metrics(self) -> Dict[str, float]:
+        """Contadores de llamadas, reintentos y esperas, y estado del circuito (1 si está abierto)."""
+        with self._lock:
+            metrics = dict(self._counters)
+        metrics['circuit_open'] = 0.0 if self._breaker.state == _CircuitBreaker.CLOSED else 1.0
+        metrics['circuit_opened_total'] = self._breaker.opened_total
+        return metrics
+
+    ########################################################
+
+    def _record_throttle(self, throttled: float):
+        self._count('calls_total')
+        if throttled:
+            self._count('throttle_seconds_total', throttled)
+
+    def _abandon(self, probe: bool):
+        """
+        La llamada se canceló o se interrumpió (``asyncio.CancelledError``, ``KeyboardInterrupt``)
+        sin respuesta del servicio: si era la de prueba, se libera para que otra llamada la haga.
+        """
+        if probe:
+            self._breaker.release_probe()
+
+    def _handle_error(self, error: Exception, attempt: int, probe: bool) -> float:
+        """Registra un error de la llamada y devuelve la espera antes del reintento, o lo relanza."""
+        retryable, retry_after = classify_error(error)
+        if not retryable:
+            # Un error de la petición (p. ej. argumento no válido) no dice nada del servicio
+            if probe:
+                self._breaker.release_probe()
+            self._count('fatal_errors_total')
+            raise error
+        self._breaker.record_failure()
+        self._count('retryable_errors_total')
+        if attempt >= self._max_attempts:
+            logger.error(f'Llamada al LLM fallida tras {attempt} intentos: {error}')
+            raise error
+        delay = self.backoff_delay(attempt, retry_after)
+        self._count('retries_total')
+        self._count('backoff_seconds_total', delay)
+        get_metrics().increment('retries')
+        logger.warning(f'Error transitorio del LLM: {error}. Reintento {attempt}/{self._max_attempts - 1} '
+                       f'en {delay:.1f} s')
+        return delay
+
+    def _count(self, counter: str, amount: float = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+
+_default_llm_guard = ServiceGuard()
+get_metrics().register_gauges('llm_guard', _default_llm_guard.metrics)
+
+
+def get_llm_guard() -> ServiceGuard:
+    """Devuelve la protección compartida por todas las llamadas al LLM."""
+    return _default_llm_guard
@@ -0,0 +1,2 @@
+from .ConcurrencyGovernor import ConcurrencyGovernor, get_governor, PARTITION, LLM, EMBEDDING
+from .ServiceGuard import ServiceGuard, CircuitOpenError, classify_error, get_llm_guard
\ No newline at end of file
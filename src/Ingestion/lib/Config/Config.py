@@ -7,11 +7,11 @@ from llama_index.core import Settings
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.llms import LLM
 from llama_index.core.node_parser import SemanticSplitterNodeParser
-from llama_index.llms.vertex import Vertex
 import logging
 import sys
 
 from ..library_custom.llama_index.Embedddings import VertexIEmbeddings
+from ..library_custom.llama_index.llms import GuardedVertex
 
 logger = logging.getLogger()
 
@@ -64,7 +64,7 @@ class _Config:
         logger.info(f"LLM configurado: {llm.model}")
 
     def set_gcp_llm_by_name(self, llm_name: str):
-        self.llm = Vertex(model=llm_name)
+        self.llm = GuardedVertex(model=llm_name)
 
     # ---- Embedding ----
     @property
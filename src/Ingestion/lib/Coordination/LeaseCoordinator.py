@@ -0,0 +1,231 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+class LeaseHeldError(RuntimeError):
+    """El trabajo está arrendado por otro nodo; se reintentará más tarde."""
+
+
+class LeaseLostError(RuntimeError):
+    """El arriendo expiró y lo tomó otro nodo antes de que se guardaran los resultados."""
+
+
+class LeaseCoordinator:
+    """
+    Coordinador de trabajos entre varios nodos que ingieren el mismo directorio compartido.
+
+    Cada trabajo (un archivo fuente) se identifica por una clave y una versión (tamaño, fecha
+    y versión del pipeline). Un nodo solo procesa un trabajo si obtiene su arriendo:
+
+    - El arriendo dura ``lease_seconds`` y un hilo lo renueva cada ``heartbeat_interval``
+      mientras el nodo lo mantiene; si el nodo cae, expira y otro nodo lo toma.
+    - Al terminar se registra el resultado (``done`` o ``failed``) para esa versión, de modo que
+      ningún nodo repite el trabajo (ni el gasto en el LLM) hasta que el archivo cambie. Un fallo
+      puede ser transitorio: pasado ``failed_retry_seconds`` la versión fallida se puede arrendar
+      de nuevo, hasta ``max_attempts`` intentos en total entre todos los nodos.
+    - Si un nodo se detiene de forma ordenada libera sus arriendos sin esperar a que expiren.
+
+    El estado se guarda en un archivo SQLite en la ruta compartida, con el diario clásico
+    (``journal_mode=DELETE``) porque WAL no funciona sobre sistemas de archivos de red. Es un
+    sustituto adecuado para pruebas locales o pocos nodos; el interfaz admite otro backend.
+    """
+
+    ACQUIRED = 'acquired'
+    HELD = 'held'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    _STATE_LEASED = 'leased'
+
+    def __init__(self,
+                 db_path: str,
+                 worker_id: Optional[str] = None,
+                 lease_seconds: float = 60.0,
+                 heartbeat_interval: Optional[float] = None,
+                 busy_timeout: float = 30.0,
+                 max_attempts: int = 3,
+                 failed_retry_seconds: float = 600.0
+                 ):
+        """
+        :param db_path: Ruta del archivo SQLite compartido por todos los nodos.
+        :param worker_id: Identificador del nodo; por defecto ``<host>-<pid>-<aleatorio>``.
+        :param lease_seconds: Duración de un arriendo sin renovar.
+        :param heartbeat_interval: Intervalo de renovación; por defecto un tercio de ``lease_seconds``.
+        :param busy_timeout: Espera máxima por el bloqueo de la base de datos compartida.
+        :param max_attempts: Intentos de una versión, entre todos los nodos, antes de dar su fallo por definitivo.
+        :param failed_retry_seconds: Tiempo tras un fallo antes de que la versión se pueda arrendar de nuevo.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self._lease_seconds = lease_seconds
+        self._heartbeat_interval = heartbeat_interval or lease_seconds / 3
+        self._max_attempts = max_attempts
+        self._failed_retry_seconds = failed_retry_seconds
+        self._lock = threading.Lock()
+        self._held: Dict[str, str] = {}
+        self._counters: Dict[str, float] = {
+            'acquired_total': 0,
+            'taken_over_total': 0,
+            'held_by_others_total': 0,
+            'done_elsewhere_total': 0,
+            'failed_retried_total': 0,
+            'lost_total': 0,
+            'heartbeats_total': 0,
+        }
+
+        self._conn = sqlite3.connect(db_path, timeout=busy_timeout, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=DELETE')
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS leases (
+                job_key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                state TEXT NOT NULL,
+                owner TEXT,
+                expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+        self._stop_event = threading.Event()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name='lease-heartbeat', daemon=True)
+        self._heartbeat_thread.start()
+        logger.info(f'Coordinador de arriendos en {db_path} (nodo {self._worker_id})')
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    @property
+    def lease_seconds(self) -> float:
+        return self._lease_seconds
+
+    def try_acquire(self, job_key: str, version: str) -> str:
+        """
+        Intenta arrendar un trabajo.
+
+        :param job_key: Clave del trabajo, igual en todos los nodos (p. ej. la ruta relativa).
+        :param version: Versión del trabajo; un resultado registrado para otra versión no cuenta.
+        :return: ``ACQUIRED`` si el nodo debe procesarlo, ``HELD`` si lo tiene otro nodo,
+            ``DONE`` si ya se procesó esta versión o ``FAILED`` si falló y aún no toca reintentarla.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT version, state, owner, expires_at, attempts, updated_at FROM leases WHERE job_key = ?',
+                    (job_key,)
+                ).fetchone()
+                attempts = 0
+                if row is not None and row[0] == version:
+                    _, state, owner, expires_at, attempts, updated_at = row
+                    if state == self.FAILED and self._can_retry(attempts, updated_at, now):
+                        self._counters['failed_retried_total'] += 1
+                        logger.info(f'Reintento {attempts + 1}/{self._max_attempts} de un trabajo fallido: {job_key}')
+                    elif state in (self.DONE, self.FAILED):
+                        self._conn.execute('COMMIT')
+                        self._counters['done_elsewhere_total'] += 1
+                        return state
+                    elif owner != self._worker_id and expires_at > now:
+                        self._conn.execute('COMMIT')
+                        self._counters['held_by_others_total'] += 1
+                        return self.HELD
+                    elif owner != self._worker_id:
+                        self._counters['taken_over_total'] += 1
+                        logger.warning(f'Arriendo expirado de {owner} tomado: {job_key}')
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO leases (job_key, version, state, owner, expires_at, attempts, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (job_key, version, self._STATE_LEASED, self._worker_id, now + self._lease_seconds,
+                     attempts + 1, now)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._held[job_key] = version
+            self._counters['acquired_total'] += 1
+        return self.ACQUIRED
+
+    def release(self, job_key: str, outcome: Optional[str] = None):
+        """
+        Libera un arriendo del nodo.
+
+        :param job_key:
+        :param outcome: ``DONE`` o ``FAILED`` registra el resultado de la versión arrendada;
+            ``None`` deja el trabajo libre para que otro nodo lo tome.
+        """
+        with self._lock:
+            if self._held.pop(job_key, None) is None:
+                return
+            if outcome is None:
+                self._conn.execute(
+                    'DELETE FROM leases WHERE job_key = ? AND owner = ?', (job_key, self._worker_id)
+                )
+            else:
+                self._conn.execute(
+                    'UPDATE leases SET state = ?, owner = NULL, expires_at = NULL, updated_at = ? '
+                    'WHERE job_key = ? AND owner = ?',
+                    (outcome, time.time(), job_key, self._worker_id)
+                )
+
+    def holds(self, job_key: str) -> bool:
+        """Indica si el nodo mantiene el arriendo (falso si expiró y lo tomó otro nodo)."""
+        with self._lock:
+            return job_key in self._held
+
+    def metrics(self) -> Dict[str, float]:
+        """Arriendos mantenidos por el nodo y contadores acumulados."""
+        with self._lock:
+            metrics = dict(self._counters)
+            metrics['held'] = len(self._held)
+        return metrics
+
+    def close(self):
+        """Detiene la renovación, libera los arriendos que aún se mantienen y cierra la conexión."""
+        self._stop_event.set()
+        self._heartbeat_thread.join()
+        for job_key in list(self._held):
+            self.release(job_key)
+        with self._lock:
+            self._conn.close()
+
+    ########################################################
+
+    def _can_retry(self, attempts: int, failed_at: float, now: float) -> bool:
+        """Si una versión fallida se puede arrendar de nuevo: quedan intentos y pasó el tiempo de espera."""
+        return attempts < self._max_attempts and now - failed_at >= self._failed_retry_seconds
+
+    def _heartbeat_loop(self):
+        while not self._stop_event.wait(self._heartbeat_interval):
+            try:
+                self._renew()
+            except sqlite3.Error as e:
+                # Un fallo puntual del almacenamiento compartido se reintenta en el siguiente latido
+                logger.warning(f'No se pudieron renovar los arriendos: {e}')
+
+    def _renew(self):
+        expires_at = time.time() + self._lease_seconds
+        with self._lock:
+            for job_key in list(self._held):
+                renewed = self._conn.execute(
+                    'UPDATE leases SET expires_at = ? WHERE job_key = ? AND owner = ? AND state = ?',
+                    (expires_at, job_key, self._worker_id, self._STATE_LEASED)
+                ).rowcount
+                if not renewed:
+                    self._held.pop(job_key)
+                    self._counters['lost_total'] += 1
+                    logger.warning(f'Arriendo perdido (otro nodo lo tomó tras expirar): {job_key}')
+            self._counters['heartbeats_total'] += 1
@@ -0,0 +1 @@
+from .LeaseCoordinator import LeaseCoordinator, LeaseHeldError, LeaseLostError
\ No newline at end of file
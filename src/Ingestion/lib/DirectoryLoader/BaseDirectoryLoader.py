@@ -1,15 +1,34 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional, Tuple
 from llama_index.core.schema import Document
 import os
 import logging
 
 
+@dataclass
+class LoadedFile:
+    """
+    Documents loaded from one file by the streaming API.
+
+    Attributes:
+        file_path (str): Path of the source file.
+        documents (List[Document]): Documents of the file (empty if loading failed).
+        error (Optional[BaseException]): Exception raised while loading the file, if any.
+    """
+    file_path: str
+    documents: List[Document] = field(default_factory=list)
+    error: Optional[BaseException] = None
+
+
 class BaseDirectoryLoader(ABC):
     """
     Abstract base class defining the interface for loading documents.
     """
 
+    # Lowercase extensions the loader can load (``None`` accepts any file)
+    SUPPORTED_EXTENSIONS: Optional[Tuple[str, ...]] = None
+
     def __init__(self,
                  directory: Optional[str] = None,
                  files: Optional[List[str]] = None
@@ -24,6 +43,12 @@ class BaseDirectoryLoader(ABC):
         self._logger = logging.getLogger(__name__)
         self._logger.propagate = True
 
+    def supports(self, file_path: str) -> bool:
+        """Whether the loader can load a file, judging by its extension."""
+        if self.SUPPORTED_EXTENSIONS is None:
+            return True
+        return os.path.splitext(file_path)[1].lower() in self.SUPPORTED_EXTENSIONS
+
     @abstractmethod
     def _load_documents(self, files: List[str]) -> List[Document]:
         """
@@ -57,6 +82,60 @@ class BaseDirectoryLoader(ABC):
 
         return list(unique_files.values())
 
+    def _iter_loaded_files(self, files: Iterable[str], prefetch: int) -> Iterator[LoadedFile]:
+        """
+        Yields the documents of every file as soon as they are loaded. Subclasses that load files
+        in parallel override it to yield in completion order with at most ``prefetch`` files in
+        flight; this default loads the files one by one.
+        """
+        for file_path in files:
+            try:
+                yield LoadedFile(file_path, self._load_documents([file_path]))
+            except Exception as e:
+                self._logger.exception(f"Error loading {file_path}")
+                yield LoadedFile(file_path, error=e)
+
+    def iter_files(self, files: Iterable[str], prefetch: Optional[int] = None) -> Iterator[LoadedFile]:
+        """
+        Streams the documents of the given files, one ``LoadedFile`` per file, in completion order.
+        Only ``prefetch`` files are loaded ahead of the consumer, so memory stays flat however many
+        files there are. A file that fails to load is yielded with its ``error`` set instead of
+        stopping the iteration.
+
+        :param files: Paths to load, used as given (no de-duplication by name).
+        :param prefetch: Maximum number of files loaded but not yet consumed.
+        :return:
+        """
+        return self._iter_loaded_files(files, prefetch or self._default_prefetch())
+
+    def _default_prefetch(self) -> int:
+        """Number of files loaded ahead of the consumer when no ``prefetch`` is given."""
+        return 1
+
+    def iter_from(self,
+                  directory: Optional[str] = None,
+                  files: Optional[List[str]] = None,
+                  prefetch: Optional[int] = None
+                  ) -> Iterator[LoadedFile]:
+        """
+        Streaming version of ``load_from``: yields the documents of each file as soon as they are ready.
+        :param directory:
+        :param files:
+        :param prefetch:
+        :return:
+        """
+        files = self._clean_file_list(directory, files)
+        if not files:
+            self._logger.warning("No files to load.")
+        self._logger.info(f"Streaming documents from: {len(files)} files")
+        return self.iter_files(files, prefetch)
+
+    def __iter__(self) -> Iterator[LoadedFile]:
+        """
+        Streams the documents of the files given to the constructor.
+        """
+        return self.iter_files(self._files)
+
     def load_from(self,
                   directory: Optional[str] = None,
                   files: Optional[List[str]] = None
@@ -1,16 +1,100 @@
+import hashlib
+import logging
 import os
-from typing import List, Optional
-from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 
 from llama_index.core import Document
 import pandas as pd
 from llama_index.core.schema import NodeRelationship, RelatedNodeInfo
 from pandas import DataFrame
+from pypdf import PdfReader, PdfWriter
 
 from unstructured.partition.pdf import partition_pdf
 from unstructured.staging.base import convert_to_dataframe
 
-from .BaseDirectoryLoader import BaseDirectoryLoader
+from .BaseDirectoryLoader import BaseDirectoryLoader, LoadedFile
+from ._PageAnalysis import STRATEGY_FAST, STRATEGY_HI_RES, classify_pages
+from ..Concurrency import PARTITION, get_governor
+from ..Metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+EXECUTION_MODES = ('thread', 'process')
+PARTITION_STRATEGIES = (STRATEGY_HI_RES, 'adaptive')
+
+
+def _init_partition_worker():
+    """
+    Initializer for the partition worker processes: loads the hi_res layout model once per
+    process so that every file handled by the worker reuses it.
+    """
+    try:
+        from unstructured_inference.models.base import get_model
+        get_model()
+    except Exception as e:
+        logger.warning(f"No se pudo precargar el modelo de layout en el worker: {e}")
+
+
+def _partition_pdf_to_dataframe(file_path: str,
+                                image_output_dir: str,
+                                page_range: Optional[Tuple[int, int]] = None,
+                                strategy: str = STRATEGY_HI_RES) -> DataFrame:
+    """
+    Partitions a PDF (or only the pages in ``page_range``) with the given strategy
+    and returns the elements as a DataFrame.
+
+    It is a module level function so it can run in a worker process; returning the flat
+    DataFrame instead of the ``Element`` objects keeps the data sent back to the parent small.
+
+    :param file_path:
+    :param image_output_dir:
+    :param page_range: First and last page (1-based, inclusive) to partition, or ``None`` for the whole file.
+    :param strategy: ``'hi_res'`` (layout detection, OCR and image crops) or ``'fast'`` (text layer only).
+    :return:
+    """
+    if page_range is None:
+        return convert_to_dataframe(_partition_pdf(file_path, image_output_dir, strategy))
+
+    first_page, last_page = page_range
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shard_path = os.path.join(tmp_dir, os.path.basename(file_path))
+        writer = PdfWriter()
+        for page in PdfReader(file_path).pages[first_page - 1:last_page]:
+            writer.add_page(page)
+        with open(shard_path, 'wb') as shard_file:
+            writer.write(shard_file)
+
+        # Page numbers and file name of the elements refer to the original document
+        elements = _partition_pdf(
+            shard_path,
+            os.path.join(image_output_dir, f"pages-{first_page:05d}-{last_page:05d}"),
+            strategy,
+            starting_page_number=first_page,
+            metadata_filename=file_path
+        )
+    return convert_to_dataframe(elements)
+
+
+def _partition_pdf(file_path: str, image_output_dir: str, strategy: str = STRATEGY_HI_RES, **kwargs: Any) -> list:
+    """Calls ``partition_pdf`` with the options used by the loader for the given strategy."""
+    if strategy == STRATEGY_FAST:
+        return partition_pdf(filename=file_path, strategy=STRATEGY_FAST, **kwargs)
+    return partition_pdf(
+        filename=file_path,  # mandatory
+        strategy="hi_res",  # mandatory to use ``hi_res`` strategy
+        extract_images_in_pdf=True,  # mandatory to set as ``True``
+        extract_image_block_types=["Image", "Table"],  # optional
+        infer_table_structure=True,  # ``text_as_html`` lets tables be converted without the multimodal model
+        extract_image_block_to_payload=False,  # optional
+        extract_image_block_output_dir=image_output_dir,
+        # optional - only works when ``extract_image_block_to_payload=False``
+        **kwargs
+    )
 
 
 class Unstructured_UF_Loader(BaseDirectoryLoader):
@@ -24,10 +108,16 @@ class Unstructured_UF_Loader(BaseDirectoryLoader):
         unique_files_in_source (List[str]): List of paths to unique files found in source_dir.
     """
 
+    SUPPORTED_EXTENSIONS = ('.pdf',)
+
     def __init__(self,
                  directory: Optional[str] = None,
                  files: Optional[List[str]] = None,
-                 image_path_output: str = None
+                 image_path_output: str = None,
+                 execution_mode: str = 'thread',
+                 max_workers: Optional[int] = None,
+                 pages_per_shard: Optional[int] = None,
+                 partition_strategy: str = STRATEGY_HI_RES
                  ):
         """
         Initializes the BaseDirectoryLoader with the specified directory and files.
@@ -35,7 +125,28 @@ class Unstructured_UF_Loader(BaseDirectoryLoader):
         :param directory:
         :param files:
         :param image_path_output:
+        :param execution_mode: ``'thread'`` (default) or ``'process'`` to partition PDFs in a
+            pool of processes, which scales the CPU-bound layout detection and OCR across cores.
+        :param max_workers: Number of worker processes in ``'process'`` mode. In ``'thread'`` mode files are
+            partitioned in the shared pool of the concurrency governor, sized by its ``partition`` budget.
+            Defaults to that budget; it is also the default number of files prefetched when streaming.
+        :param pages_per_shard: If set, PDFs with more pages are split into windows of this many
+            pages that are partitioned in parallel and merged back into one ordered element stream.
+        :param partition_strategy: ``'hi_res'`` (default) partitions every page with layout detection and
+            OCR. ``'adaptive'`` inspects each page first and only sends pages with images, figures, tables,
+            complex layouts or no usable text layer to ``hi_res``; the rest use the ``fast`` text extraction.
         """
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f"execution_mode debe ser uno de {EXECUTION_MODES}: '{execution_mode}'")
+        if partition_strategy not in PARTITION_STRATEGIES:
+            raise ValueError(f"partition_strategy debe ser uno de {PARTITION_STRATEGIES}: '{partition_strategy}'")
+        self._execution_mode = execution_mode
+        self._max_workers = max_workers
+        self._pages_per_shard = pages_per_shard
+        self._partition_strategy = partition_strategy
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
         try:
             os.makedirs(image_path_output, exist_ok=True)
             self._image_path_output = image_path_output
@@ -45,11 +156,15 @@ class Unstructured_UF_Loader(BaseDirectoryLoader):
 
         super().__init__(directory, files)
 
-    def _df_to_documents(self, df: DataFrame) -> List[Document]:
+    def _df_to_documents(self, df: DataFrame, lazy: bool = False) -> Union[List[Document], Iterator[Document]]:
         """
         Converts a DataFrame to a list of Document instances.
 
+        Node ids and the previous/next links are computed on whole columns and the documents are
+        built in a single loop over plain Python lists, instead of two row-wise ``apply`` calls.
+
         :param df:
+        :param lazy: If ``True`` returns a generator that builds each Document when it is consumed.
         :return:
         """
         required_columns = ['text', 'type', 'filetype', 'languages', 'page_number', 'filename', 'title', 'image_path']
@@ -57,77 +172,260 @@ class Unstructured_UF_Loader(BaseDirectoryLoader):
         if missing_columns:
             raise ValueError(f"Faltan las siguientes columnas requeridas en el DataFrame: {missing_columns}")
 
-        df['node_id'] = df.apply(lambda row: f"{row.name}_{row['title']}", axis=1)
-        df['previous_node_id'] = df['node_id'].shift(1)
-        df['next_node_id'] = df['node_id'].shift(-1)
-
-        def create_document(row):
-            document = Document(
-                id_=row['node_id'],
-                text=row['text'],
-                metadata={
-                    'block_type': row['type'],
-                    'file_type': row['filetype'],
-                    'languages': row['languages'],
-                    'page_number': row['page_number'],
-                    'file_name': row['filename'],
-                    'title_of_the_document': row['title'],
-                    'image_path': row['image_path']
-                },
-                excluded_llm_metadata_keys=[],
-                excluded_embed_metadata_keys=[]
+        node_ids = (df.index.astype(str) + '_' + df['title'].astype(str)).tolist()
+        columns = [df[column].tolist() for column in required_columns]
+        # hi_res only fills ``text_as_html`` for the tables whose structure it could infer
+        tables_html = df['text_as_html'].tolist() if 'text_as_html' in df.columns else [None] * len(node_ids)
+        documents = self._iter_documents(node_ids, *columns, tables_html)
+        return documents if lazy else list(documents)
+
+    def _iter_documents(self,
+                        node_ids: List[str],
+                        texts: List[str],
+                        block_types: List[str],
+                        file_types: List[str],
+                        languages: List[Any],
+                        page_numbers: List[Any],
+                        file_names: List[str],
+                        titles: List[str],
+                        image_paths: List[Optional[str]],
+                        tables_html: List[Optional[str]]) -> Iterator[Document]:
+        """
+        Builds the Documents of the element columns, linking each one to its neighbours.
+
+        The ``text_as_html`` structure that hi_res infers for a table is kept in its metadata, out of
+        the LLM and embedding views, so the table can be converted locally instead of transcribed.
+        ``block_occurrence`` numbers the repeated blocks of a document so that the block hash and it
+        identify every block, which gives its nodes stable ids across reprocessing. ``source_id``
+        identifies the source file for the block cache and those ids; it defaults to the title, and
+        the watcher replaces it with the file path relative to the watch directory, since files with
+        the same stem in different folders share the title.
+        """
+        last = len(node_ids) - 1
+        occurrences = defaultdict(int)
+        for i, node_id in enumerate(node_ids):
+            relationships = {}
+            if i > 0:
+                relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=node_ids[i - 1])
+            if i < last:
+                relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=node_ids[i + 1])
+            block_hash = self._block_hash(block_types[i], texts[i], image_paths[i])
+            metadata = {
+                'block_type': block_types[i],
+                'file_type': file_types[i],
+                'languages': languages[i],
+                'page_number': page_numbers[i],
+                'file_name': file_names[i],
+                'title_of_the_document': titles[i],
+                'image_path': image_paths[i],
+                'block_hash': block_hash,
+                'block_occurrence': occurrences[block_hash],
+                'source_id': titles[i]
+            }
+            occurrences[block_hash] += 1
+            excluded_keys = ['block_hash', 'block_occurrence', 'source_id']
+            # Missing values come as NaN from the DataFrame
+            if isinstance(tables_html[i], str) and tables_html[i]:
+                metadata['text_as_html'] = tables_html[i]
+                excluded_keys.append('text_as_html')
+            yield Document(
+                id_=node_id,
+                text=texts[i],
+                metadata=metadata,
+                excluded_llm_metadata_keys=excluded_keys,
+                excluded_embed_metadata_keys=list(excluded_keys),
+                relationships=relationships
             )
-            if pd.notna(row['previous_node_id']):
-                document.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(
-                    node_id=row['previous_node_id']
-                )
-            if pd.notna(row['next_node_id']):
-                document.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(
-                    node_id=row['next_node_id']
-                )
-            return document
 
-        df['documents'] = df.apply(create_document, axis=1)
-        return df['documents'].tolist()
+    @staticmethod
+    def _block_hash(block_type: str, text: str, image_path: Optional[str]) -> str:
+        """
+        Content hash of a block: its type, its text and, for Image/Table blocks, the bytes of the
+        extracted crop. It identifies unchanged blocks between two versions of a document.
+        """
+        digest = hashlib.sha256(f"{block_type}\x1f{text}".encode('utf-8'))
+        if isinstance(image_path, str) and os.path.isfile(image_path):
+            with open(image_path, 'rb') as image_file:
+                digest.update(image_file.read())
+        return digest.hexdigest()
+
+    def _plan_shards(self, file_path: str) -> List[Tuple[Optional[Tuple[int, int]], str]]:
+        """
+        Splits a PDF into runs of consecutive pages that use the same partition strategy and then
+        into windows of at most ``pages_per_shard`` pages. Returns ``[(None, strategy)]`` (the whole
+        file in one call) when the file does not need to be split.
+
+        :param file_path:
+        :return: The page range and the strategy of every shard, in page order.
+        """
+        if self._partition_strategy == STRATEGY_HI_RES and not self._pages_per_shard:
+            return [(None, STRATEGY_HI_RES)]
+        try:
+            reader = PdfReader(file_path)
+            if self._partition_strategy == STRATEGY_HI_RES:
+                strategies = [STRATEGY_HI_RES] * len(reader.pages)
+            else:
+                strategies = classify_pages(reader)
+        except Exception as e:
+            logger.warning(f"No se pudieron analizar las páginas de {file_path}, se procesa completo en hi_res: {e}")
+            return [(None, STRATEGY_HI_RES)]
+        page_count = len(strategies)
+
+        runs = []
+        for page_number, strategy in enumerate(strategies, start=1):
+            if runs and runs[-1][2] == strategy:
+                runs[-1][1] = page_number
+            else:
+                runs.append([page_number, page_number, strategy])
+
+        if self._partition_strategy != STRATEGY_HI_RES:
+            fast_pages = strategies.count(STRATEGY_FAST)
+            get_metrics().increment('pages_fast', fast_pages)
+            get_metrics().increment('pages_hi_res', page_count - fast_pages)
+            logger.info(f"{file_path}: {fast_pages}/{page_count} páginas con estrategia fast")
+
+        if len(runs) <= 1 and (not self._pages_per_shard or page_count <= self._pages_per_shard):
+            return [(None, runs[0][2] if runs else STRATEGY_HI_RES)]
+
+        window = self._pages_per_shard or page_count
+        shards = [
+            ((first_page, min(first_page + window - 1, last_page)), strategy)
+            for run_first, last_page, strategy in runs
+            for first_page in range(run_first, last_page + 1, window)
+        ]
+        logger.info(f"{file_path}: {page_count} páginas divididas en {len(shards)} fragmentos")
+        return shards
+
+    @staticmethod
+    def _merge_shards(frames: List[DataFrame]) -> DataFrame:
+        """
+        Concatenates the shard DataFrames of a file in page order. The index is rebuilt so it is
+        the position of the element in the whole document, the same one an unsharded call gives,
+        which keeps node ids independent of the shard that produced them.
+        """
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return DataFrame()
+        if len(frames) == 1:
+            return frames[0].reset_index(drop=True)
+        return pd.concat(frames, ignore_index=True)
 
-    def _read_file(self, file_path: str) -> List[Document]:
+    def _dataframe_to_documents(self, file_path: str, df: DataFrame) -> List[Document]:
         """
-        Reads the file at the specified path and returns a list of Document instances.
+        Adds the document title to the partition DataFrame of a file and converts it to Documents.
 
         :param file_path:
+        :param df:
         :return:
         """
-        base_name = os.path.basename(file_path)
-        file_name, file_ext = os.path.splitext(base_name)
-        if file_ext.lower() != '.pdf':
+        if df.empty:
+            logger.warning(f"No se extrajo ningún elemento de {file_path}")
             return []
-
-        elements = partition_pdf(
-            filename=file_path,  # mandatory
-            strategy="hi_res",  # mandatory to use ``hi_res`` strategy
-            extract_images_in_pdf=True,  # mandatory to set as ``True``
-            extract_image_block_types=["Image", "Table"],  # optional
-            extract_image_block_to_payload=False,  # optional
-            extract_image_block_output_dir=os.path.join(self._image_path_output, file_name),
-            # optional - only works when ``extract_image_block_to_payload=False``
-        )
-        df: DataFrame = convert_to_dataframe(elements)
+        file_name = os.path.splitext(os.path.basename(file_path))[0]
         df['title'] = file_name
-
+        if 'image_path' not in df.columns:
+            # Documents without Image/Table crops (e.g. only fast pages) have no image_path column
+            df['image_path'] = None
         return self._df_to_documents(df)
 
+    def _submit(self, fn: Callable[..., DataFrame], *args: Any) -> Future:
+        """
+        Submits a partition task. In thread mode it runs in the governor's shared ``partition`` pool,
+        so every file being loaded shares one CPU budget. In process mode it goes to the loader's
+        process pool, created once and kept alive so the layout model is loaded only once per worker.
+        """
+        if self._execution_mode == 'thread':
+            return get_governor().submit(PARTITION, fn, *args)
+        with self._executor_lock:
+            if self._executor is None:
+                max_workers = self._max_workers or get_governor().limit(PARTITION)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    initializer=_init_partition_worker
+                )
+                logger.info(f"Pool de {max_workers} procesos creado para particionar PDFs")
+            return self._executor.submit(fn, *args)
+
+    def _submit_file(self, file_path: str) -> List[Future]:
+        """Submits every page window of a file and returns their futures in page order."""
+        file_name = os.path.splitext(os.path.basename(file_path))[0]
+        image_output_dir = os.path.join(self._image_path_output, file_name)
+        return [
+            self._submit(_partition_pdf_to_dataframe, file_path, image_output_dir, page_range, strategy)
+            for page_range, strategy in self._plan_shards(file_path)
+        ]
+
+    def _collect_file(self, file_path: str, futures: List[Future]) -> LoadedFile:
+        """Merges the finished page windows of a file and converts them to Documents."""
+        try:
+            df = self._merge_shards([future.result() for future in futures])
+            return LoadedFile(file_path, self._dataframe_to_documents(file_path, df))
+        except Exception as e:
+            logger.exception(f"Error al cargar el archivo {file_path}")
+            return LoadedFile(file_path, error=e)
+
+    def _default_prefetch(self) -> int:
+        return self._max_workers or get_governor().limit(PARTITION)
+
+    def _iter_loaded_files(self, files: Iterable[str], prefetch: int) -> Iterator[LoadedFile]:
+        """
+        Partitions the files in the pool and yields each one as soon as all its page windows are
+        done, in completion order. At most ``prefetch`` files are submitted and not yet consumed,
+        and the next file is only submitted when one is handed to the consumer, so the elements
+        held in memory do not grow with the number of files.
+        """
+        pdf_files = (f for f in files if self.supports(f))
+        in_flight: Dict[str, List[Future]] = {}
+        owners: Dict[Future, str] = {}
+
+        def submit_next() -> bool:
+            file_path = next(pdf_files, None)
+            if file_path is None:
+                return False
+            in_flight[file_path] = self._submit_file(file_path)
+            owners.update({future: file_path for future in in_flight[file_path]})
+            return True
+
+        try:
+            while len(in_flight) < prefetch and submit_next():
+                pass
+            while owners:
+                done, _ = wait(list(owners), return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = owners.pop(future)
+                    futures = in_flight.get(file_path)
+                    if futures is None or not all(f.done() for f in futures):
+                        continue
+                    del in_flight[file_path]
+                    # Se repone el archivo antes de entregarlo para que el pool no quede ocioso
+                    submit_next()
+                    yield self._collect_file(file_path, futures)
+        finally:
+            for future in owners:
+                future.cancel()
+
     def _load_documents(self, files: List[str]) -> List[Document]:
         """
         Loads unstructured documents from the unique files in the source directory
-        using multithreading to improve performance.
+        using the governor's shared thread pool (or a process pool when ``execution_mode='process'``)
+        to improve performance. Every page window of every file is submitted to the
+        pool at once, so a large PDF is spread across all the workers.
 
         Returns:
             List[Document]: A list of Document instances.
         """
-        documents = []
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            results = executor.map(self._read_file, files)
-            for result in results:
-                documents.extend(result)
+        pdf_files = [f for f in files if self.supports(f)]
+        scheduled = [(file_path, self._submit_file(file_path)) for file_path in pdf_files]
 
+        documents = []
+        for file_path, futures in scheduled:
+            df = self._merge_shards([future.result() for future in futures])
+            documents.extend(self._dataframe_to_documents(file_path, df))
         return documents
+
+    def close(self):
+        """Shuts down the process pool, if any."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
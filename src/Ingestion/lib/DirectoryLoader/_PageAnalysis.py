@@ -0,0 +1,84 @@
+import logging
+import re
+from typing import List
+
+from pypdf import PageObject, PdfReader
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+STRATEGY_FAST = 'fast'
+STRATEGY_HI_RES = 'hi_res'
+
+# Una página con menos caracteres en su capa de texto se considera escaneada o solo gráfica
+MIN_TEXT_CHARS = 50
+# Proporción máxima de caracteres ilegibles (glifos sin mapa Unicode) de una capa de texto válida
+MAX_GARBLED_RATIO = 0.05
+# Operadores de trazado (rectángulos y líneas) a partir de los cuales la página tiene tablas o gráficos
+MAX_PATH_OPERATORS = 40
+
+_PATH_OPERATOR_PATTERN = re.compile(rb'\s(?:re|l)\s')
+# Pie de tabla o figura al inicio de una línea: las tablas con pocas reglas no se detectan por el trazado
+_CAPTION_PATTERN = re.compile(r'^\s*(?:Table|Tabla|Figure|Figura|Fig\.)\s*\d+\s*[:.]', re.MULTILINE)
+_GARBLED_PATTERN = re.compile(r'\(cid:\d+\)|[\ufffd\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def classify_pages(reader: PdfReader) -> List[str]:
+    """
+    Decides, page by page, whether a PDF page needs ``hi_res`` layout detection and OCR or whether
+    the ``fast`` text-layer extraction gives the same elements. It only reads the PDF structure:
+    the text layer, the XObjects, the table and figure captions and the number of drawing operators.
+
+    :param reader:
+    :return: The strategy of every page, in page order.
+    """
+    strategies = []
+    for page_number, page in enumerate(reader.pages, start=1):
+        try:
+            strategies.append(classify_page(page))
+        except Exception as e:
+            logger.debug(f"No se pudo analizar la página {page_number}, se usa {STRATEGY_HI_RES}: {e}")
+            strategies.append(STRATEGY_HI_RES)
+    return strategies
+
+
+def classify_page(page: PageObject) -> str:
+    """
+    Returns ``'hi_res'`` for pages with images or embedded figures (their crops are extracted),
+    without a usable text layer (scanned or garbled), with table or figure captions, or with many
+    drawn lines and rectangles (tables, charts, complex layouts), and ``'fast'`` for born-digital
+    text pages.
+
+    :param page:
+    :return:
+    """
+    if _has_graphics(page.get('/Resources')):
+        return STRATEGY_HI_RES
+
+    text = page.extract_text() or ''
+    visible_chars = len(text) - text.count(' ') - text.count('\n')
+    if visible_chars < MIN_TEXT_CHARS:
+        return STRATEGY_HI_RES
+    garbled_chars = sum(len(match) for match in _GARBLED_PATTERN.findall(text))
+    if garbled_chars / visible_chars > MAX_GARBLED_RATIO:
+        return STRATEGY_HI_RES
+    if _CAPTION_PATTERN.search(text):
+        return STRATEGY_HI_RES
+
+    contents = page.get_contents()
+    if contents is not None and len(_PATH_OPERATOR_PATTERN.findall(contents.get_data())) > MAX_PATH_OPERATORS:
+        return STRATEGY_HI_RES
+    return STRATEGY_FAST
+
+
+def _has_graphics(resources) -> bool:
+    """Looks for image or form XObjects (embedded raster images and vector figures) in the page resources."""
+    if resources is None:
+        return False
+    xobjects = resources.get_object().get('/XObject')
+    if xobjects is None:
+        return False
+    return any(
+        xobject.get_object().get('/Subtype') in ('/Image', '/Form')
+        for xobject in xobjects.get_object().values()
+    )
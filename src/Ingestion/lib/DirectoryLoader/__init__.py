@@ -1 +1,2 @@
+from .BaseDirectoryLoader import BaseDirectoryLoader, LoadedFile
 from .Unstructured_UF_Loader import Unstructured_UF_Loader
\ No newline at end of file
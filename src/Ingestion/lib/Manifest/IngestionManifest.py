@@ -0,0 +1,287 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """
+    Huella de un archivo fuente en el momento de leerlo.
+
+    Attributes:
+        path (str): Ruta absoluta del archivo.
+        size (int): Tamaño en bytes.
+        mtime_ns (int): Fecha de modificación en nanosegundos.
+        content_hash (str): Hash SHA-256 del contenido.
+    """
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """
+    Registro del manifiesto para un archivo fuente ya visto por la ingesta.
+    """
+    path: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    pipeline_version: str
+    status: str
+    output_path: Optional[str]
+    updated_at: float
+
+
+class IngestionManifest:
+    """
+    Manifiesto persistente (SQLite) de los archivos ingeridos.
+
+    Cada archivo fuente se identifica por su ruta absoluta y se considera procesado
+    solo si su tamaño, fecha de modificación, hash de contenido y versión del pipeline
+    coinciden con los del último procesamiento exitoso. La comprobación rápida usa
+    únicamente ``os.stat``; el hash solo se calcula cuando el tamaño o la fecha cambian.
+    """
+
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    _HASH_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, db_path: str, pipeline_version: str = '1'):
+        """
+        Abre (o crea) el manifiesto en la ruta indicada.
+
+        :param db_path: Ruta del archivo SQLite.
+        :param pipeline_version: Versión del pipeline; cambiarla invalida todos los registros.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db_path = db_path
+        self._pipeline_version = str(pipeline_version)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                pipeline_version TEXT NOT NULL,
+                status TEXT NOT NULL,
+                output_path TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_files_hash ON files (content_hash)')
+        self._conn.commit()
+
+        # Copia en memoria para que la comprobación de arranque no consulte SQLite por archivo
+        self._entries: Dict[str, ManifestEntry] = {
+            row[0]: ManifestEntry(*row) for row in self._conn.execute(
+                'SELECT path, size, mtime_ns, content_hash, pipeline_version, status, output_path, updated_at '
+                'FROM files'
+            )
+        }
+        logger.info(f'Manifiesto cargado desde {db_path}: {len(self._entries)} registros')
+
+    # ---- Pipeline Version ----
+    @property
+    def pipeline_version(self) -> str:
+        """Get the pipeline version."""
+        return self._pipeline_version
+
+    ########################################################
+
+    @staticmethod
+    def normalize_path(file_path: str) -> str:
+        """Normaliza la ruta usada como clave del manifiesto."""
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def get(self, file_path: str) -> Optional[ManifestEntry]:
+        """Devuelve el registro de un archivo o ``None`` si no existe."""
+        return self._entries.get(self.normalize_path(file_path))
+
+    def fingerprint(self, file_path: str) -> FileFingerprint:
+        """
+        Calcula la huella (tamaño, fecha y hash de contenido) de un archivo.
+
+        :param file_path:
+        :return:
+        """
+        stat = os.stat(file_path)
+        return FileFingerprint(
+            path=self.normalize_path(file_path),
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            content_hash=self._hash_file(file_path)
+        )
+
+    def needs_processing(self, file_path: str, stat: Optional[os.stat_result] = None) -> bool:
+        """
+        Indica si un archivo debe (re)procesarse.
+
+        Si el tamaño y la fecha coinciden con el registro se omite sin leer el archivo.
+        Si difieren pero el hash de contenido es el mismo (p. ej. una copia o un ``touch``)
+        se actualiza el registro y tampoco se reprocesa.
+
+        :param file_path:
+        :param stat: Resultado de ``os.stat`` si ya se tiene, para evitar una llamada extra.
+        :return:
+        """
+        entry = self.get(file_path)
+        if entry is None or entry.status != self.STATUS_DONE or entry.pipeline_version != self._pipeline_version:
+            return True
+
+        stat = stat or os.stat(file_path)
+        if entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+            return False
+
+        content_hash = self._hash_file(file_path)
+        if content_hash != entry.content_hash:
+            return True
+
+        self._upsert(ManifestEntry(
+            path=entry.path,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            content_hash=content_hash,
+            pipeline_version=entry.pipeline_version,
+            status=entry.status,
+            output_path=entry.output_path,
+            updated_at=time.time()
+        ))
+        logger.debug(f'Archivo sin cambios de contenido, registro actualizado: {file_path}')
+        return False
+
+    def scan(self, directory: str, extensions: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Recorre recursivamente un directorio y devuelve los archivos que deben procesarse.
+
+        :param directory:
+        :param extensions: Extensiones en minúsculas a considerar (``None`` considera todos los archivos).
+        :return:
+        """
+        extensions = tuple(extensions) if extensions is not None else None
+        start = time.perf_counter()
+        total = 0
+        pending = []
+        for path, stat in self._iter_files(directory):
+            if extensions is not None and os.path.splitext(path)[1].lower() not in extensions:
+                continue
+            total += 1
+            if self.needs_processing(path, stat):
+                pending.append(path)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logger.info(f'Manifiesto: {len(pending)}/{total} archivos por procesar en {directory} ({elapsed_ms:.1f} ms)')
+        return pending
+
+    def find_missing(self, directory: str) -> List[ManifestEntry]:
+        """
+        Devuelve los registros de archivos dentro de ``directory`` que ya no existen en disco
+        (eliminados o movidos mientras la ingesta no estaba en ejecución).
+
+        :param directory:
+        :return:
+        """
+        prefix = os.path.join(self.normalize_path(directory), '')
+        return [
+            entry for path, entry in list(self._entries.items())
+            if path.startswith(prefix) and not os.path.exists(path)
+        ]
+
+    def mark_done(self, fingerprint: FileFingerprint, output_path: Optional[str]):
+        """
+        Registra un procesamiento exitoso con la huella tomada antes de procesar el archivo.
+
+        Se usa la huella previa para que una modificación ocurrida durante el procesamiento
+        vuelva a detectarse en la siguiente comprobación.
+
+        :param fingerprint:
+        :param output_path:
+        """
+        self._upsert(ManifestEntry(
+            path=fingerprint.path,
+            size=fingerprint.size,
+            mtime_ns=fingerprint.mtime_ns,
+            content_hash=fingerprint.content_hash,
+            pipeline_version=self._pipeline_version,
+            status=self.STATUS_DONE,
+            output_path=output_path,
+            updated_at=time.time()
+        ))
+
+    def mark_failed(self, fingerprint: FileFingerprint):
+        """Registra un procesamiento fallido; el archivo se reintentará en el próximo escaneo."""
+        previous = self._entries.get(fingerprint.path)
+        self._upsert(ManifestEntry(
+            path=fingerprint.path,
+            size=fingerprint.size,
+            mtime_ns=fingerprint.mtime_ns,
+            content_hash=fingerprint.content_hash,
+            pipeline_version=self._pipeline_version,
+            status=self.STATUS_FAILED,
+            output_path=previous.output_path if previous else None,
+            updated_at=time.time()
+        ))
+
+    def remove(self, file_path: str) -> Optional[ManifestEntry]:
+        """Elimina el registro de un archivo y lo devuelve."""
+        path = self.normalize_path(file_path)
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            self._conn.execute('DELETE FROM files WHERE path = ?', (path,))
+            self._conn.commit()
+        return entry
+
+    def close(self):
+        """Cierra la conexión con la base de datos."""
+        with self._lock:
+            self._conn.close()
+
+    ########################################################
+
+    def _upsert(self, entry: ManifestEntry):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO files '
+                '(path, size, mtime_ns, content_hash, pipeline_version, status, output_path, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (entry.path, entry.size, entry.mtime_ns, entry.content_hash, entry.pipeline_version,
+                 entry.status, entry.output_path, entry.updated_at)
+            )
+            self._conn.commit()
+            self._entries[entry.path] = entry
+
+    def _hash_file(self, file_path: str) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(self._HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _iter_files(directory: str) -> Iterator:
+        """Recorre el directorio con ``os.scandir`` reutilizando el ``stat`` de cada entrada."""
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        yield entry.path, entry.stat()
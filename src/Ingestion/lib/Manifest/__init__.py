@@ -0,0 +1 @@
+from .IngestionManifest import IngestionManifest, FileFingerprint, ManifestEntry
\ No newline at end of file
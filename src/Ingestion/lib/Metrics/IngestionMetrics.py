@@ -0,0 +1,257 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+UNSCOPED = '-'
+
+# Etapa y archivo en curso. Los hilos de un ThreadPoolExecutor no heredan el contexto:
+# quien reparta trabajo en hilos debe usar ``contextvars.copy_context().run``.
+_current_stage: contextvars.ContextVar[str] = contextvars.ContextVar('ingestion_stage', default=UNSCOPED)
+_current_file: contextvars.ContextVar[str] = contextvars.ContextVar('ingestion_file', default=UNSCOPED)
+
+
+class StageRecord:
+    """Datos de una ejecución de etapa que el código instrumentado completa dentro del ``with``."""
+
+    def __init__(self, nodes_in: int = 0):
+        self.nodes_in = nodes_in
+        self.nodes_out = 0
+
+
+class IngestionMetrics:
+    """
+    Registro en memoria de las métricas de la ingestión, por etapa y por archivo.
+
+    Por cada etapa se acumulan ejecuciones, segundos, nodos de entrada y salida, errores y
+    cualquier contador que incremente el código que se ejecuta dentro de ella (llamadas al LLM,
+    llamadas de embeddings, reintentos, bytes escritos...). La etapa y el archivo en curso se
+    propagan con ``contextvars``, así que un contador se atribuye sin pasarlos explícitamente.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._stages: Dict[str, Counter] = defaultdict(Counter)
+        self._files: Dict[str, Dict[str, Counter]] = defaultdict(lambda: defaultdict(Counter))
+        self._gauges: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    @contextmanager
+    def file_scope(self, file_path: str) -> Iterator[None]:
+        """Atribuye al archivo indicado todo lo que se registre dentro del bloque."""
+        token = _current_file.set(file_path)
+        try:
+            yield
+        finally:
+            _current_file.reset(token)
+
+    @contextmanager
+    def stage(self, name: str, nodes_in: int = 0) -> Iterator[StageRecord]:
+        """
+        Mide una ejecución de etapa. El llamador asigna ``record.nodes_out`` antes de salir.
+
+        :param name: Nombre de la etapa.
+        :param nodes_in: Número de nodos de entrada.
+        """
+        record = StageRecord(nodes_in)
+        token = _current_stage.set(name)
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield record
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _current_stage.reset(token)
+            self._add(name, _current_file.get(), {
+                'runs': 1,
+                'seconds': time.perf_counter() - start,
+                'nodes_in': record.nodes_in,
+                'nodes_out': record.nodes_out,
+                'errors': int(failed),
+            })
+
+    def increment(self, counter: str, amount: float = 1, stage: Optional[str] = None):
+        """
+        Incrementa un contador de la etapa y el archivo en curso.
+
+        :param counter: Nombre del contador, p. ej. ``'llm_calls'``.
+        :param amount:
+        :param stage: Etapa a la que se atribuye si no es la etapa en curso.
+        """
+        self._add(stage or _current_stage.get(), _current_file.get(), {counter: amount})
+
+    def register_gauges(self, name: str, collector: Callable[[], Dict[str, float]]):
+        """Registra una función que devuelve valores instantáneos (p. ej. las métricas de la cola)."""
+        with self._lock:
+            self._gauges[name] = collector
+
+    def snapshot(self, include_files: bool = True) -> Dict[str, Any]:
+        """Devuelve todas las métricas como un diccionario serializable a JSON."""
+        with self._lock:
+            stages = {stage: dict(counters) for stage, counters in self._stages.items()}
+            files = {
+                file_path: {stage: dict(counters) for stage, counters in file_stages.items()}
+                for file_path, file_stages in self._files.items()
+            } if include_files else None
+            collectors = dict(self._gauges)
+
+        totals = Counter()
+        for counters in stages.values():
+            totals.update(counters)
+        totals.pop('runs', None)
+
+        gauges = {}
+        for name, collector in collectors.items():
+            try:
+                gauges[name] = collector()
+            except Exception as e:
+                logger.warning(f"No se pudieron leer las métricas '{name}': {e}")
+
+        snapshot = {
+            'started_at': self._started_at,
+            'elapsed_seconds': time.time() - self._started_at,
+            'totals': dict(totals),
+            'stages': stages,
+            'gauges': gauges,
+        }
+        if include_files:
+            snapshot['files'] = files
+        return snapshot
+
+    def to_prometheus(self) -> str:
+        """Métricas en formato de texto de Prometheus. El desglose por archivo solo está en JSON."""
+        snapshot = self.snapshot(include_files=False)
+        lines = []
+        counters = sorted({counter for stage in snapshot['stages'].values() for counter in stage})
+        for counter in counters:
+            metric = f'ingestion_stage_{counter}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for stage, values in sorted(snapshot['stages'].items()):
+                if counter in values:
+                    lines.append(f'{metric}{{stage="{stage}"}} {values[counter]}')
+        for name, values in sorted(snapshot['gauges'].items()):
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)):
+                    metric = f'ingestion_{name}_{key}'
+                    lines.append(f'# TYPE {metric} gauge')
+                    lines.append(f'{metric} {value}')
+        lines.append('# TYPE ingestion_uptime_seconds gauge')
+        lines.append(f"ingestion_uptime_seconds {snapshot['elapsed_seconds']}")
+        return '\n'.join(lines) + '\n'
+
+    def write_summary(self, path: str) -> str:
+        """
+        Escribe el resumen de la ejecución (totales, etapas, archivos y valores instantáneos) en JSON.
+
+        :param path:
+        :return: La ruta escrita.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        snapshot = self.snapshot()
+        snapshot['finished_at'] = time.time()
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(snapshot, file, indent=2, default=str)
+        os.replace(tmp_path, path)
+        logger.info(f'Resumen de métricas de la ingestión escrito en {path}')
+        return path
+
+    def reset(self):
+        """Descarta las métricas acumuladas (los valores instantáneos registrados se conservan)."""
+        with self._lock:
+            self._started_at = time.time()
+            self._stages.clear()
+            self._files.clear()
+
+    ########################################################
+
+    def _add(self, stage: str, file_path: str, values: Dict[str, float]):
+        with self._lock:
+            self._stages[stage].update(values)
+            if file_path != UNSCOPED:
+                self._files[file_path][stage].update(values)
+
+
+class MetricsServer:
+    """
+    Servidor HTTP local que expone un ``IngestionMetrics``:
+        - ``/metrics``: formato de texto de Prometheus.
+        - ``/metrics.json``: el resumen completo en JSON, con el desglose por archivo.
+    """
+
+    def __init__(self, metrics: IngestionMetrics, host: str = '127.0.0.1', port: int = 9464):
+        """
+        :param metrics:
+        :param host:
+        :param port: Puerto de escucha (0 elige uno libre).
+        """
+        self._metrics = metrics
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> str:
+        """Dirección en la que escucha el servidor."""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'MetricsServer':
+        """Atiende las peticiones en un hilo en segundo plano."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        logger.info(f'Métricas de la ingestión disponibles en {self.address}/metrics')
+        return self
+
+    def stop(self):
+        """Detiene el servidor."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _handler_class(self):
+        metrics = self._metrics
+
+        class _Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = metrics.to_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body = json.dumps(metrics.snapshot(), default=str).encode('utf-8')
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return _Handler
+
+
+_default_metrics = IngestionMetrics()
+
+
+def get_metrics() -> IngestionMetrics:
+    """Devuelve el registro de métricas compartido por todos los componentes de la ingestión."""
+    return _default_metrics
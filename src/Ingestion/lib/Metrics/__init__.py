@@ -0,0 +1 @@
+from .IngestionMetrics import IngestionMetrics, MetricsServer, get_metrics
\ No newline at end of file
@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+class TombstoneLog:
+    """
+    Registro append-only (JSONL) de los nodos que dejaron de existir, para que los índices
+    posteriores los apliquen como borrados en lugar de reconstruirse.
+
+    Cada línea contiene el archivo fuente, el almacén de nodos afectado, los ids eliminados,
+    el motivo (``'deleted'`` o ``'modified'``) y la fecha. Los consumidores guardan el offset
+    devuelto por ``read`` para continuar desde donde lo dejaron.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Ruta del archivo JSONL.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._path = path
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        """Get the path of the log."""
+        return self._path
+
+    def append(self, source_path: str, output_path: Optional[str], node_ids: Sequence[str], reason: str):
+        """
+        Añade una lápida.
+
+        :param source_path: Archivo fuente.
+        :param output_path: Almacén de nodos al que pertenecían los nodos.
+        :param node_ids: Ids de los nodos eliminados.
+        :param reason: ``'deleted'`` o ``'modified'``.
+        """
+        record = {
+            'source_path': source_path,
+            'output_path': output_path,
+            'node_ids': list(node_ids),
+            'reason': reason,
+            'deleted_at': time.time(),
+        }
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            with open(self._path, 'a', encoding='utf-8') as file:
+                file.write(line)
+        logger.info(f"Lápida registrada ({reason}) para {source_path}: {len(record['node_ids'])} nodos")
+
+    def read(self, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Lee las lápidas a partir de un offset en bytes.
+
+        :param offset:
+        :return: Las lápidas leídas y el offset desde el que continuar.
+        """
+        if not os.path.exists(self._path):
+            return [], offset
+        with open(self._path, 'rb') as file:
+            file.seek(offset)
+            data = file.read()
+        # Solo se consumen líneas completas
+        complete = data[:data.rfind(b'\n') + 1]
+        records = [json.loads(line) for line in complete.splitlines() if line.strip()]
+        return records, offset + len(complete)
@@ -0,0 +1,2 @@
+from .NodeStore import NodeStore, NodeStoreWriter, NODE_STORE_SUFFIX
+from .TombstoneLog import TombstoneLog
\ No newline at end of file
@@ -0,0 +1,97 @@
+import uuid
+from typing import Any, List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.node_parser import SemanticSplitterNodeParser
+from llama_index.core.node_parser.node_utils import default_id_func
+from llama_index.core.schema import BaseNode, TransformComponent
+
+from ..library_custom.llama_index.transformations import Unstructured_Medatata_PostProcessor
+from ..library_custom.llama_index.transformations import Unstructured_SectionTitle_Metadata
+from ..library_custom.llama_index.transformations import Unstructured_Filter
+from ..library_custom.llama_index.transformations import DictionaryToMetadata
+
+
+def stable_node_id(i: int, doc: BaseNode) -> str:
+    """
+    Id of the ``i``-th chunk the semantic splitter makes of a block. It is derived from the
+    source file (``source_id``), the block hash and its occurrence in the document instead of a
+    random uuid, so the nodes of unchanged blocks keep their ids when a file is reprocessed and
+    only the nodes of changed blocks are tombstoned.
+    """
+    block_hash = doc.metadata.get('block_hash')
+    if not block_hash:
+        return default_id_func(i, doc)
+    key = '\x1f'.join(
+        str(part) for part in (doc.metadata.get('source_id'), block_hash, doc.metadata.get('block_occurrence', 0), i)
+    )
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+def build_transformations(gcp_model: Any,
+                          embed_model: BaseEmbedding,
+                          meta_folder_path: str,
+                          block_cache: Optional[Any] = None,
+                          image_cache: Optional[Any] = None,
+                          context_window: int = 1,
+                          batch_size: int = 1,
+                          max_batch_tokens: int = 8000,
+                          rule_confidence: Optional[float] = None,
+                          table_quality_threshold: Optional[float] = None,
+                          async_concurrency: int = 64
+                          ) -> List[TransformComponent]:
+    """
+    Builds the transformations of the ingestion pipeline. It is shared by ``main.py`` and the
+    benchmarks so both always run the same stages.
+
+    :param gcp_model: LangChain LLM used to reclassify blocks and transcribe images and tables.
+    :param embed_model: Embedding model used by the semantic splitter and the final embedding step.
+    :param meta_folder_path: Folder with the ``<title>.json`` metadata of each document.
+    :param block_cache: Optional BlockResultCache with the post-processing results of previous runs.
+    :param image_cache: Optional ImageTranscriptionCache with the transcriptions of already seen crops.
+    :param context_window: Number of following blocks the post-processor gives the model as context.
+    :param batch_size: Maximum number of text blocks the post-processor classifies per request (1 disables batching).
+    :param max_batch_tokens: Approximate token budget of the blocks of a batch and their answers.
+    :param rule_confidence: Minimum confidence of the rule-based pre-classifier to skip the LLM (``None`` disables it).
+    :param table_quality_threshold: Minimum quality of a table converted from the HTML inferred by the partitioner
+        to skip its multimodal transcription (``None`` disables it).
+    :param async_concurrency: Maximum LLM requests in flight per event loop when the pipeline runs with ``arun``.
+    :return:
+    """
+    return [
+
+        Unstructured_Medatata_PostProcessor(
+            gcp_model=gcp_model,
+            meta_folder_path=meta_folder_path,
+            block_cache=block_cache,
+            image_cache=image_cache,
+            context_window=context_window,
+            batch_size=batch_size,
+            max_batch_tokens=max_batch_tokens,
+            rule_confidence=rule_confidence,
+            table_quality_threshold=table_quality_threshold,
+            async_concurrency=async_concurrency
+        ),
+
+        Unstructured_SectionTitle_Metadata(),
+
+        Unstructured_Filter(filter_block_type=["UncategorizedText"]),
+
+        DictionaryToMetadata(meta_folder_path=meta_folder_path),
+
+        SemanticSplitterNodeParser( # Tenemos que separar las tablas
+            buffer_size=1,
+            embed_model=embed_model,
+            include_metadata=True,
+            include_prev_next_rel=True,
+            id_func=stable_node_id
+        ),
+
+        # SummaryExtractor(llm=Config.llm), # No funciona
+
+        # KeywordExtractor(), # No funciona
+
+        # QuestionsAnsweredExtractor(questions=3), # No funciona
+
+        embed_model
+    ]
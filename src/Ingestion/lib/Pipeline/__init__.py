@@ -0,0 +1 @@
+from .Transformations import build_transformations
\ No newline at end of file
@@ -0,0 +1,317 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+class IngestionQueue:
+    """
+    Cola de trabajos persistente (SQLite) con antirrebote por ruta y un pool de workers.
+
+    - Los eventos repetidos sobre una misma ruta se fusionan en un único trabajo.
+    - Un trabajo solo se entrega cuando no ha recibido eventos durante ``debounce_seconds``
+      y el tamaño del archivo no ha cambiado desde el último evento (copia terminada).
+    - La cola está acotada a ``max_pending`` rutas; ``put`` bloquea cuando está llena.
+    - Los trabajos que estaban en ejecución al caer el proceso se reanudan al reiniciar.
+    """
+
+    STATE_PENDING = 'pending'
+    STATE_RUNNING = 'running'
+    STATE_FAILED = 'failed'
+
+    def __init__(self,
+                 db_path: str,
+                 handler: Callable[[str], None],
+                 num_workers: int = 4,
+                 max_pending: int = 10000,
+                 debounce_seconds: float = 2.0,
+                 max_attempts: int = 3,
+                 retry_delay_seconds: float = 30.0,
+                 poll_interval: float = 0.5,
+                 metrics_log_interval: float = 60.0
+                 ):
+        """
+        :param db_path: Ruta del archivo SQLite de la cola.
+        :param handler: Función que procesa una ruta; si lanza una excepción el trabajo se reintenta.
+        :param num_workers: Número de workers que drenan la cola.
+        :param max_pending: Número máximo de rutas en cola antes de aplicar contrapresión.
+        :param debounce_seconds: Tiempo sin eventos ni cambios de tamaño antes de procesar una ruta.
+        :param max_attempts: Intentos antes de marcar un trabajo como fallido.
+        :param retry_delay_seconds: Espera antes de reintentar un trabajo fallido.
+        :param poll_interval: Intervalo máximo de espera de los workers entre comprobaciones.
+        :param metrics_log_interval: Cada cuántos segundos se registran las métricas (0 para desactivar).
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._handler = handler
+        self._num_workers = num_workers
+        self._max_pending = max_pending
+        self._debounce_seconds = debounce_seconds
+        self._max_attempts = max_attempts
+        self._retry_delay_seconds = retry_delay_seconds
+        self._poll_interval = poll_interval
+        self._metrics_log_interval = metrics_log_interval
+
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._busy_workers = 0
+        self._counters: Dict[str, float] = {
+            'enqueued_total': 0,
+            'coalesced_total': 0,
+            'processed_total': 0,
+            'retried_total': 0,
+            'failed_total': 0,
+            'rejected_total': 0,
+            'put_blocked_seconds_total': 0.0,
+            'wait_seconds_total': 0.0,
+            'processing_seconds_total': 0.0,
+        }
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                path TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                ready_at REAL NOT NULL,
+                last_size INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                dirty INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+            """
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (state, ready_at)')
+        resumed = self._conn.execute(
+            'UPDATE jobs SET state = ? WHERE state = ?', (self.STATE_PENDING, self.STATE_RUNNING)
+        ).rowcount
+        self._conn.commit()
+        if resumed:
+            logger.info(f'Cola de ingestión: {resumed} trabajos interrumpidos reanudados')
+
+    # ---- Producer ----
+    def put(self, path: str, timeout: Optional[float] = None) -> bool:
+        """
+        Encola una ruta o fusiona el evento con el trabajo ya pendiente para esa ruta.
+
+        :param path:
+        :param timeout: Tiempo máximo de espera si la cola está llena (``None`` espera indefinidamente).
+        :return: ``False`` si la cola siguió llena al vencer el ``timeout``.
+        """
+        now = time.time()
+        size = self._get_size(path)
+        with self._condition:
+            row = self._conn.execute('SELECT state FROM jobs WHERE path = ?', (path,)).fetchone()
+            if row is not None:
+                if row[0] == self.STATE_RUNNING:
+                    # El archivo cambió mientras se procesaba: se vuelve a encolar al terminar
+                    self._conn.execute('UPDATE jobs SET dirty = 1, last_size = ? WHERE path = ?', (size, path))
+                else:
+                    self._conn.execute(
+                        'UPDATE jobs SET state = ?, ready_at = ?, last_size = ?, attempts = 0 WHERE path = ?',
+                        (self.STATE_PENDING, now + self._debounce_seconds, size, path)
+                    )
+                self._conn.commit()
+                self._counters['coalesced_total'] += 1
+                return True
+
+            blocked_since = time.perf_counter()
+            deadline = None if timeout is None else blocked_since + timeout
+            while self._count_active() >= self._max_pending:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    self._counters['rejected_total'] += 1
+                    logger.warning(f'Cola de ingestión llena ({self._max_pending}), evento descartado: {path}')
+                    return False
+                self._condition.wait(remaining)
+            self._counters['put_blocked_seconds_total'] += time.perf_counter() - blocked_since
+
+            self._conn.execute(
+                'INSERT INTO jobs (path, state, enqueued_at, ready_at, last_size) VALUES (?, ?, ?, ?, ?)',
+                (path, self.STATE_PENDING, now, now + self._debounce_seconds, size)
+            )
+            self._conn.commit()
+            self._counters['enqueued_total'] += 1
+            self._condition.notify_all()
+        return True
+
+    def remove(self, path: str) -> bool:
+        """Elimina un trabajo pendiente; devuelve ``True`` si existía."""
+        with self._condition:
+            removed = self._conn.execute(
+                'DELETE FROM jobs WHERE path = ? AND state != ?', (path, self.STATE_RUNNING)
+            ).rowcount
+            self._conn.commit()
+            self._condition.notify_all()
+        return removed > 0
+
+    # ---- Workers ----
+    def start(self):
+        """Arranca los workers (y el registro periódico de métricas)."""
+        self._stop_event.clear()
+        for i in range(self._num_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'ingestion-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self._metrics_log_interval > 0:
+            thread = threading.Thread(target=self._metrics_loop, name='ingestion-queue-metrics', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f'Cola de ingestión iniciada con {self._num_workers} workers')
+
+    def stop(self, wait: bool = True):
+        """Detiene los workers; los trabajos en curso terminan antes de salir si ``wait`` es ``True``."""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+        logger.info(f'Cola de ingestión detenida: {self.metrics()}')
+
+    def join(self, poll_interval: float = 0.5):
+        """Bloquea hasta que no quedan trabajos pendientes ni en ejecución."""
+        while True:
+            with self._condition:
+                if self._count_active() == 0:
+                    return
+            time.sleep(poll_interval)
+
+    def has_ready_jobs(self) -> bool:
+        """Indica si hay trabajos en ejecución o listos para ejecutarse (ya pasado el antirrebote)."""
+        with self._condition:
+            return self._conn.execute(
+                'SELECT 1 FROM jobs WHERE state = ? OR (state = ? AND ready_at <= ?) LIMIT 1',
+                (self.STATE_RUNNING, self.STATE_PENDING, time.time())
+            ).fetchone() is not None
+
+    # ---- Metrics ----
+    def metrics(self) -> Dict[str, float]:
+        """
+        Devuelve las métricas de la cola: profundidad, workers ocupados, antigüedad del
+        trabajo pendiente más viejo y los contadores acumulados.
+        """
+        now = time.time()
+        with self._condition:
+            counts = dict(self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+            oldest = self._conn.execute(
+                'SELECT MIN(enqueued_at) FROM jobs WHERE state = ?', (self.STATE_PENDING,)
+            ).fetchone()[0]
+            metrics = dict(self._counters)
+            metrics.update({
+                'pending': counts.get(self.STATE_PENDING, 0),
+                'running': counts.get(self.STATE_RUNNING, 0),
+                'failed': counts.get(self.STATE_FAILED, 0),
+                'max_pending': self._max_pending,
+                'busy_workers': self._busy_workers,
+                'num_workers': self._num_workers,
+                'oldest_pending_age_seconds': now - oldest if oldest else 0.0,
+            })
+        return metrics
+
+    ########################################################
+
+    def _worker_loop(self):
+        while not self._stop_event.is_set():
+            job = self._claim_next()
+            if job is None:
+                with self._condition:
+                    self._condition.wait(self._poll_interval)
+                continue
+
+            start = time.perf_counter()
+            try:
+                self._handler(job)
+            except Exception as e:
+                self._finish(job, time.perf_counter() - start, error=e)
+            else:
+                self._finish(job, time.perf_counter() - start)
+
+    def _claim_next(self) -> Optional[str]:
+        """
+        Toma el siguiente trabajo listo. Si el tamaño del archivo cambió desde el último evento
+        se pospone otro periodo de antirrebote.
+        """
+        now = time.time()
+        with self._condition:
+            rows = self._conn.execute(
+                'SELECT path, enqueued_at, last_size FROM jobs WHERE state = ? AND ready_at <= ? '
+                'ORDER BY ready_at LIMIT ?',
+                (self.STATE_PENDING, now, self._num_workers * 4)
+            ).fetchall()
+            for path, enqueued_at, last_size in rows:
+                size = self._get_size(path)
+                # Un archivo que sigue sin existir (-1) también es estable: el handler procesa el borrado
+                if size != last_size:
+                    self._conn.execute(
+                        'UPDATE jobs SET ready_at = ?, last_size = ? WHERE path = ?',
+                        (now + self._debounce_seconds, size, path)
+                    )
+                    continue
+                self._conn.execute(
+                    'UPDATE jobs SET state = ?, attempts = attempts + 1 WHERE path = ?',
+                    (self.STATE_RUNNING, path)
+                )
+                self._conn.commit()
+                self._busy_workers += 1
+                self._counters['wait_seconds_total'] += now - enqueued_at
+                return path
+            self._conn.commit()
+        return None
+
+    def _finish(self, path: str, elapsed: float, error: Optional[Exception] = None):
+        now = time.time()
+        with self._condition:
+            self._busy_workers -= 1
+            self._counters['processing_seconds_total'] += elapsed
+            attempts, dirty = self._conn.execute(
+                'SELECT attempts, dirty FROM jobs WHERE path = ?', (path,)
+            ).fetchone()
+            if dirty:
+                self._conn.execute(
+                    'UPDATE jobs SET state = ?, ready_at = ?, attempts = 0, dirty = 0 WHERE path = ?',
+                    (self.STATE_PENDING, now + self._debounce_seconds, path)
+                )
+            elif error is None:
+                self._conn.execute('DELETE FROM jobs WHERE path = ?', (path,))
+                self._counters['processed_total'] += 1
+            elif attempts < self._max_attempts:
+                self._conn.execute(
+                    'UPDATE jobs SET state = ?, ready_at = ?, last_error = ? WHERE path = ?',
+                    (self.STATE_PENDING, now + self._retry_delay_seconds, str(error), path)
+                )
+                self._counters['retried_total'] += 1
+                logger.warning(f'Error procesando {path} (intento {attempts}/{self._max_attempts}): {error}')
+            else:
+                self._conn.execute(
+                    'UPDATE jobs SET state = ?, last_error = ? WHERE path = ?',
+                    (self.STATE_FAILED, str(error), path)
+                )
+                self._counters['failed_total'] += 1
+                logger.error(f'Trabajo fallido tras {attempts} intentos: {path}: {error}')
+            self._conn.commit()
+            self._condition.notify_all()
+
+    def _metrics_loop(self):
+        while not self._stop_event.wait(self._metrics_log_interval):
+            logger.info(f'Métricas de la cola de ingestión: {self.metrics()}')
+
+    def _count_active(self) -> int:
+        return self._conn.execute(
+            'SELECT COUNT(*) FROM jobs WHERE state IN (?, ?)', (self.STATE_PENDING, self.STATE_RUNNING)
+        ).fetchone()[0]
+
+    @staticmethod
+    def _get_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return -1
@@ -0,0 +1 @@
+from .IngestionQueue import IngestionQueue
\ No newline at end of file
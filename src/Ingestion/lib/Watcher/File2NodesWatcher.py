@@ -1,17 +1,29 @@
 import logging
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List
-import pickle
+from typing import Iterable, Iterator, Optional, List
 import os
+import shutil
+import threading
 
 from .BaseWatcher import BaseWatcher
-from ..DirectoryLoader.BaseDirectoryLoader import BaseDirectoryLoader
+from .IngestionBacklog import IngestionBacklog
+from ..Coordination import LeaseCoordinator, LeaseHeldError, LeaseLostError
+from ..DirectoryLoader.BaseDirectoryLoader import BaseDirectoryLoader, LoadedFile
+from ..Manifest import FileFingerprint, IngestionManifest
+from ..Queue import IngestionQueue
+from ..Metrics import get_metrics
+from ..NodeStore import NodeStore, NodeStoreWriter, TombstoneLog, NODE_STORE_SUFFIX
 from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.schema import Document
 
 logger = logging.getLogger(__name__)
 logger.propagate = True
 
+# Número de nodos escritos por lote en el almacén de nodos
+NODE_STORE_BATCH_SIZE = 1000
+
 class File2NodesWatcher(BaseWatcher):
 
     def __init__(self,
@@ -19,68 +31,464 @@ class File2NodesWatcher(BaseWatcher):
                  nodes_output_directory: str,
                  file_reader: BaseDirectoryLoader,
                  ingestion_pipeline: Optional[IngestionPipeline] = None,
+                 manifest: Optional[IngestionManifest] = None,
                  **kwargs):
 
         super().__init__(watch_directory, **kwargs)
         self._nodes_output_directory = nodes_output_directory
         self._file_reader = file_reader
         self._ingestion_pipeline = ingestion_pipeline
+        self._num_workers = kwargs.get('num_workers', 4)
+        self._manifest = manifest or IngestionManifest(
+            os.path.join(nodes_output_directory, 'manifest.sqlite')
+        )
+        self._tombstones = TombstoneLog(
+            kwargs.get('tombstones_path', os.path.join(nodes_output_directory, 'tombstones.jsonl'))
+        )
+        self._queue = IngestionQueue(
+            db_path=kwargs.get('queue_path', os.path.join(nodes_output_directory, 'queue.sqlite')),
+            handler=self._process_queued_file,
+            num_workers=self._num_workers,
+            max_pending=kwargs.get('max_pending', 10000),
+            debounce_seconds=kwargs.get('debounce_seconds', 2.0)
+        )
+        get_metrics().register_gauges('queue', self._queue.metrics)
+        self._backlog = IngestionBacklog(log_interval=kwargs.get('backlog_log_interval', 60.0))
+        get_metrics().register_gauges('backlog', self._backlog.progress)
 
-        logger.info('Watcher inicializado')
-        unique_files = self._get_list_of_unique_files_in_source()
-        self._process_multiple_files(unique_files)
+        # Shared coordinator: with several nodes on the same source directory each file is leased
+        # by a single node, so no two nodes spend LLM calls on the same file
+        self._coordinator: Optional[LeaseCoordinator] = kwargs.get('coordinator')
+        if self._coordinator is not None:
+            get_metrics().register_gauges('leases', self._coordinator.metrics)
 
+        self._stop_event = threading.Event()
+        self._watching = False
+        self._claimed_files = set()
+        self._claims_condition = threading.Condition()
 
+        logger.info('Watcher inicializado')
+        # The backlog is processed in the background so that start_watch can pick up new files
+        # right away; the thread is not a daemon, so the process still waits for the backlog
+        self._backlog_thread = None
+        if kwargs.get('process_backlog', True):
+            self._backlog_thread = threading.Thread(target=self._process_backlog, name='ingestion-backlog')
+            self._backlog_thread.start()
 
     def on_created(self, event):
-        logger.info(f'1 Archivo creado: {event.src_path}')
         if not event.is_directory:
             logger.info(f'Archivo creado: {event.src_path}')
-            self._process_and_save_node(event.src_path)
+            self._queue.put(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            logger.info(f'Archivo modificado: {event.src_path}')
+            self._queue.put(event.src_path)
+
+    def on_moved(self, event):
+        """
+        A move is handled as a deletion of the source path plus a new file at the destination.
+        The block and embedding caches make reprocessing the destination skip the LLM and embedding work.
+        """
+        if not event.is_directory:
+            logger.info(f'Archivo movido de {event.src_path} a {event.dest_path}')
+            self._queue.put(event.src_path)
+            self._queue.put(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            logger.info(f'Archivo eliminado: {event.src_path}')
+            self._queue.put(event.src_path)
+
+    def start_watch(self):
+        """
+        Starts the queue workers and then watches the directory. The observer thread only
+        enqueues events; processing throughput is set by the number of workers. New files take
+        priority over the backlog, which pauses while the queue has jobs ready or running.
+        """
+        self._queue.start()
+        self._watching = True
+        try:
+            super().start_watch()
+        finally:
+            self._watching = False
+            self.stop_backlog()
+            self._queue.stop()
+
+    def stop_backlog(self, wait: bool = True):
+        """
+        Stops handing out backlog files. The files already loading or being saved are finished;
+        the rest are found again by the manifest scan of the next start.
+        """
+        self._stop_event.set()
+        if wait and self._backlog_thread is not None:
+            self._backlog_thread.join()
+
+    @property
+    def queue_metrics(self) -> dict:
+        """Backpressure and throughput metrics of the ingestion queue."""
+        return self._queue.metrics()
+
+    @property
+    def backlog_progress(self) -> dict:
+        """Progress, throughput and estimated time left of the startup backlog."""
+        return self._backlog.progress()
+
+    def _process_queued_file(self, file_path: str):
+        """
+        Queue handler: processes the file only if the manifest says it changed, so bursts of
+        events on an already ingested file do not reprocess it. If the file no longer exists
+        its outputs are removed and a tombstone is written. A backlog file that gets an event
+        is taken out of the backlog and processed here instead.
+        """
+        self._backlog.discard(file_path)
+        with self._file_claim(file_path):
+            if not os.path.isfile(file_path):
+                self._remove_file_outputs(file_path)
+                return
+            if not self._manifest.needs_processing(file_path):
+                logger.info(f'Archivo sin cambios, se omite: {file_path}')
+                return
+            if self._coordinator is None:
+                self._process_and_save_node(file_path)
+                return
+
+            status = self._acquire_lease(file_path, os.stat(file_path))
+            if status == LeaseCoordinator.HELD:
+                # The queue retries the job; by then the other node has finished it or its lease expired
+                raise LeaseHeldError(f'Archivo en proceso en otro nodo: {file_path}')
+            if status != LeaseCoordinator.ACQUIRED:
+                return
+            succeeded = False
+            try:
+                self._process_and_save_node(file_path)
+                succeeded = True
+            finally:
+                self._release_lease(file_path, succeeded)
+
+    def _process_backlog(self):
+        """
+        Background startup: removes the outputs of the files deleted while the watcher was stopped,
+        scans the source directory and processes the files that changed, smallest first.
+        """
+        try:
+            for entry in self._manifest.find_missing(self._watch_directory):
+                with self._file_claim(entry.path):
+                    self._remove_file_outputs(entry.path)
+            self._backlog.extend(self._get_list_of_unique_files_in_source())
+            file_paths = self._backlog.iter_paths(pause_while=self._has_live_work, stop_event=self._stop_event)
+            if self._coordinator is not None:
+                file_paths = self._lease_files(file_paths)
+            self._process_multiple_files(file_paths)
+        except Exception:
+            logger.exception('Error procesando el backlog de ingestión')
+        logger.info(f'Backlog de ingestión terminado: {self._backlog.progress()}')
+
+    def _has_live_work(self) -> bool:
+        """Whether the live queue has jobs to run, in which case the backlog waits."""
+        return self._watching and self._queue.has_ready_jobs()
+
+    def _job_key(self, file_path: str) -> str:
+        """Lease key of a file: its path relative to the watch directory, the same on every node."""
+        return os.path.relpath(file_path, self._watch_directory).replace(os.sep, '/')
+
+    def _acquire_lease(self, file_path: str, stat: os.stat_result) -> str:
+        """
+        Leases a file from the coordinator for its current size, mtime and pipeline version.
+        A version another node already ingested is adopted into the local manifest.
+        """
+        version = f'{stat.st_size}:{stat.st_mtime_ns}:{self._manifest.pipeline_version}'
+        status = self._coordinator.try_acquire(self._job_key(file_path), version)
+        if status == LeaseCoordinator.DONE:
+            logger.info(f'Archivo ya procesado por otro nodo: {file_path}')
+            self._manifest.mark_done(self._manifest.fingerprint(file_path), self._get_output_file_path(file_path))
+        elif status == LeaseCoordinator.FAILED:
+            logger.warning(f'Archivo fallido recientemente o sin intentos restantes, se omite por ahora: {file_path}')
+        elif status == LeaseCoordinator.HELD:
+            logger.info(f'Archivo arrendado por otro nodo: {file_path}')
+        return status
+
+    def _release_lease(self, file_path: str, succeeded: Optional[bool]):
+        """Releases the lease of a file recording the outcome (``None`` leaves the file free to retry)."""
+        if succeeded is None:
+            outcome = None
+        else:
+            outcome = LeaseCoordinator.DONE if succeeded else LeaseCoordinator.FAILED
+        self._coordinator.release(self._job_key(file_path), outcome)
+
+    def _lease_files(self, file_paths: Iterable[str]) -> Iterator[str]:
+        """
+        Yields only the backlog files this node leases. Files leased by other nodes are retried at
+        the end, every half lease, until they are done elsewhere or their lease expires (the node
+        holding them crashed) and this node takes them over.
+        """
+        deferred = []
+        for file_path in file_paths:
+            if self._lease_backlog_file(file_path, deferred):
+                yield file_path
+        while deferred and not self._stop_event.wait(self._coordinator.lease_seconds / 2):
+            retry, deferred = deferred, []
+            for file_path in retry:
+                if self._lease_backlog_file(file_path, deferred):
+                    yield file_path
+
+    def _lease_backlog_file(self, file_path: str, deferred: List[str]) -> bool:
+        try:
+            status = self._acquire_lease(file_path, os.stat(file_path))
+        except OSError:
+            status = None
+        if status == LeaseCoordinator.HELD:
+            deferred.append(file_path)
+        elif status != LeaseCoordinator.ACQUIRED:
+            self._backlog.mark_processed(file_path, succeeded=status == LeaseCoordinator.DONE)
+        return status == LeaseCoordinator.ACQUIRED
+
+    @contextmanager
+    def _file_claim(self, file_path: str) -> Iterator[None]:
+        """Makes the live queue and the backlog process a given file one at a time."""
+        key = self._manifest.normalize_path(file_path)
+        with self._claims_condition:
+            while key in self._claimed_files:
+                self._claims_condition.wait()
+            self._claimed_files.add(key)
+        try:
+            yield
+        finally:
+            with self._claims_condition:
+                self._claimed_files.discard(key)
+                self._claims_condition.notify_all()
 
     def _process_and_save_node(self, file_path: str):
         """
         Processes a single file to generate nodes, possibly processes them through a pipeline,
-        and saves them into a serialized format in the designated output directory.
+        and saves them into a node store (JSONL + float32 embeddings) in the designated output directory.
+        The file fingerprint is taken before processing and recorded in the manifest
+        once the nodes are saved.
         """
         logger.info(f'Procesando archivo: {file_path}')
-        file_name = Path(file_path).stem
-        nodes = self._file_reader.load_from(files=[file_path])
-        if self._ingestion_pipeline:
-            logger.info('Ejecutando el pipeline de ingestión')
-            nodes = self._ingestion_pipeline.run(documents=nodes)
-
-        output_file_path = os.path.join(self._nodes_output_directory, f'{file_name}.pkl')
-        with open(output_file_path, 'wb') as file:
-            pickle.dump(nodes, file)
+        metrics = get_metrics()
+        fingerprint = self._manifest.fingerprint(file_path)
+        try:
+            with metrics.file_scope(file_path):
+                with metrics.stage('load') as record:
+                    documents = self._file_reader.load_from(files=[file_path])
+                    record.nodes_out = len(documents)
+        except Exception:
+            self._manifest.mark_failed(fingerprint)
+            logger.exception(f'Error al procesar el archivo: {file_path}')
+            raise
+        self._save_nodes(file_path, fingerprint, documents)
+
+    def _save_loaded_file(self, loaded: LoadedFile, stat_before: os.stat_result) -> bool:
+        """
+        Handles a file yielded by the streaming loader. The fingerprint is taken after loading, so it
+        is only recorded if size and mtime still match the ``stat`` taken before the file was
+        submitted; otherwise the file changed while it was being loaded and is enqueued again.
+        A file the live queue already ingested while it was loading is skipped. In distributed mode
+        the lease of the file is released with the outcome.
+
+        :return: ``False`` if the file could not be loaded or saved.
+        """
+        file_path = loaded.file_path
+        succeeded = None
+        try:
+            succeeded = self._save_claimed_file(loaded, stat_before)
+        finally:
+            if self._coordinator is not None:
+                self._release_lease(file_path, succeeded)
+        return succeeded is not False
+
+    def _save_claimed_file(self, loaded: LoadedFile, stat_before: os.stat_result) -> Optional[bool]:
+        """
+        ``_save_loaded_file`` under the file claim.
+
+        :return: Whether the file was saved, or ``None`` if it was handed back to the queue.
+        """
+        file_path = loaded.file_path
+        with self._file_claim(file_path):
+            entry = self._manifest.get(file_path)
+            if (entry is not None and entry.status == IngestionManifest.STATUS_DONE
+                    and (entry.size, entry.mtime_ns) == (stat_before.st_size, stat_before.st_mtime_ns)):
+                logger.info(f'Archivo ya procesado por la cola, se omite: {file_path}')
+                return True
+            try:
+                fingerprint = self._manifest.fingerprint(file_path)
+            except OSError:
+                logger.warning(f'El archivo desapareció mientras se cargaba: {file_path}')
+                return None
+            if loaded.error is not None:
+                self._manifest.mark_failed(fingerprint)
+                return False
+            if (fingerprint.size, fingerprint.mtime_ns) != (stat_before.st_size, stat_before.st_mtime_ns):
+                logger.info(f'Archivo modificado durante la carga, se vuelve a encolar: {file_path}')
+                self._queue.put(file_path)
+                return None
+            try:
+                self._save_nodes(file_path, fingerprint, loaded.documents)
+            except Exception:
+                return False  # Ya registrado y marcado como fallido en el manifiesto
+            return True
+
+    def _save_nodes(self, file_path: str, fingerprint: FileFingerprint, documents: List[Document]):
+        """
+        Runs the pipeline over the loaded documents of a file, writes the node store and records
+        the file in the manifest, tombstoning the node ids of the previous version that are gone.
+        """
+        metrics = get_metrics()
+        try:
+            with metrics.file_scope(file_path):
+                self._set_source_id(file_path, documents)
+                nodes = documents
+                if self._ingestion_pipeline:
+                    logger.info('Ejecutando el pipeline de ingestión')
+                    nodes = self._ingestion_pipeline.run(documents=documents)
+
+                output_file_path = self._get_output_file_path(file_path)
+                if self._coordinator is not None and not self._coordinator.holds(self._job_key(file_path)):
+                    raise LeaseLostError(f'Arriendo perdido antes de guardar los nodos: {file_path}')
+                previous_node_ids = self._read_node_ids(output_file_path)
+                with metrics.stage('write', nodes_in=len(nodes)) as record:
+                    with NodeStoreWriter(output_file_path) as writer:
+                        for start in range(0, len(nodes), NODE_STORE_BATCH_SIZE):
+                            writer.append(nodes[start:start + NODE_STORE_BATCH_SIZE])
+                    record.nodes_out = len(writer)
+                    metrics.increment('bytes_written', self._get_store_size(output_file_path))
+        except Exception:
+            self._manifest.mark_failed(fingerprint)
+            logger.exception(f'Error al procesar el archivo: {file_path}')
+            raise
+        self._manifest.mark_done(fingerprint, output_file_path)
         logger.info(f'Nodos guardados en: {output_file_path}')
 
-    def _process_multiple_files(self, file_paths: List[str]):
+        removed_node_ids = set(previous_node_ids) - {node.node_id for node in nodes}
+        if removed_node_ids:
+            self._tombstones.append(file_path, output_file_path, sorted(removed_node_ids), reason='modified')
+
+    def _remove_file_outputs(self, file_path: str):
         """
-        Processes multiple files to generate nodes by utilizing a ThreadPoolExecutor
-        to parallelize the operation across several threads.
+        Handles a source file that no longer exists: removes its manifest entry and its node
+        store, and writes a tombstone with the ids of its nodes.
         """
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            executor.map(self._process_and_save_node, file_paths)
+        entry = self._manifest.remove(file_path)
+        output_file_path = entry.output_path if entry and entry.output_path else self._get_output_file_path(file_path)
+        if not os.path.exists(output_file_path):
+            logger.info(f'El archivo ya no existe y no tiene nodos guardados: {file_path}')
+            return
 
-    def _get_list_of_unique_files_in_source(self) -> List[str]:
+        node_ids = self._read_node_ids(output_file_path)
+        self._tombstones.append(file_path, output_file_path, node_ids, reason='deleted')
+        if os.path.isdir(output_file_path):
+            shutil.rmtree(output_file_path)
+        else:
+            os.remove(output_file_path)
+        logger.info(f'Nodos eliminados: {output_file_path}')
+
+    @staticmethod
+    def _get_store_size(output_file_path: str) -> int:
+        """Size in bytes of the files of a node store."""
+        with os.scandir(output_file_path) as entries:
+            return sum(entry.stat().st_size for entry in entries if entry.is_file())
+
+    @staticmethod
+    def _read_node_ids(output_file_path: str) -> List[str]:
+        """Ids of the nodes of an existing node store (empty for legacy .pkl outputs)."""
+        if not NodeStore.is_node_store(output_file_path):
+            return []
+        with NodeStore(output_file_path) as store:
+            return store.node_ids()
+
+    def _process_multiple_files(self, file_paths: Iterable[str]):
         """
-        Identifies and returns a list of files that are present in the source directory
-        but not in the target directory. This is achieved by comparing file names
-        without considering file extensions.
+        Processes the backlog files as a stream: the loader yields the documents of each file as soon
+        as they are ready (at most ``num_workers`` files ahead) and a ThreadPoolExecutor runs the
+        pipeline and writes the nodes. Both sides are bounded, so memory stays flat however long
+        the backlog is. ``file_paths`` is consumed lazily, one file at a time.
+        """
+        stats = {}
 
-        Returns:
-            List[str]: A list of file paths to unique files in the source directory.
+        def stat_files() -> Iterator[str]:
+            for file_path in file_paths:
+                if not self._file_reader.supports(file_path):
+                    # The loader would drop it silently and it would never leave the backlog
+                    logger.info(f'Formato no soportado por el loader, se omite: {file_path}')
+                    self._backlog.mark_processed(file_path)
+                    continue
+                try:
+                    stats[file_path] = os.stat(file_path)
+                except OSError:
+                    logger.warning(f'El archivo ya no existe, se omite: {file_path}')
+                    self._backlog.mark_processed(file_path, succeeded=False)
+                    continue
+                yield file_path
+
+        def on_saved(future, file_path: str):
+            slots.release()
+            self._backlog.mark_processed(file_path, succeeded=not future.exception() and future.result())
+
+        slots = threading.BoundedSemaphore(self._num_workers)
+        with ThreadPoolExecutor(max_workers=self._num_workers) as executor:
+            for loaded in self._file_reader.iter_files(stat_files(), prefetch=self._num_workers):
+                slots.acquire()
+                future = executor.submit(self._save_loaded_file, loaded, stats.pop(loaded.file_path))
+                future.add_done_callback(lambda done, file_path=loaded.file_path: on_saved(done, file_path))
+
+    def _get_output_file_path(self, file_path: str) -> str:
         """
-        # Dictionary to hold file names without extensions from source directory
-        source_files = {Path(f).stem: f for f in os.listdir(self._watch_directory)}
+        Builds the output path for a source file from its ``_get_source_id``, so files with the
+        same stem in different folders do not collide.
+        """
+        return os.path.join(self._nodes_output_directory, f'{self._get_source_id(file_path)}{NODE_STORE_SUFFIX}')
 
-        # Set of file names without extensions from target directory
-        target_files = {Path(f).stem for f in os.listdir(self._nodes_output_directory)}
+    def _get_source_id(self, file_path: str) -> str:
+        """
+        Identity of a source file: its path relative to the watch directory without the extension,
+        with ``__`` as separator. Files at the top level keep the ``<stem>`` name.
+        """
+        relative_path = os.path.relpath(file_path, self._watch_directory)
+        relative_stem = str(Path(relative_path).with_suffix(''))
+        source_id = relative_stem.replace(os.sep, '__')
+        if os.altsep:
+            source_id = source_id.replace(os.altsep, '__')
+        return source_id
 
-        # Filter out files that do not have a corresponding file in the target directory
-        unique_files = [os.path.join(self._watch_directory, source_files[file_stem])
-                        for file_stem in source_files if file_stem not in target_files]
+    def _set_source_id(self, file_path: str, documents: List[Document]):
+        """
+        Replaces the ``source_id`` the loader derives from the title with the one of the output
+        name, which keys the block cache and the node ids of the file. The title is still used
+        to find the metadata JSON of the document.
+        """
+        source_id = self._get_source_id(file_path)
+        for document in documents:
+            document.metadata['source_id'] = source_id
+            for excluded_keys in (document.excluded_llm_metadata_keys, document.excluded_embed_metadata_keys):
+                if 'source_id' not in excluded_keys:
+                    excluded_keys.append('source_id')
+
+    def _get_list_of_unique_files_in_source(self) -> List[str]:
+        """
+        Identifies and returns the files in the source directory that must be processed,
+        according to the ingestion manifest (content hash, size, mtime and pipeline version).
+
+        Files with no manifest entry whose output already exists (ingested before the
+        manifest was introduced) are adopted into the manifest instead of being reprocessed.
+
+        Returns:
+            List[str]: A list of file paths to files in the source directory that need processing.
+        """
+        unique_files = []
+        # Only the files the loader can read: the others would never be marked as processed
+        for file_path in self._manifest.scan(self._watch_directory, extensions=self._file_reader.SUPPORTED_EXTENSIONS):
+            output_file_path = self._get_output_file_path(file_path)
+            legacy_file_path = os.path.splitext(output_file_path)[0] + '.pkl'
+            if self._manifest.get(file_path) is None:
+                existing_output = next(
+                    (path for path in (output_file_path, legacy_file_path) if os.path.exists(path)), None
+                )
+                if existing_output:
+                    self._manifest.mark_done(self._manifest.fingerprint(file_path), existing_output)
+                    logger.info(f'Archivo ya procesado incorporado al manifiesto: {file_path}')
+                    continue
+            unique_files.append(file_path)
 
         logger.info(f'Archivos únicos en el directorio fuente: {len(unique_files)}')
-        return unique_files
\ No newline at end of file
+        return unique_files
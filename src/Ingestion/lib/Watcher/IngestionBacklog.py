@@ -0,0 +1,172 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+class IngestionBacklog:
+    """
+    Archivos pendientes encontrados al arrancar, entregados del más pequeño al más grande para
+    maximizar los documentos procesados por hora, con el progreso y el tiempo restante estimado.
+
+    - ``iter_paths`` se detiene mientras ``pause_while()`` sea verdadero, de modo que los archivos
+      nuevos (la cola de eventos) tienen prioridad sobre el backlog.
+    - ``discard`` retira un archivo que ya se está procesando por otra vía (p. ej. un evento).
+    - La estimación usa el ritmo en bytes: como se procesan primero los archivos pequeños,
+      extrapolar los archivos por hora subestimaría el tiempo restante.
+    """
+
+    def __init__(self, log_interval: float = 60.0):
+        """
+        :param log_interval: Cada cuántos segundos se registra el progreso (0 para desactivar).
+        """
+        self._log_interval = log_interval
+        self._lock = threading.Lock()
+        self._heap: List[Tuple[int, str]] = []
+        self._pending: Dict[str, int] = {}
+        self._in_progress: Dict[str, int] = {}
+        self._total_files = 0
+        self._total_bytes = 0
+        self._processed_files = 0
+        self._processed_bytes = 0
+        self._failed_files = 0
+        self._discarded_files = 0
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._last_log = 0.0
+
+    def extend(self, file_paths: Iterable[str]):
+        """Añade archivos al backlog; los que ya no existen se omiten."""
+        with self._lock:
+            for file_path in file_paths:
+                key = self._key(file_path)
+                if key in self._pending or key in self._in_progress:
+                    continue
+                try:
+                    size = os.path.getsize(file_path)
+                except OSError:
+                    continue
+                heapq.heappush(self._heap, (size, file_path))
+                self._pending[key] = size
+                self._total_files += 1
+                self._total_bytes += size
+            self._finished_at = None
+        logger.info(f'Backlog de ingestión: {self._total_files} archivos, {self._total_bytes / 1024 ** 2:.1f} MB')
+
+    def discard(self, file_path: str) -> bool:
+        """
+        Retira un archivo pendiente del backlog y del total, porque se procesa por otra vía.
+
+        :param file_path:
+        :return: ``True`` si estaba pendiente.
+        """
+        with self._lock:
+            size = self._pending.pop(self._key(file_path), None)
+            if size is None:
+                return False
+            # El heap se depura de forma perezosa al sacar el siguiente archivo
+            self._total_files -= 1
+            self._total_bytes -= size
+            self._discarded_files += 1
+            return True
+
+    def iter_paths(self,
+                   pause_while: Optional[Callable[[], bool]] = None,
+                   stop_event: Optional[threading.Event] = None,
+                   poll_interval: float = 0.5
+                   ) -> Iterator[str]:
+        """
+        Entrega los archivos pendientes del más pequeño al más grande.
+
+        :param pause_while: Mientras devuelva ``True`` no se entrega ningún archivo.
+        :param stop_event: Termina la iteración cuando se activa.
+        :param poll_interval: Intervalo entre comprobaciones mientras está en pausa.
+        :return:
+        """
+        stop_event = stop_event or threading.Event()
+        with self._lock:
+            self._started_at = self._started_at or time.time()
+        while not stop_event.is_set():
+            if pause_while is not None and pause_while():
+                stop_event.wait(poll_interval)
+                continue
+            file_path = self._pop()
+            if file_path is None:
+                return
+            yield file_path
+
+    def mark_processed(self, file_path: str, succeeded: bool = True):
+        """Registra el fin del procesamiento de un archivo entregado por ``iter_paths``."""
+        with self._lock:
+            size = self._in_progress.pop(self._key(file_path), None)
+            if size is None:
+                return
+            self._processed_files += 1
+            self._processed_bytes += size
+            if not succeeded:
+                self._failed_files += 1
+            if not self._pending and not self._in_progress:
+                self._finished_at = time.time()
+            should_log = self._log_interval > 0 and (
+                time.time() - self._last_log >= self._log_interval or self._finished_at is not None
+            )
+            if should_log:
+                self._last_log = time.time()
+        if should_log:
+            logger.info(f'Progreso del backlog: {self.progress()}')
+
+    def progress(self) -> Dict[str, float]:
+        """
+        Devuelve el progreso del backlog: archivos y bytes totales, pendientes, en curso y
+        procesados, el ritmo (archivos por hora y bytes por segundo) y el tiempo restante
+        estimado en segundos (-1 mientras no hay datos suficientes).
+        """
+        with self._lock:
+            now = self._finished_at or time.time()
+            elapsed = now - self._started_at if self._started_at else 0.0
+            remaining_bytes = self._total_bytes - self._processed_bytes
+            bytes_per_second = self._processed_bytes / elapsed if elapsed > 0 else 0.0
+            if not self._pending and not self._in_progress:
+                eta = 0.0
+            elif bytes_per_second > 0:
+                eta = remaining_bytes / bytes_per_second
+            else:
+                eta = -1.0
+            return {
+                'total_files': self._total_files,
+                'total_bytes': self._total_bytes,
+                'pending_files': len(self._pending),
+                'in_progress_files': len(self._in_progress),
+                'processed_files': self._processed_files,
+                'processed_bytes': self._processed_bytes,
+                'failed_files': self._failed_files,
+                'discarded_files': self._discarded_files,
+                'percent_done': 100.0 * self._processed_bytes / self._total_bytes if self._total_bytes else 100.0,
+                'elapsed_seconds': elapsed,
+                'files_per_hour': self._processed_files * 3600 / elapsed if elapsed > 0 else 0.0,
+                'bytes_per_second': bytes_per_second,
+                'eta_seconds': eta,
+            }
+
+    ########################################################
+
+    def _pop(self) -> Optional[str]:
+        with self._lock:
+            while self._heap:
+                _, file_path = heapq.heappop(self._heap)
+                key = self._key(file_path)
+                size = self._pending.pop(key, None)
+                if size is None:
+                    continue  # Descartado
+                self._in_progress[key] = size
+                return file_path
+        return None
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.normcase(os.path.abspath(file_path))
@@ -1,7 +1,9 @@
+import asyncio
 from typing import (
     Any,
     List,
     Optional,
+    Tuple,
     Union,
     Dict,
 )
@@ -9,7 +11,6 @@ from typing import (
 import vertexai
 from google.oauth2 import service_account
 from vertexai.generative_models import (
-    GenerationConfig,
     GenerativeModel,
     Part,
     Image
@@ -17,13 +18,23 @@ from vertexai.generative_models import (
 
 from langchain_core.language_models import LLM
 from langchain_core.pydantic_v1 import Field
-from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 
 import logging
 import traceback
 
+from ....Concurrency import LLM as LLM_BUDGET, get_governor, get_llm_guard
+from ....Metrics import get_metrics
+
 logger = logging.getLogger(__name__)
 
+# Modos de la caché de respuestas: usarla, ignorarla o volver a generar y sobrescribir la respuesta
+CACHE_MODES = ('use', 'bypass', 'refresh')
+# Argumentos de ``_call`` que no forman parte de los parámetros de generación
+_NON_GENERATION_KWARGS = ('image_path', 'cache_mode')
+# Tokens que Gemini cuenta por imagen, para el límite de tokens por minuto
+_IMAGE_TOKENS = 258
+
 ContentDict = Dict[str, Any]
 ContentsType = Union[
     List["Content"],
@@ -38,13 +49,30 @@ class GCP_Model(LLM):
 
     model_name: str = Field(default="text-bison", alias="model")
     vertex_client: GenerativeModel = None
+    # LLMResponseCache compartida; sin ella cada llamada va al modelo
+    response_cache: Any = None
+    cache_mode: str = "use"
 
     def __init__(self,
                  model_name: str,
                  credentials_path: Optional[str] = None,
+                 response_cache: Any = None,
+                 cache_mode: str = "use",
                  **kwargs: Any
                  ):
+        """
+        :param model_name:
+        :param credentials_path:
+        :param response_cache: ``LLMResponseCache`` donde se guardan las respuestas por modelo,
+            parámetros, prompt e imagen.
+        :param cache_mode: ``use``, ``bypass`` (no leer ni escribir) o ``refresh`` (no leer pero
+            sobrescribir). Se puede indicar también por llamada: ``invoke(prompt, cache_mode=...)``.
+        """
+        if cache_mode not in CACHE_MODES:
+            raise ValueError(f"cache_mode debe ser uno de {CACHE_MODES}: {cache_mode}")
         super().__init__(**kwargs)
+        self.response_cache = response_cache
+        self.cache_mode = cache_mode
 
         if credentials_path:
             credentials: service_account.Credentials = (
@@ -63,6 +91,79 @@ class GCP_Model(LLM):
             run_manager: Optional[CallbackManagerForLLMRun] = None,
             **kwargs: Any,
     ) -> str:
+        # La caché se consulta aquí para que sirva tanto a ``invoke`` directo como a las cadenas de LangChain
+        cache_key, cached_text = self._lookup_cache(prompt, stop, kwargs)
+        if cached_text is not None:
+            if run_manager:
+                run_manager.on_llm_end(cached_text)
+            return cached_text
+
+        contents, estimated_tokens = self._build_contents(prompt, kwargs)
+        generated = get_llm_guard().call(self._generate_content, contents, tokens=estimated_tokens)
+        generated_text = self._extract_text(generated)
+
+        if cache_key is not None:
+            self.response_cache.put(cache_key, self.model_name, generated_text)
+
+        if run_manager:
+            run_manager.on_llm_end(generated_text)
+
+        # print("\n\n", generated_text, "\n\n\n")
+        return generated_text
+
+    async def _acall(
+            self,
+            prompt: str,
+            stop: Optional[List[str]] = None,
+            run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+            **kwargs: Any,
+    ) -> str:
+        """
+        Versión asíncrona nativa de ``_call`` (``ainvoke`` / ``chain.ainvoke``): la petición se espera
+        con ``generate_content_async`` en lugar de ocupar un hilo. La caché de respuestas y la carga
+        de la imagen van a un hilo aparte para no bloquear el bucle de eventos. La concurrencia la
+        limita el mismo presupuesto ``llm`` del gobernador que la ruta síncrona; el ritmo, los
+        reintentos y el circuito son los compartidos.
+        """
+        cache_key, cached_text = await asyncio.to_thread(self._lookup_cache, prompt, stop, kwargs)
+        if cached_text is not None:
+            if run_manager:
+                await run_manager.on_llm_end(cached_text)
+            return cached_text
+
+        contents, estimated_tokens = await asyncio.to_thread(self._build_contents, prompt, kwargs)
+        generated = await get_llm_guard().acall(self._agenerate_content, contents, tokens=estimated_tokens)
+        generated_text = self._extract_text(generated)
+
+        if cache_key is not None:
+            await asyncio.to_thread(self.response_cache.put, cache_key, self.model_name, generated_text)
+
+        if run_manager:
+            await run_manager.on_llm_end(generated_text)
+        return generated_text
+
+    def _lookup_cache(self, prompt: str, stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        """Devuelve la clave de la petición en la caché de respuestas (``None`` sin caché) y la respuesta guardada."""
+        cache_mode = kwargs.get("cache_mode") or self.cache_mode
+        if self.response_cache is None or cache_mode == "bypass":
+            return None, None
+        params = {
+            **self._identifying_params,
+            "stop": stop,
+            **{key: value for key, value in kwargs.items() if key not in _NON_GENERATION_KWARGS},
+        }
+        cache_key = self.response_cache.key(self.model_name, params, prompt, kwargs.get("image_path"))
+        if cache_mode == "use":
+            cached_text = self.response_cache.get(cache_key)
+            if cached_text is not None:
+                get_metrics().increment('llm_cache_hits')
+                return cache_key, cached_text
+        get_metrics().increment('llm_cache_misses')
+        return cache_key, None
+
+    @staticmethod
+    def _build_contents(prompt: str, kwargs: Dict[str, Any]) -> Tuple[List[Any], int]:
+        """Partes de la petición (texto e imagen opcional) y sus tokens estimados."""
         text_part = Part.from_text(prompt)
         contents = [text_part]
         # print(prompt)
@@ -71,9 +172,13 @@ class GCP_Model(LLM):
             image_part = Image.load_from_file(kwargs["image_path"])
             contents.append(image_part)
 
-        generated = self.vertex_client.generate_content(contents)
+        estimated_tokens = len(prompt) // 4 + (_IMAGE_TOKENS if kwargs.get("image_path") else 0)
+        return contents, estimated_tokens
+
+    @staticmethod
+    def _extract_text(generated: Any) -> str:
         try:
-            generated_text = generated.candidates[0].content.parts[0].text
+            return generated.candidates[0].content.parts[0].text
         except Exception as e:
             # Manejo de cualquier tipo de excepción
             logger.error("An error occurred while processing generated text.")
@@ -85,17 +190,23 @@ class GCP_Model(LLM):
             logger.error(f"Error details: {e}")
             logger.error(f"Traceback: {error_trace}")
 
+            get_metrics().increment('llm_errors')
+
             # Registrar el contenido de 'generated' al momento del error
             logger.error(f"Content of 'generated' when the error occurred: {generated}")
 
             # Opcional: almacenar un mensaje de error en lugar del resultado esperado
             raise Exception("An error occurred while processing generated text.")
 
-        if run_manager:
-            run_manager.on_llm_end(generated_text)
+    def _generate_content(self, contents: List[Any]):
+        get_metrics().increment('llm_calls')
+        with get_governor().slot(LLM_BUDGET):
+            return self.vertex_client.generate_content(contents)
 
-        # print("\n\n", generated_text, "\n\n\n")
-        return generated_text
+    async def _agenerate_content(self, contents: List[Any]):
+        get_metrics().increment('llm_calls')
+        async with get_governor().aslot(LLM_BUDGET):
+            return await self.vertex_client.generate_content_async(contents)
 
     @property
     def _identifying_params(self) -> Dict[str, Any]:
@@ -0,0 +1,28 @@
+from typing import List
+
+from langchain_core.pydantic_v1 import BaseModel, Field
+
+
+class BlockEvaluation(BaseModel):
+    id: int = Field(
+        description="The id of the evaluated block, exactly as given in its <block> tag."
+    )
+    makes_sense: bool = Field(
+        default=False,
+        description="Indicates whether the text is coherent and understandable."
+    )
+    block_type: str = Field(
+        default="",
+        description="Specifies the category of the text block, such as 'Title', 'Author Names', 'Bibliography', etc."
+    )
+    description: str = Field(
+        default="",
+        description="Provides a concise summary or explanation of the text block's content."
+    )
+
+
+class BatchTextEvaluation(BaseModel):
+    blocks: List[BlockEvaluation] = Field(
+        default_factory=list,
+        description="One evaluation per block, in the same order as the blocks."
+    )
@@ -0,0 +1,3 @@
+from .__template import TEMPLATE
+from .__BatchTextEvaluation import BatchTextEvaluation, BlockEvaluation
+from .create_chain_batch_evaluation import create_chain_batch_evaluation, format_blocks
\ No newline at end of file
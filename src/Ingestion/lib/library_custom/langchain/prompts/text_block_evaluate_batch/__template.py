@@ -0,0 +1,34 @@
+TEMPLATE = """
+Your role is to generate JSON output and nothing else. You should only return JSON in your response.
+
+Review the following previously classified text blocks. They are consecutive blocks of the same document, in reading order:
+<blocks description="These are the IMPORTANT text blocks that need to be evaluated and classified, one evaluation per block.">
+{blocks}
+</blocks>
+
+<next_block desciption="This block follows the last one and is for informational purposes only. Do not evaluate it.">
+    {next_block}
+</next_block>
+
+Assessment Task, for EACH block:
+1. Determine if the text makes sense by itself. The neighbouring blocks are only an aid to classify it.
+   - If it does not make sense, label it as 'UncategorizedText'.
+   - If it does make sense, classify it into one of the following categories based on its content:
+
+Categories:
+- 'Title': Used for the main and sectional headings of a document, such as "Annual Report," "Introduction," "Methodology," or more specific parts like "1. Introduction," "2. Methodology." These titles are usually followed by blocks of 'NarrativeText'
+- 'Author Names': For listing one or more authors of the document.
+- 'Bibliography': For parts of the bibliography section, which may include citations of books, articles, and online sources typically found at the end of academic works.
+- 'FigureCaption': For labels and descriptions of figures or tables, ensure they always begin with "Figure #:" or "Table #:", followed by the specific description. For example, "Figure 1: Population Trends over Time ..." or "Table 2: Detailed Revenue Comparison by Quarter ..."
+- 'NarrativeText': For extensive text blocks that form the main content of the document. These are usually longer, containing multiple sentences and spanning several paragraphs, providing in-depth information and discussion.
+- 'UncategorizedText': For text that does not clearly fit into any other categories or whose meaning is unclear.
+
+Additional Meta Information:
+<meta>
+{meta}
+</meta>
+
+Formatting Instructions (IMPORTANT):
+Return exactly one evaluation per block, with the block id.
+{format_instructions}
+"""
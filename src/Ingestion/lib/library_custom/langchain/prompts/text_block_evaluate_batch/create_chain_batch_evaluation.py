@@ -0,0 +1,48 @@
+from typing import Dict, Sequence
+
+from langchain_core.language_models import BaseLLM
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import PromptTemplate
+from .__BatchTextEvaluation import BatchTextEvaluation
+from .__template import TEMPLATE
+
+
+def create_chain_batch_evaluation(
+        model: BaseLLM
+):
+    """
+    Create a chain for evaluating several consecutive text blocks in one request.
+
+    The input has ``blocks`` (formatted with ``format_blocks``), ``next_block`` and ``meta``; the
+    output is ``{"blocks": [{"id": ..., "makes_sense": ..., "block_type": ..., "description": ...}]}``.
+
+    :param model:
+
+    :return: chain
+    """
+    parser = JsonOutputParser(pydantic_object=BatchTextEvaluation)
+
+    prompt = PromptTemplate(
+        template=TEMPLATE,
+        input_variables=["blocks", "next_block", "meta"],
+        partial_variables={
+            "format_instructions": parser.get_format_instructions(),
+        },
+    )
+
+    chain = prompt | model | parser
+
+    return chain
+
+
+def format_blocks(blocks: Sequence[Dict]) -> str:
+    """
+    Formats the blocks of a batch for the prompt.
+
+    :param blocks: Dictionaries with the ``id``, ``old_type`` and ``text`` of each block.
+    :return:
+    """
+    return '\n'.join(
+        f'<block id="{block["id"]}" classification="{block["old_type"]}">\n{block["text"]}\n</block>'
+        for block in blocks
+    )
@@ -0,0 +1,99 @@
+from typing import (
+    Any,
+    List,
+)
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+
+from ....Cache import EmbeddingCache
+from ....Concurrency import EMBEDDING, get_governor
+from ....Metrics import get_metrics
+
+Embedding = List[float]
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Envoltorio de un modelo de embeddings que reutiliza los embeddings ya calculados
+    (por hash del texto) y solo llama al modelo para los textos nuevos.
+
+    Sirve tanto como transformación final del pipeline como ``embed_model`` del
+    ``SemanticSplitterNodeParser``.
+    """
+
+    embed_model: BaseEmbedding = Field(description="Modelo de embeddings envuelto")
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(
+            self,
+            embed_model: BaseEmbedding,
+            cache: EmbeddingCache,
+            **kwargs: Any,
+    ) -> None:
+        kwargs.setdefault("model_name", embed_model.model_name)
+        kwargs.setdefault("embed_batch_size", embed_model.embed_batch_size)
+        super().__init__(embed_model=embed_model, **kwargs)
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def get_text_embedding_batch(
+            self,
+            texts: List[str],
+            show_progress: bool = False,
+            **kwargs: Any,
+    ) -> List[Embedding]:
+        hashes, embeddings, missing = self._lookup(texts)
+        if missing:
+            with get_governor().slot(EMBEDDING):
+                computed = self.embed_model.get_text_embedding_batch(
+                    [texts[i] for i in missing], show_progress=show_progress, **kwargs
+                )
+            self._store(hashes, embeddings, missing, computed)
+        return embeddings
+
+    async def aget_text_embedding_batch(
+            self,
+            texts: List[str],
+            show_progress: bool = False,
+            **kwargs: Any,
+    ) -> List[Embedding]:
+        hashes, embeddings, missing = self._lookup(texts)
+        if missing:
+            async with get_governor().aslot(EMBEDDING):
+                computed = await self.embed_model.aget_text_embedding_batch(
+                    [texts[i] for i in missing], show_progress=show_progress, **kwargs
+                )
+            self._store(hashes, embeddings, missing, computed)
+        return embeddings
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self.get_text_embedding_batch([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self.aget_text_embedding_batch([text]))[0]
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self.embed_model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await self.embed_model.aget_query_embedding(query)
+
+    def _lookup(self, texts: List[str]):
+        """Busca los textos en la caché; devuelve los hashes, los embeddings (``None`` si faltan) y los índices faltantes."""
+        hashes = [self._cache.text_hash(text) for text in texts]
+        cached = self._cache.get_many(self.model_name, hashes)
+        embeddings = [cached.get(text_hash) for text_hash in hashes]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        get_metrics().increment('embedding_cache_hits', len(texts) - len(missing))
+        return hashes, embeddings, missing
+
+    def _store(self, hashes: List[str], embeddings: List[Embedding], missing: List[int], computed: List[Embedding]):
+        metrics = get_metrics()
+        metrics.increment('embedding_calls')
+        metrics.increment('embedded_texts', len(missing))
+        for i, embedding in zip(missing, computed):
+            embeddings[i] = embedding
+        self._cache.put_many(self.model_name, {hashes[i]: embeddings[i] for i in missing})
@@ -1 +1,2 @@
-from .VertexIEmbeddings import VertexIEmbeddings
\ No newline at end of file
+from .VertexIEmbeddings import VertexIEmbeddings
+from .CachedEmbedding import CachedEmbedding
\ No newline at end of file
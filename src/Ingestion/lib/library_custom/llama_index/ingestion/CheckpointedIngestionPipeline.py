@@ -0,0 +1,216 @@
+import asyncio
+import logging
+from hashlib import sha256
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.ingestion.pipeline import remove_unstable_values
+from llama_index.core.node_parser import NodeParser
+from llama_index.core.schema import BaseNode, Document, MetadataMode, NodeRelationship, TransformComponent
+
+from ....Cache import get_metadata_cache
+from ....Metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+def _has_native_acall(transform: TransformComponent) -> bool:
+    """
+    Si el ``acall`` de la transformación es asíncrono de verdad. El de ``TransformComponent`` y el
+    de los ``NodeParser`` sin ``_aparse_nodes`` propio (p. ej. ``SemanticSplitterNodeParser``, que
+    llama al modelo de embeddings) ejecutan la versión síncrona y bloquearían el bucle de eventos.
+    """
+    if isinstance(transform, NodeParser):
+        return type(transform)._aparse_nodes is not NodeParser._aparse_nodes
+    return type(transform).acall is not TransformComponent.acall
+
+
+async def acall_transformation(transform: TransformComponent, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+    """
+    Ejecuta una transformación desde una corrutina: con su ``acall`` si es asíncrono y, si no, en
+    un hilo aparte para que el bucle de eventos siga atendiendo a los demás documentos.
+    """
+    if _has_native_acall(transform):
+        return await transform.acall(nodes, **kwargs)
+    return await asyncio.to_thread(transform, nodes, **kwargs)
+
+
+class CheckpointedIngestionPipeline(IngestionPipeline):
+    """
+    IngestionPipeline que guarda un punto de control duradero tras cada transformación.
+
+    La clave de cada etapa se encadena a partir del hash de los nodos de entrada y del hash de
+    la configuración de cada etapa hasta ella. Al volver a ejecutar el pipeline con la misma
+    entrada se carga el punto de control de la última etapa completada y se continúa desde ahí,
+    sin repetir el trabajo (de pago) de las etapas anteriores. Si cambia la configuración de
+    una etapa, cambian su clave y las de las etapas siguientes, pero no las anteriores. La clave
+    de las etapas que leen el JSON de metadata de los documentos (``meta_folder_path``) incluye
+    también el hash de su contenido, así que editar ese JSON invalida esas etapas y las siguientes.
+    """
+
+    checkpoint_store: Any = Field(default=None, description="StageCheckpointStore where the stage outputs are saved")
+
+    def __init__(self,
+                 transformations: List[TransformComponent],
+                 checkpoint_store: Any,
+                 **kwargs: Any
+                 ):
+        # La caché en memoria de Llama-Index se desactiva: los puntos de control la sustituyen
+        super().__init__(transformations=transformations, disable_cache=True, **kwargs)
+        self.checkpoint_store = checkpoint_store
+
+    @property
+    def stage_names(self) -> List[str]:
+        """Nombres de las etapas: posición y clase de cada transformación."""
+        return [f"{index:02d}_{type(transform).__name__}" for index, transform in enumerate(self.transformations)]
+
+    def run(self,
+            show_progress: bool = False,
+            documents: Optional[List[Document]] = None,
+            nodes: Optional[Sequence[BaseNode]] = None,
+            cache_collection: Optional[str] = None,
+            in_place: bool = True,
+            store_doc_text: bool = True,
+            num_workers: Optional[int] = None,
+            **kwargs: Any
+            ) -> Sequence[BaseNode]:
+        """
+        Runs the transformations, resuming from the last stage with a checkpoint for this input.
+        Falls back to the default behaviour when a docstore or vector store is configured.
+        """
+        if self.checkpoint_store is None or self.docstore is not None or self.vector_store is not None:
+            return super().run(
+                show_progress=show_progress, documents=documents, nodes=nodes,
+                cache_collection=cache_collection, in_place=in_place, store_doc_text=store_doc_text,
+                num_workers=num_workers, **kwargs
+            )
+
+        stages, first_stage, current_nodes = self._resume(self._prepare_inputs(documents, nodes))
+        for (stage, config_hash, key), transform in zip(stages[first_stage:], self.transformations[first_stage:]):
+            logger.info(f"Ejecutando la etapa {stage}")
+            with get_metrics().stage(stage, nodes_in=len(current_nodes)) as record:
+                current_nodes = transform(current_nodes, show_progress=show_progress, **kwargs)
+                record.nodes_out = len(current_nodes)
+            self.checkpoint_store.put(key, stage, config_hash, current_nodes)
+
+        return current_nodes
+
+    async def arun(self,
+                   show_progress: bool = False,
+                   documents: Optional[List[Document]] = None,
+                   nodes: Optional[Sequence[BaseNode]] = None,
+                   cache_collection: Optional[str] = None,
+                   in_place: bool = True,
+                   store_doc_text: bool = True,
+                   num_workers: Optional[int] = None,
+                   **kwargs: Any
+                   ) -> Sequence[BaseNode]:
+        """
+        Async version of ``run`` with the same checkpoints, so several documents can run
+        concurrently in one event loop: stages with a real ``acall`` are awaited and the others
+        run in a worker thread (``acall_transformation``).
+        """
+        if self.checkpoint_store is None or self.docstore is not None or self.vector_store is not None:
+            return await super().arun(
+                show_progress=show_progress, documents=documents, nodes=nodes,
+                cache_collection=cache_collection, in_place=in_place, store_doc_text=store_doc_text,
+                num_workers=num_workers, **kwargs
+            )
+
+        stages, first_stage, current_nodes = self._resume(self._prepare_inputs(documents, nodes))
+        for (stage, config_hash, key), transform in zip(stages[first_stage:], self.transformations[first_stage:]):
+            logger.info(f"Ejecutando la etapa {stage}")
+            with get_metrics().stage(stage, nodes_in=len(current_nodes)) as record:
+                current_nodes = await acall_transformation(transform, current_nodes, show_progress=show_progress, **kwargs)
+                record.nodes_out = len(current_nodes)
+            self.checkpoint_store.put(key, stage, config_hash, current_nodes)
+
+        return current_nodes
+
+    def invalidate(self, stage: str) -> int:
+        """Elimina todos los puntos de control de una etapa."""
+        return self.checkpoint_store.invalidate(stage)
+
+    def invalidate_changed_stages(self) -> Dict[str, int]:
+        """
+        Elimina los puntos de control de las etapas cuya configuración ya no coincide con la actual.
+        Las etapas sin cambios conservan los suyos.
+
+        :return: Número de puntos de control eliminados por etapa.
+        """
+        current = {stage: self._config_hash(transform) for stage, transform in zip(self.stage_names, self.transformations)}
+        invalidated = {}
+        for stage, config_hashes in self.checkpoint_store.config_hashes().items():
+            if stage in current and config_hashes - {current[stage]}:
+                invalidated[stage] = self.checkpoint_store.invalidate(stage, keep_config_hash=current[stage])
+                logger.info(f"Configuración de la etapa {stage} modificada: {invalidated[stage]} puntos de control eliminados")
+        return invalidated
+
+    ########################################################
+
+    def _resume(self, nodes: Sequence[BaseNode]) -> Tuple[List[Tuple[str, str, str]], int, Sequence[BaseNode]]:
+        """
+        Returns the stage keys, the first stage to run and its input nodes: the output of the last
+        stage with a checkpoint for this input, or the input itself.
+        """
+        stages = self._stage_keys(nodes)
+        for index in range(len(stages) - 1, -1, -1):
+            cached_nodes = self.checkpoint_store.get(stages[index][2])
+            if cached_nodes is not None:
+                logger.info(f"Punto de control encontrado para la etapa {stages[index][0]}: {len(cached_nodes)} nodos")
+                get_metrics().increment('checkpoint_hits', stage=stages[index][0])
+                return stages, index + 1, cached_nodes
+        return stages, 0, nodes
+
+    def _stage_keys(self, nodes: Sequence[BaseNode]) -> List[Tuple[str, str, str]]:
+        """Devuelve, para cada etapa, su nombre, el hash de su configuración y su clave encadenada."""
+        key = self._input_hash(nodes)
+        titles = sorted({node.metadata.get('title_of_the_document') for node in nodes} - {None})
+        stages = []
+        for stage, transform in zip(self.stage_names, self.transformations):
+            config_hash = self._config_hash(transform)
+            metadata_hash = self._metadata_hash(transform, titles)
+            key = sha256(f"{key}:{stage}:{config_hash}{metadata_hash}".encode('utf-8')).hexdigest()
+            stages.append((stage, config_hash, key))
+        return stages
+
+    @staticmethod
+    def _metadata_hash(transform: TransformComponent, titles: List[str]) -> str:
+        """
+        Hash del JSON de metadata de los documentos para las etapas que lo leen (``":<hash>"``), o
+        ``""`` para las demás, cuya clave no cambia. Se lee con la caché de metadata compartida,
+        que las propias etapas reutilizan después.
+        """
+        meta_folder_path = getattr(transform, 'meta_folder_path', None)
+        if not meta_folder_path:
+            return ''
+        metadata_cache = get_metadata_cache()
+        digest = sha256()
+        for title in titles:
+            digest.update(title.encode('utf-8') + b'\x1f')
+            digest.update(metadata_cache.get_text(metadata_cache.path(meta_folder_path, title)).encode('utf-8'))
+            digest.update(b'\x1e')
+        return f":{digest.hexdigest()}"
+
+    @staticmethod
+    def _config_hash(transform: TransformComponent) -> str:
+        try:
+            config = remove_unstable_values(str(transform.to_dict()))
+        except Exception as e:
+            logger.warning(f"No se pudo serializar la configuración de {type(transform).__name__}: {e}")
+            config = type(transform).__name__
+        return sha256(config.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _input_hash(nodes: Sequence[BaseNode]) -> str:
+        digest = sha256()
+        for node in nodes:
+            digest.update(node.node_id.encode('utf-8'))
+            digest.update(node.get_content(metadata_mode=MetadataMode.ALL).encode('utf-8'))
+            for relationship in (NodeRelationship.PREVIOUS, NodeRelationship.NEXT):
+                related = node.relationships.get(relationship)
+                digest.update(b'\x1f' + (related.node_id.encode('utf-8') if related else b''))
+            digest.update(b'\x1e')
+        return digest.hexdigest()
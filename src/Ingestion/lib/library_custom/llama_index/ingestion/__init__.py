@@ -0,0 +1 @@
+from .CheckpointedIngestionPipeline import CheckpointedIngestionPipeline, acall_transformation
@@ -0,0 +1,92 @@
+import logging
+from typing import Any, Sequence
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+)
+from llama_index.llms.vertex import Vertex
+
+from ....Concurrency import LLM as LLM_BUDGET, get_governor, get_llm_guard
+from ....Metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+
+class GuardedVertex(Vertex):
+    """
+    Vertex LLM of llama_index whose calls go through the shared LLM guard (rate limits, backoff
+    and circuit breaker) and the LLM concurrency budget, like ``GCP_Model``. Its own retry loop is
+    limited to one attempt so that retries are not nested, so every call method is guarded: sync,
+    async and streaming. A stream is guarded while it is opened; errors while it is being read
+    reach the caller.
+    """
+
+    def __init__(self, *args: Any, max_retries: int = 1, **kwargs: Any):
+        super().__init__(*args, max_retries=max_retries, **kwargs)
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return get_llm_guard().call(
+            self._guarded, super().complete, prompt, formatted=formatted,
+            tokens=len(prompt) // 4, **kwargs
+        )
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return get_llm_guard().call(
+            self._guarded, super().chat, messages, tokens=self._chat_tokens(messages), **kwargs
+        )
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        return get_llm_guard().call(
+            self._guarded, super().stream_complete, prompt, formatted=formatted,
+            tokens=len(prompt) // 4, **kwargs
+        )
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        return get_llm_guard().call(
+            self._guarded, super().stream_chat, messages, tokens=self._chat_tokens(messages), **kwargs
+        )
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return await get_llm_guard().acall(
+            self._aguarded, super().acomplete, prompt, formatted=formatted,
+            tokens=len(prompt) // 4, **kwargs
+        )
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return await get_llm_guard().acall(
+            self._aguarded, super().achat, messages, tokens=self._chat_tokens(messages), **kwargs
+        )
+
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        return await get_llm_guard().acall(
+            self._aguarded, super().astream_complete, prompt, formatted=formatted,
+            tokens=len(prompt) // 4, **kwargs
+        )
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        return await get_llm_guard().acall(
+            self._aguarded, super().astream_chat, messages, tokens=self._chat_tokens(messages), **kwargs
+        )
+
+    @staticmethod
+    def _chat_tokens(messages: Sequence[ChatMessage]) -> int:
+        return sum(len(str(message.content or '')) for message in messages) // 4
+
+    @staticmethod
+    def _guarded(fn, *args: Any, **kwargs: Any) -> Any:
+        get_metrics().increment('llm_calls')
+        with get_governor().slot(LLM_BUDGET):
+            return fn(*args, **kwargs)
+
+    @staticmethod
+    async def _aguarded(fn, *args: Any, **kwargs: Any) -> Any:
+        get_metrics().increment('llm_calls')
+        async with get_governor().aslot(LLM_BUDGET):
+            return await fn(*args, **kwargs)
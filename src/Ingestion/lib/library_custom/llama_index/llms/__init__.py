@@ -0,0 +1 @@
+from .GuardedVertex import GuardedVertex
\ No newline at end of file
@@ -1,11 +1,11 @@
-import json
-import os
 from typing import Any
 import logging
 
 from llama_index.core.schema import TransformComponent
 from llama_index.core.bridge.pydantic import Field
 
+from ....Cache import get_metadata_cache
+
 logger = logging.getLogger(__name__)
 logger.propagate = True
 
@@ -23,19 +23,12 @@ class DictionaryToMetadata(TransformComponent):
 
     def __call__(self, nodes, **kwargs):
         logger.info("Processing nodes... (DictionaryToMetadata)")
+        metadata_cache = get_metadata_cache()
+        # Each document's JSON is read and parsed once; every node gets the keys of the same shared dict
+        dictionaries = {}
         for node in nodes:
-            meta_path = os.path.join(self.meta_folder_path, f"{node.metadata['title_of_the_document']}.json")
-            dictionary = self._load_metadata(meta_path)
-            node.metadata.update(dictionary)
+            title = node.metadata['title_of_the_document']
+            if title not in dictionaries:
+                dictionaries[title] = metadata_cache.get(metadata_cache.path(self.meta_folder_path, title))
+            node.metadata.update(dictionaries[title])
         return nodes
-
-    def _load_metadata(self, json_path: str) -> dict:
-        """Load metadata from a folder."""
-        try:
-            with open(json_path, 'r') as archivo:
-                metadata = archivo.read()
-                logger.debug("JSON metadata loaded successfully")
-        except Exception as e:
-            logger.error("Failed to load JSON metadata from %s: %s", json_path, e)
-            metadata = ""
-        return json.loads(metadata)
@@ -24,4 +24,4 @@ class Unstructured_Filter(TransformComponent):
         logger.info("Processing nodes... (Unstructured_Filter)")
         list_manager = LinkedListManager(nodes)
         list_manager.remove_nodes_by_block_type(self.filter_block_type)
-        return list(list_manager.nodes.values())
\ No newline at end of file
+        return list_manager.ordered_nodes()
\ No newline at end of file
@@ -1,86 +1,497 @@
+import asyncio
 import logging
 import traceback
-import os
-from typing import Sequence, Any
+import weakref
+from collections import defaultdict
+from typing import Sequence, Any, Dict, List, Optional, Tuple
 import concurrent.futures
-import time
 
+from langchain_core.exceptions import OutputParserException
 from llama_index.core.schema import TransformComponent, BaseNode, NodeRelationship
-from llama_index.core.bridge.pydantic import Field
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
 
 from ...langchain.models import GCP_Model
+from ....Cache import get_metadata_cache
+from ....Concurrency import LLM, CircuitOpenError, classify_error, get_governor
+from ....Metrics import get_metrics
 from ...langchain.prompts.text_block_evaluate import create_chain_evaluation
+from ...langchain.prompts.text_block_evaluate_batch import create_chain_batch_evaluation, format_blocks
+from ._RuleBasedClassifier import RuleBasedClassifier
+from ._TableExtractor import HTMLTableExtractor
 from ...langchain.prompts.img_to_text import transcriber_job_description_prompt, image_summary_transcriber_prompt
 
 logger = logging.getLogger(__name__)
 logger.propagate = True
 
+# Bloques que se transcriben a partir de su recorte y no se clasifican por texto
+_IMAGE_BLOCK_TYPES = ('Table', 'Image')
+# Tokens estimados de la evaluación de un bloque en la respuesta de un lote
+_OUTPUT_TOKENS_PER_BLOCK = 80
+
 class Unstructured_Medatata_PostProcessor(TransformComponent):
 
     gcp_model: GCP_Model = None
     chain_evaluator: Any = Field(default=None, description="Chain evaluator for evaluating text blocks")
     meta_folder_path: str = Field(default=None, description="Path to the folder containing metadata files")
+    block_cache: Any = Field(default=None, description="BlockResultCache with the results of previous runs")
+    image_cache: Any = Field(default=None, description="ImageTranscriptionCache shared by all files and runs")
+    context_window: int = Field(default=1, description="Number of following blocks given to the model as context")
+    batch_evaluator: Any = Field(default=None, description="Chain evaluator for batches of text blocks")
+    batch_size: int = Field(default=1, description="Maximum number of text blocks classified per request (1 disables batching)")
+    max_batch_tokens: int = Field(default=8000, description="Approximate token budget of the blocks of a batch and their answers")
+    rule_confidence: Optional[float] = Field(default=None, description="Minimum confidence of the rule-based classifier to skip the LLM (None disables it)")
+    table_quality_threshold: Optional[float] = Field(default=None, description="Minimum quality of a table converted from its inferred HTML to skip the multimodal transcription (None disables it)")
+
+    _batch_limit: int = PrivateAttr(default=1)
+    _rule_classifier: Any = PrivateAttr(default=None)
+    _table_extractor: Any = PrivateAttr(default=None)
+    # Ruta asíncrona: límite de peticiones en vuelo, un semáforo por bucle de eventos y las
+    # transcripciones de recortes en curso (para no repetir un recorte que ya se está transcribiendo)
+    _async_concurrency: int = PrivateAttr(default=64)
+    _semaphores: Any = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    _async_flights: Dict[Any, Any] = PrivateAttr(default_factory=dict)
 
     def __init__(self,
                   gcp_model: GCP_Model,
                   meta_folder_path: str,
+                  block_cache: Any = None,
+                  image_cache: Any = None,
+                  context_window: int = 1,
+                  batch_size: int = 1,
+                  max_batch_tokens: int = 8000,
+                  rule_confidence: Optional[float] = None,
+                  table_quality_threshold: Optional[float] = None,
+                  async_concurrency: int = 64,
                   **kwargs: Any
                   ):
         super().__init__(**kwargs)
         self.gcp_model = gcp_model
         self.meta_folder_path = meta_folder_path
+        self.block_cache = block_cache
+        self.image_cache = image_cache
+        self.context_window = context_window
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self._batch_limit = batch_size
+        self.rule_confidence = rule_confidence
+        self._rule_classifier = RuleBasedClassifier()
+        self.table_quality_threshold = table_quality_threshold
+        self._table_extractor = HTMLTableExtractor()
+        self._async_concurrency = async_concurrency
         self.chain_evaluator = create_chain_evaluation(self.gcp_model)
+        self.batch_evaluator = create_chain_batch_evaluation(self.gcp_model)
         logger.info("Unstructured_Medatata_PostProcessor initialized")
 
     def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
         logger.info("Processing nodes... (Unstructured_Medatata_PostProcessor)")
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            futures = [executor.submit(self._reclasificar_bloque_con_reintentos, node, nodes) for node in nodes]
-            new_nodes = [future.result() for future in concurrent.futures.as_completed(futures)]
+        new_nodes, single_nodes, batches, next_texts = self._plan(nodes)
+        # Los bloques se envían al pool de LLM compartido por todos los archivos en curso
+        governor = get_governor()
+        futures = [
+            governor.submit(LLM, self._reclasificar_bloque, node, node_next_text)
+            for node, node_next_text in single_nodes
+        ]
+        batch_futures = [governor.submit(LLM, self._reclasificar_lote, batch, next_texts) for batch in batches]
+        new_nodes.extend(future.result() for future in concurrent.futures.as_completed(futures))
+        for future in concurrent.futures.as_completed(batch_futures):
+            new_nodes.extend(future.result())
+        return new_nodes
+
+    async def acall(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        """
+        Native async path: every block and batch is a coroutine and the model and transcription
+        requests are awaited concurrently, at most ``async_concurrency`` in flight per event loop,
+        instead of occupying a thread each. Several documents run through ``arun`` in the same loop
+        share that limit, and the model calls themselves also take a slot of the governor's ``llm``
+        budget, like the threaded path. The disk and SQLite work around the requests (block and image caches,
+        crop hashes, metadata files) runs in worker threads so it does not block the loop.
+        """
+        logger.info("Processing nodes... (Unstructured_Medatata_PostProcessor, async)")
+        new_nodes, single_nodes, batches, next_texts = await asyncio.to_thread(self._plan, nodes)
+        results = await asyncio.gather(
+            *(self._areclasificar_bloque(node, node_next_text) for node, node_next_text in single_nodes),
+            *(self._areclasificar_lote(batch, next_texts) for batch in batches)
+        )
+        new_nodes.extend(results[:len(single_nodes)])
+        for batch_nodes in results[len(single_nodes):]:
+            new_nodes.extend(batch_nodes)
         return new_nodes
 
-    def _reclasificar_bloque_con_reintentos(self, node: BaseNode, nodes: Sequence[BaseNode], intentos=0):
+    def _plan(self, nodes: Sequence[BaseNode]) -> Tuple[List[BaseNode], List[Tuple[BaseNode, Optional[str]]], List[List[BaseNode]], Dict[str, Optional[str]]]:
+        """
+        Resolves the blocks that need no request (block cache, rules and tables converted from
+        their inferred HTML) and splits the rest.
+
+        :return: The resolved nodes, the blocks sent one by one with their context, the batches of
+            text blocks and the context of every batched block.
+        """
+        cached_results = self._load_cached_results(nodes)
+        get_metrics().increment('block_cache_hits', len(cached_results))
+        new_nodes = []
+        # El índice por id se construye una vez y el contexto de cada bloque se calcula antes de
+        # enviarlo, con los textos originales, para que no dependa del orden en que terminan las tareas
+        nodes_by_id = {node.node_id: node for node in nodes}
+        single_nodes = []
+        batched_nodes = []
+        next_texts = {}
+        text_blocks = 0
+        rule_classified = 0
+        tables = 0
+        local_tables = 0
+        for node in nodes:
+            cached_result = cached_results.get(self._block_key(node))
+            if cached_result is not None:
+                new_nodes.append(self._apply_cached_result(node, cached_result))
+                continue
+            if node.metadata.get('block_type') and node.metadata['block_type'] not in _IMAGE_BLOCK_TYPES:
+                text_blocks += 1
+                if self._classify_by_rules(node):
+                    rule_classified += 1
+                    new_nodes.append(node)
+                    continue
+            if node.metadata.get('block_type') == 'Table':
+                tables += 1
+                if self._extract_table(node):
+                    local_tables += 1
+                    new_nodes.append(node)
+                    continue
+            node_next_text = self._get_next_node_text(node, nodes_by_id)
+            if self.batch_size > 1 and node.metadata.get('block_type') and node.metadata['block_type'] not in _IMAGE_BLOCK_TYPES:
+                batched_nodes.append(node)
+                next_texts[node.node_id] = node_next_text
+            else:
+                single_nodes.append((node, node_next_text))
+        if self.rule_confidence is not None and text_blocks:
+            get_metrics().increment('blocks_rule_classified', rule_classified)
+            get_metrics().increment('blocks_llm_classified', text_blocks - rule_classified)
+            logger.info(f"{rule_classified}/{text_blocks} bloques de texto clasificados por reglas sin LLM "
+                        f"({rule_classified / text_blocks:.0%})")
+        if self.table_quality_threshold is not None and tables:
+            get_metrics().increment('tables_local', local_tables)
+            get_metrics().increment('tables_multimodal', tables - local_tables)
+            logger.info(f"{local_tables}/{tables} tablas convertidas desde su HTML sin el modelo multimodal "
+                        f"({local_tables / tables:.0%})")
+        return new_nodes, single_nodes, self._make_batches(batched_nodes), next_texts
+
+    @staticmethod
+    def _block_key(node: BaseNode) -> Tuple[str, str]:
+        # Por archivo de origen, no por título: archivos homónimos en carpetas distintas comparten título
+        return node.metadata.get('source_id'), node.metadata.get('block_hash')
+
+    def _load_cached_results(self, nodes: Sequence[BaseNode]) -> Dict[Tuple[str, str], dict]:
+        """
+        Compares the block hashes of each document with the ones of the previous run and returns
+        the stored results of the unchanged blocks. Results of blocks that no longer exist are pruned.
+        """
+        if self.block_cache is None:
+            return {}
+        hashes_by_source = defaultdict(set)
+        for node in nodes:
+            source, block_hash = self._block_key(node)
+            if source and block_hash:
+                hashes_by_source[source].add(block_hash)
+
+        cached_results = {}
+        for source, hashes in hashes_by_source.items():
+            previous_hashes = self.block_cache.hashes(source)
+            cached = self.block_cache.get_many(source, hashes)
+            removed = self.block_cache.prune(source, hashes)
+            logger.info(
+                f"'{source}': {len(cached)} bloques sin cambios, {len(hashes) - len(cached)} nuevos o modificados, "
+                f"{removed} eliminados (ejecución anterior: {len(previous_hashes)} bloques)"
+            )
+            cached_results.update({(source, block_hash): result for block_hash, result in cached.items()})
+        return cached_results
+
+    @staticmethod
+    def _apply_cached_result(node: BaseNode, result: dict) -> BaseNode:
+        node.text = result['text']
+        node.metadata.update(result['metadata'])
+        return node
+
+    def _save_result(self, node: BaseNode, metadata_before: dict):
+        """Stores the text and the metadata changes produced for a block."""
+        source, block_hash = self._block_key(node)
+        if self.block_cache is None or not source or not block_hash:
+            return
+        metadata_changes = {
+            key: value for key, value in node.metadata.items()
+            if key not in metadata_before or metadata_before[key] != value
+        }
+        self.block_cache.put(source, block_hash, {'text': node.text, 'metadata': metadata_changes})
+
+    def _reclasificar_bloque(self, node: BaseNode, node_next_text: Optional[str]) -> BaseNode:
+        if not node.metadata.get('block_type'):
+            logger.error(f"Node '{node.node_id}' does not have 'block_type' metadata key.")
+            return node
+
+        node_block_type = node.metadata['block_type']
+        metadata_before = dict(node.metadata)
+
         try:
-            return self._reclasificar_bloque(node, nodes)
-        except Exception as e:
-            intentos += 1
-            if intentos < 20:
-                logger.error(f"Error al reclasificar el nodo {node.node_id}: {e}. Reintentando en 10 segundos (Intento {intentos}/20)...")
-                time.sleep(10)
-                return self._reclasificar_bloque_con_reintentos(node, nodes, intentos)
+            if node_block_type == 'Table':
+                node = self._process_table_node(node)
+            elif node_block_type == 'Image':
+                node = self._process_image_node(node)
             else:
-                logger.error(f"Intento final fallido para el nodo {node.node_id} después de 20 reintentos: {e}. No se procesará más este nodo.")
-                return node  # Devuelve el nodo sin modificar después de los 20 intentos fallidos.
+                node = self._evaluate_block_type(node, node_next_text)
+            self._save_result(node, metadata_before)
+            return node
+        except Exception as e:
+            error_message = ''.join(traceback.format_exception(None, e, e.__traceback__))
+            logger.error(f"An error occurred during classification: {e}\n{error_message}")
+
+        return node
 
-    def _reclasificar_bloque(self, node: BaseNode, nodes: Sequence[BaseNode]) -> BaseNode:
+    async def _areclasificar_bloque(self, node: BaseNode, node_next_text: Optional[str]) -> BaseNode:
+        """Async counterpart of ``_reclasificar_bloque``."""
         if not node.metadata.get('block_type'):
             logger.error(f"Node '{node.node_id}' does not have 'block_type' metadata key.")
             return node
 
         node_block_type = node.metadata['block_type']
-        node_next_text = self._get_next_node_text(node, nodes)
+        metadata_before = dict(node.metadata)
 
         try:
             if node_block_type == 'Table':
-                return self._process_table_node(node)
+                node = await self._aprocess_crop_node(node, transcriber_job_description_prompt)
             elif node_block_type == 'Image':
-                return self._process_image_node(node)
+                node = await self._aprocess_crop_node(node, image_summary_transcriber_prompt)
             else:
-                return self._evaluate_block_type(node, node_next_text)
+                node = await self._aevaluate_block_type(node, node_next_text)
+            await asyncio.to_thread(self._save_result, node, metadata_before)
+            return node
         except Exception as e:
             error_message = ''.join(traceback.format_exception(None, e, e.__traceback__))
             logger.error(f"An error occurred during classification: {e}\n{error_message}")
 
         return node
 
-    def _get_next_node_text(self, node, nodes):
-        """Get the text of the next node based on relationships."""
-        next_node_relation = node.relationships.get(NodeRelationship.NEXT)
-        if not next_node_relation:
+    def _classify_by_rules(self, node: BaseNode) -> bool:
+        """
+        Applies the rule-based classifier to a text block. If a rule matches with at least
+        ``rule_confidence`` its result is applied and stored like an LLM evaluation.
+
+        :return: Whether the block no longer needs the LLM.
+        """
+        if self.rule_confidence is None:
+            return False
+        result = self._rule_classifier.classify(node.text)
+        if result is None or result.confidence < self.rule_confidence:
+            return False
+        metadata_before = dict(node.metadata)
+        node.metadata.update(result.as_metadata())
+        self._save_result(node, metadata_before)
+        logger.debug(f"Node '{node.node_id}' classified as {result.block_type} by rule '{result.rule}' ({result.confidence:.2f})")
+        return True
+
+    def _extract_table(self, node: BaseNode) -> bool:
+        """
+        Converts a Table block to Markdown from the ``text_as_html`` inferred by the partitioner.
+        If the conversion scores at least ``table_quality_threshold`` it replaces the text of the
+        block and is stored like a transcription; otherwise the crop goes to the multimodal model.
+
+        :return: Whether the block no longer needs the multimodal model.
+        """
+        if self.table_quality_threshold is None or not node.metadata.get('text_as_html'):
+            return False
+        extraction = self._table_extractor.extract(node.metadata['text_as_html'], node.text)
+        if extraction is None:
+            logger.debug(f"Node '{node.node_id}': the inferred HTML has no usable table, it is transcribed from its crop")
+            return False
+        if extraction.score < self.table_quality_threshold:
+            logger.debug(f"Node '{node.node_id}': table converted from HTML below the quality threshold "
+                         f"({extraction.score:.2f}, {extraction.failed_checks(self.table_quality_threshold)}), "
+                         f"it is transcribed from its crop")
+            return False
+        metadata_before = dict(node.metadata)
+        node.text = extraction.markdown
+        node.metadata.update({'makes_sense': True, 'description': None})
+        self._save_result(node, metadata_before)
+        logger.debug(f"Node '{node.node_id}': {extraction.rows}x{extraction.columns} table converted from HTML ({extraction.score:.2f})")
+        return True
+
+    ########################################################
+    # Batch classification
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """Rough token count (about four characters per token), enough to size the batches."""
+        return len(text or '') // 4 + 1
+
+    def _make_batches(self, nodes: Sequence[BaseNode]) -> List[List[BaseNode]]:
+        """
+        Packs consecutive text blocks of the same document into batches of at most the current batch
+        size whose blocks and expected answers fit in ``max_batch_tokens``. A block larger than the
+        budget goes alone.
+        """
+        limit = max(1, min(self._batch_limit, self.batch_size))
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for node in nodes:
+            node_tokens = self._estimate_tokens(node.text) + _OUTPUT_TOKENS_PER_BLOCK
+            if batch and (
+                    len(batch) >= limit
+                    or batch_tokens + node_tokens > self.max_batch_tokens
+                    or node.metadata.get('source_id') != batch[0].metadata.get('source_id')
+            ):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(node)
+            batch_tokens += node_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _reclasificar_lote(self, batch: List[BaseNode], next_texts: Dict[str, Optional[str]]) -> List[BaseNode]:
+        """
+        Classifies a batch of text blocks in one request. The evaluations are matched back to the
+        blocks by id; if the answer cannot be parsed, or some blocks are missing from it, those
+        blocks are split in two halves and classified again (a single block goes through the
+        per-block path). Transient service errors are retried by the shared LLM guard; if the guard
+        gives up, or the request fails for any other reason, splitting would only multiply the
+        failing requests, so the blocks are left unclassified (and uncached) for the next run.
+        Splits lower the batch size of the next batches, which grows back one block at a time with
+        every complete answer.
+        """
+        try:
+            results = self._evaluate_block_types(batch, next_texts[batch[-1].node_id])
+        except Exception as e:
+            results = self._batch_error(batch, e)
+            if results is None:
+                return batch
+
+        done, missing = self._apply_batch_results(batch, results)
+        if not missing:
+            return batch
+        if len(missing) == 1:
+            node = missing[0]
+            return done + [self._reclasificar_bloque(node, next_texts[node.node_id])]
+        first, second = self._split_batch(batch, missing)
+        return done + self._reclasificar_lote(first, next_texts) + self._reclasificar_lote(second, next_texts)
+
+    async def _areclasificar_lote(self, batch: List[BaseNode], next_texts: Dict[str, Optional[str]]) -> List[BaseNode]:
+        """Async counterpart of ``_reclasificar_lote``; the two halves of a split run concurrently."""
+        try:
+            results = await self._aevaluate_block_types(batch, next_texts[batch[-1].node_id])
+        except Exception as e:
+            results = self._batch_error(batch, e)
+            if results is None:
+                return batch
+
+        done, missing = await asyncio.to_thread(self._apply_batch_results, batch, results)
+        if not missing:
+            return batch
+        if len(missing) == 1:
+            node = missing[0]
+            return done + [await self._areclasificar_bloque(node, next_texts[node.node_id])]
+        first, second = self._split_batch(batch, missing)
+        first, second = await asyncio.gather(
+            self._areclasificar_lote(first, next_texts), self._areclasificar_lote(second, next_texts)
+        )
+        return done + first + second
+
+    @staticmethod
+    def _batch_error(batch: List[BaseNode], error: Exception) -> Optional[Dict[int, dict]]:
+        """
+        Logs a failed batch request; returns no evaluations (the batch is split) for an answer that
+        cannot be parsed, or ``None`` to leave the batch unclassified.
+        """
+        if isinstance(error, OutputParserException):
+            logger.warning(f"Respuesta no válida para un lote de {len(batch)} bloques, se divide: {error}")
+            return {}
+        if isinstance(error, CircuitOpenError) or classify_error(error)[0]:
+            logger.error(f"Lote de {len(batch)} bloques sin clasificar, el LLM no responde: {error}")
             return None
-        next_node_id = next_node_relation.node_id
-        next_node = next(filter(lambda x: x.node_id == next_node_id, nodes), None)
-        return next_node.text if next_node else None
+        logger.error(f"Error al reclasificar un lote de {len(batch)} bloques, se deja sin clasificar: {error}")
+        return None
+
+    def _apply_batch_results(self, batch: List[BaseNode], results: Dict[int, dict]) -> Tuple[List[BaseNode], List[BaseNode]]:
+        """Applies and stores the evaluations of a batch; returns the evaluated and the missing blocks."""
+        done = []
+        missing = []
+        for position, node in enumerate(batch):
+            result = results.get(position)
+            if result is None:
+                missing.append(node)
+                continue
+            metadata_before = dict(node.metadata)
+            node.metadata.update(result)
+            self._save_result(node, metadata_before)
+            done.append(node)
+
+        if not missing and len(batch) >= self._batch_limit:
+            self._batch_limit = min(self.batch_size, self._batch_limit + 1)
+        return done, missing
+
+    def _split_batch(self, batch: List[BaseNode], missing: List[BaseNode]) -> Tuple[List[BaseNode], List[BaseNode]]:
+        get_metrics().increment('batch_splits')
+        self._batch_limit = max(1, min(self._batch_limit, len(batch) // 2))
+        middle = len(missing) // 2
+        return missing[:middle], missing[middle:]
+
+    def _evaluate_block_types(self, batch: Sequence[BaseNode], node_next_text: Optional[str]) -> Dict[int, dict]:
+        """
+        Sends the blocks of a batch in one prompt, with the instructions and the document metadata
+        only once, and returns the evaluation of every block found in the answer by its position.
+        """
+        get_metrics().increment('llm_batches')
+        answer = self.batch_evaluator.invoke(self._batch_input(batch, node_next_text))
+        return self._parse_batch_answer(batch, answer)
+
+    async def _aevaluate_block_types(self, batch: Sequence[BaseNode], node_next_text: Optional[str]) -> Dict[int, dict]:
+        get_metrics().increment('llm_batches')
+        batch_input = await asyncio.to_thread(self._batch_input, batch, node_next_text)
+        async with self._async_semaphore():
+            answer = await self.batch_evaluator.ainvoke(batch_input)
+        return self._parse_batch_answer(batch, answer)
+
+    def _batch_input(self, batch: Sequence[BaseNode], node_next_text: Optional[str]) -> Dict[str, Any]:
+        blocks = [
+            {'id': position, 'old_type': node.metadata['block_type'], 'text': node.text}
+            for position, node in enumerate(batch)
+        ]
+        return {
+            'blocks': format_blocks(blocks),
+            'next_block': node_next_text,
+            'meta': self._load_metadata(batch[0].metadata['title_of_the_document'])
+        }
+
+    @staticmethod
+    def _parse_batch_answer(batch: Sequence[BaseNode], answer: Any) -> Dict[int, dict]:
+        evaluations = answer.get('blocks') if isinstance(answer, dict) else answer
+        if not isinstance(evaluations, list):
+            raise OutputParserException(f"Se esperaba una lista de evaluaciones: {str(answer)[:200]}")
+        results = {}
+        for evaluation in evaluations:
+            if not isinstance(evaluation, dict) or not isinstance(evaluation.get('block_type'), str):
+                continue
+            try:
+                position = int(evaluation.get('id'))
+            except (TypeError, ValueError):
+                continue
+            if 0 <= position < len(batch) and position not in results:
+                results[position] = {key: value for key, value in evaluation.items() if key != 'id'}
+        return results
+
+    ########################################################
+
+    def _get_next_node_text(self, node: BaseNode, nodes_by_id: Dict[str, BaseNode]) -> Optional[str]:
+        """
+        Get the text of the next ``context_window`` nodes based on relationships, separated by blank
+        lines, or ``None`` if the node has no next node in the batch.
+        """
+        texts = []
+        current_node = node
+        for _ in range(self.context_window):
+            next_node_relation = current_node.relationships.get(NodeRelationship.NEXT)
+            current_node = nodes_by_id.get(next_node_relation.node_id) if next_node_relation else None
+            if current_node is None:
+                break
+            texts.append(current_node.text)
+        return '\n\n'.join(texts) if texts else None
 
     def _process_table_node(self, node):
         """Process a node identified as a 'Table'."""
@@ -88,7 +499,7 @@ class Unstructured_Medatata_PostProcessor(TransformComponent):
             logger.error(f"Node '{node.node_id}' does not have 'image_path' metadata key.")
             return node
 
-        node.text = self.gcp_model.invoke(transcriber_job_description_prompt, image_path=node.metadata['image_path'])
+        node.text = self._transcribe_image(transcriber_job_description_prompt, node.metadata['image_path'], approximate=False)
         node.metadata.update({'makes_sense': True, 'description': None})
         return node
 
@@ -98,31 +509,116 @@ class Unstructured_Medatata_PostProcessor(TransformComponent):
             logger.error(f"Node '{node.node_id}' does not have 'image_path' metadata key.")
             return node
 
-        node.text = self.gcp_model.invoke(image_summary_transcriber_prompt, image_path=node.metadata['image_path'])
+        node.text = self._transcribe_image(image_summary_transcriber_prompt, node.metadata['image_path'])
+        node.metadata.update({'makes_sense': True, 'description': None})
+        return node
+
+    def _transcribe_image(self, prompt: str, image_path: str, approximate: bool = True) -> str:
+        """
+        Sends an Image/Table crop to the model, unless the image cache already has the transcription
+        of the same (or, if ``approximate``, a near-identical) crop for this model and prompt. Table
+        crops are only reused when identical: tables sharing a grid look alike with different values.
+        """
+        if self.image_cache is None:
+            return self.gcp_model.invoke(prompt, image_path=image_path)
+
+        model_name = getattr(self.gcp_model, 'model_name', type(self.gcp_model).__name__)
+        key = self.image_cache.key(image_path, namespace=f"{model_name}\x1f{prompt}", approximate=approximate)
+        result, cached = self.image_cache.get_or_compute(
+            key, lambda: {'text': self.gcp_model.invoke(prompt, image_path=image_path)}
+        )
+        if cached:
+            get_metrics().increment('image_cache_hits')
+            logger.debug(f"Transcription of '{image_path}' reused from the image cache")
+        return result['text']
+
+    async def _aprocess_crop_node(self, node, prompt: str):
+        """Async counterpart of ``_process_table_node`` / ``_process_image_node``."""
+        if not node.metadata.get('image_path'):
+            logger.error(f"Node '{node.node_id}' does not have 'image_path' metadata key.")
+            return node
+
+        approximate = node.metadata.get('block_type') != 'Table'
+        node.text = await self._atranscribe_image(prompt, node.metadata['image_path'], approximate)
         node.metadata.update({'makes_sense': True, 'description': None})
         return node
 
+    async def _atranscribe_image(self, prompt: str, image_path: str, approximate: bool = True) -> str:
+        """
+        Async counterpart of ``_transcribe_image``. Concurrent requests for the same (or a
+        near-identical) crop in the event loop wait for a single transcription. The crop hashes
+        and the cache lookups run in worker threads.
+        """
+        if self.image_cache is None:
+            async with self._async_semaphore():
+                return await self.gcp_model.ainvoke(prompt, image_path=image_path)
+
+        model_name = getattr(self.gcp_model, 'model_name', type(self.gcp_model).__name__)
+        key = await asyncio.to_thread(
+            self.image_cache.key, image_path, namespace=f"{model_name}\x1f{prompt}", approximate=approximate
+        )
+        result = await asyncio.to_thread(self.image_cache.get, key)
+        if result is not None:
+            get_metrics().increment('image_cache_hits')
+            logger.debug(f"Transcription of '{image_path}' reused from the image cache")
+            return result['text']
+
+        flight_key = (id(asyncio.get_running_loop()), key.namespace,
+                      key.phash if key.phash is not None else key.content_hash)
+        flight = self._async_flights.get(flight_key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._atranscribe_and_store(prompt, image_path, key))
+            self._async_flights[flight_key] = flight
+            flight.add_done_callback(lambda _: self._async_flights.pop(flight_key, None))
+            return (await flight)['text']
+        try:
+            await asyncio.shield(flight)
+        except Exception:
+            pass
+        # El recorte en vuelo comparte el hash de 64 bits; la caché confirma que es el mismo
+        result = await asyncio.to_thread(self.image_cache.get, key)
+        if result is None:
+            # La transcripción del otro bloque falló o su recorte no es el mismo: se transcribe este
+            return (await self._atranscribe_and_store(prompt, image_path, key))['text']
+        get_metrics().increment('image_cache_hits')
+        return result['text']
+
+    async def _atranscribe_and_store(self, prompt: str, image_path: str, key: Any) -> dict:
+        async with self._async_semaphore():
+            result = {'text': await self.gcp_model.ainvoke(prompt, image_path=image_path)}
+        await asyncio.to_thread(self.image_cache.put, key, result)
+        return result
+
     def _evaluate_block_type(self, node, node_next_text):
         """Evaluate the block type for nodes that are neither 'Table' nor 'Image'."""
-        meta_path = os.path.join(self.meta_folder_path, f"{node.metadata['title_of_the_document']}.json")
-        input_row = {
+        block_type_model = self.chain_evaluator.invoke(self._evaluation_input(node, node_next_text))
+        node.metadata.update(block_type_model)
+        return node
+
+    async def _aevaluate_block_type(self, node, node_next_text):
+        evaluation_input = await asyncio.to_thread(self._evaluation_input, node, node_next_text)
+        async with self._async_semaphore():
+            block_type_model = await self.chain_evaluator.ainvoke(evaluation_input)
+        node.metadata.update(block_type_model)
+        return node
+
+    def _evaluation_input(self, node, node_next_text) -> Dict[str, Any]:
+        return {
             "text_to_evaluate": node.text,
             "old_type": node.metadata['block_type'],
             'next_block': node_next_text,
-            'meta': self._load_metadata(meta_path)
+            'meta': self._load_metadata(node.metadata['title_of_the_document'])
         }
-        block_type_model = self.chain_evaluator.invoke(input_row)
-        node.metadata.update(block_type_model)
-        return node
 
-    def _load_metadata(self, json_path: str) -> str:
-        """Load metadata from a folder."""
-        try:
-            with open(json_path, 'r') as archivo:
-                metadata = archivo.read()
-                logger.debug("JSON metadata loaded successfully")
-        except Exception as e:
-            logger.error("Failed to load JSON metadata from %s: %s", json_path, e)
-            metadata = ""
-        return metadata
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        """Semaphore of the running event loop that bounds the requests in flight of the async path."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._async_concurrency)
+        return semaphore
 
+    def _load_metadata(self, title: str) -> str:
+        """Raw JSON metadata of a document, read once and shared through the metadata cache."""
+        metadata_cache = get_metadata_cache()
+        return metadata_cache.get_text(metadata_cache.path(self.meta_folder_path, title))
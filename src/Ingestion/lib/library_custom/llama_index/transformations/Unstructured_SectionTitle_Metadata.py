@@ -12,4 +12,4 @@ class Unstructured_SectionTitle_Metadata(TransformComponent):
         logger.info("Processing nodes... (Unstructured_SectionTitle_Metadata)")
         list_manager = LinkedListManager(nodes)
         list_manager.assign_section_titles()
-        return list(list_manager.nodes.values())
\ No newline at end of file
+        return list_manager.ordered_nodes()
\ No newline at end of file
@@ -1,5 +1,4 @@
-from itertools import count
-from typing import Sequence
+from typing import Dict, List, Optional, Sequence
 
 from llama_index.core.schema import NodeRelationship, BaseNode
 
@@ -7,10 +6,35 @@ from llama_index.core.schema import NodeRelationship, BaseNode
 class LinkedListManager:
     def __init__(self, nodes: Sequence[BaseNode]):
         self.nodes = {node.node_id: node for node in nodes}  # Crear un diccionario de nodos por ID
+        # Vista ordenada de las listas (una por documento), construida al primer uso
+        self._heads: Optional[List[str]] = None
+        self._order: Optional[List[str]] = None
+        self._index: Optional[Dict[str, int]] = None
+        self._unreachable = 0
 
     def get_node_by_id(self, node_id: str) -> BaseNode:
         return self.nodes.get(node_id)
 
+    # ---- Ordered view ----
+    @property
+    def heads(self) -> List[str]:
+        """Ids de los primeros nodos de cada lista (sin PREVIOUS o con un PREVIOUS fuera del lote)."""
+        self._ensure_order()
+        return self._heads
+
+    def ordered_ids(self) -> List[str]:
+        """Ids de los nodos recorriendo cada lista desde su cabeza, en el orden de las cabezas."""
+        self._ensure_order()
+        return self._order
+
+    def ordered_nodes(self) -> List[BaseNode]:
+        return [self.nodes[node_id] for node_id in self.ordered_ids()]
+
+    def position(self, node_id: str) -> Optional[int]:
+        """Posición de un nodo en ``ordered_ids`` o ``None`` si no está."""
+        self._ensure_order()
+        return self._index.get(node_id)
+
     def find_nearest_title_parent(self, node: BaseNode) -> BaseNode:
         current_node = node.relationships.get(NodeRelationship.PREVIOUS)
         if current_node is None:
@@ -31,14 +55,34 @@ class LinkedListManager:
         return None
 
     def assign_section_titles(self):
-        for node_id, node in self.nodes.items():
-            nearest_title_node = self.find_nearest_title_parent(node)
-            if nearest_title_node:
-                node.metadata['section_title'] = nearest_title_node.text
+        """
+        Asigna a cada nodo el texto del Title más cercano que lo precede en su lista, con un único
+        recorrido hacia delante que arrastra el título de la sección actual.
+        """
+        self._ensure_order()
+        heads = set(self._heads)
+        reachable = len(self._order) - self._unreachable
+        section_title = None
+        for position, node_id in enumerate(self._order):
+            node = self.nodes[node_id]
+            if position >= reachable:
+                # Nodos fuera de las listas bien formadas (ciclos o ramas): se busca hacia atrás
+                nearest_title_node = self.find_nearest_title_parent(node)
+                if nearest_title_node:
+                    node.metadata['section_title'] = nearest_title_node.text
+                continue
+            if node_id in heads:
+                section_title = None
+            if section_title is not None:
+                node.metadata['section_title'] = section_title
+            if node.metadata['block_type'] == 'Title':
+                section_title = node.text
 
     def remove_nodes_by_block_type(self, block_types):
-        nodes_to_remove = {node_id: node for node_id, node in self.nodes.items() if node.metadata['block_type'] in block_types}
-        for node_id, node in nodes_to_remove.items():
+        order = self.ordered_ids()
+        nodes_to_remove = [node_id for node_id in order if self.nodes[node_id].metadata['block_type'] in block_types]
+        for node_id in nodes_to_remove:
+            node = self.nodes[node_id]
             prev_relation = node.relationships.get(NodeRelationship.PREVIOUS)
             next_relation = node.relationships.get(NodeRelationship.NEXT)
 
@@ -49,4 +93,46 @@ class LinkedListManager:
                 self.nodes[next_relation.node_id].relationships[NodeRelationship.PREVIOUS] = prev_relation
 
             # Eliminar el nodo actual del diccionario
-            del self.nodes[node_id]
\ No newline at end of file
+            del self.nodes[node_id]
+
+        if nodes_to_remove:
+            # La vista se actualiza en lugar de reconstruirse: el orden relativo no cambia
+            removed = set(nodes_to_remove)
+            self._unreachable = sum(1 for node_id in order[len(order) - self._unreachable:] if node_id not in removed)
+            self._order = [node_id for node_id in order if node_id not in removed]
+            self._index = {node_id: position for position, node_id in enumerate(self._order)}
+            self._heads = [node_id for node_id in self._order if self._is_head(self.nodes[node_id])]
+
+    ########################################################
+
+    def _is_head(self, node: BaseNode) -> bool:
+        prev_relation = node.relationships.get(NodeRelationship.PREVIOUS)
+        return prev_relation is None or prev_relation.node_id not in self.nodes
+
+    def _ensure_order(self):
+        if self._order is not None:
+            return
+        heads = []
+        successors = {}
+        for node_id, node in self.nodes.items():
+            if self._is_head(node):
+                heads.append(node_id)
+            else:
+                successors.setdefault(node.relationships[NodeRelationship.PREVIOUS].node_id, node_id)
+
+        order = []
+        visited = set()
+        for head in heads:
+            node_id = head
+            while node_id is not None and node_id not in visited:
+                visited.add(node_id)
+                order.append(node_id)
+                node_id = successors.get(node_id)
+
+        # Los nodos no alcanzables desde ninguna cabeza (ciclos o dos nodos con el mismo PREVIOUS)
+        # se añaden al final en el orden de entrada
+        unreachable = [node_id for node_id in self.nodes if node_id not in visited]
+        self._heads = heads
+        self._order = order + unreachable
+        self._unreachable = len(unreachable)
+        self._index = {node_id: position for position, node_id in enumerate(self._order)}
@@ -0,0 +1,136 @@
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class RuleResult:
+    """
+    Classification of a block made by a rule.
+
+    Attributes:
+        block_type (str): Category of the block, the same ones the LLM uses.
+        makes_sense (bool): Whether the text is understandable by itself.
+        confidence (float): Between 0 and 1; blocks below the threshold go to the LLM.
+        rule (str): Name of the rule that matched.
+    """
+    block_type: str
+    makes_sense: bool
+    confidence: float
+    rule: str
+
+    def as_metadata(self) -> dict:
+        """Metadata with the same keys as the LLM evaluation."""
+        return {'makes_sense': self.makes_sense, 'block_type': self.block_type, 'description': None}
+
+
+# Número de página suelto: "12", "- 12 -", "Page 3", "3 of 10", "iv"
+# Los romanos solo hasta 39 y en un único caso, para no confundir palabras como "mix", "DC" o "Civil"
+_PAGE_NUMBER_PATTERN = re.compile(
+    r'^[\s\-–—]*(?:(?i:page|p[aá]gina|p\.)\s*)?'
+    r'(?:\d{1,4}|(?=[ivx])x{0,3}(?:ix|iv|v?i{0,3})|(?=[IVX])X{0,3}(?:IX|IV|V?I{0,3}))'
+    r'(?:\s*(?i:of|de|/)\s*\d{1,4})?[\s\-–—]*$'
+)
+_CAPTION_PATTERN = re.compile(r'^\s*(?:Figure|Fig\.|Figura|Table|Tabla)\s*\d+[a-z]?\s*[:.]\s*\S', re.IGNORECASE)
+# Encabezado numerado: "3 Results", "2.1. Datasets", "IV. CONCLUSIONS", "A.2 Proofs"
+_NUMBERED_HEADING_PATTERN = re.compile(r'^\s*(?:\d{1,2}(?:\.\d{1,2}){0,3}\.?|[IVX]{1,5}\.|[A-H]\.\d{1,2})\s+[A-ZÁÉÍÓÚÑ][^\n]*$')
+# Numeración que solo usan los encabezados: varios niveles ("2.1"), romanos ("IV.") o apéndices ("A.2").
+# Un número simple ("1.", "3") también numera elementos de lista
+_SECTION_NUMBER_PATTERN = re.compile(r'^\s*(?:\d{1,2}(?:\.\d{1,2}){1,3}\.?|[IVX]{1,5}\.|[A-H]\.\d{1,2})\s')
+_HEADING_MINOR_WORDS = {
+    'a', 'an', 'and', 'as', 'at', 'by', 'for', 'from', 'in', 'of', 'on', 'or', 'the', 'to', 'via', 'vs', 'with',
+    'de', 'del', 'el', 'en', 'la', 'las', 'los', 'para', 'por', 'un', 'una', 'y',
+}
+_SECTION_NAMES = {
+    'abstract', 'introduction', 'introducción', 'resumen', 'background', 'related work', 'method', 'methods',
+    'methodology', 'metodología', 'experiments', 'results', 'resultados', 'discussion', 'discusión',
+    'conclusion', 'conclusions', 'conclusiones', 'references', 'referencias', 'bibliography', 'bibliografía',
+    'acknowledgments', 'acknowledgements', 'agradecimientos', 'appendix', 'apéndice', 'limitations',
+}
+# Entrada de bibliografía numerada: "[12] A. Author, ...", "12. Author, A. (2020) ..."
+_NUMBERED_REFERENCE_PATTERN = re.compile(r'^\s*\[\d{1,3}\]\s+\S')
+_AUTHOR_YEAR_REFERENCE_PATTERN = re.compile(
+    r'^\s*(?:\d{1,3}\.\s+)?[A-ZÁÉÍÓÚÑ][\w\'\-]+,\s+(?:[A-Z]\.\s*)+.*\(?(?:19|20)\d{2}[a-z]?\)?'
+)
+_YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}[a-z]?\b')
+_REFERENCE_MARKERS = ('et al.', 'In Proceedings', 'arXiv', 'doi:', 'https://doi.org', 'pp.', 'Vol.', 'Journal')
+
+
+def _fragment(text: str) -> Optional[RuleResult]:
+    if len(text.replace(' ', '')) <= 1:
+        return RuleResult('UncategorizedText', False, 0.99, 'fragment')
+    return None
+
+
+def _page_number(text: str) -> Optional[RuleResult]:
+    if '\n' not in text and _PAGE_NUMBER_PATTERN.match(text):
+        return RuleResult('UncategorizedText', False, 0.95, 'page_number')
+    return None
+
+
+def _caption(text: str) -> Optional[RuleResult]:
+    if _CAPTION_PATTERN.match(text):
+        return RuleResult('FigureCaption', True, 0.95, 'caption')
+    return None
+
+
+def _heading(text: str) -> Optional[RuleResult]:
+    # Los encabezados son de una línea y no terminan en puntuación (salvo los escritos en mayúsculas)
+    if '\n' in text or len(text) > 100 or (text.endswith(('.', ',', ';')) and not text.rstrip('.').isupper()):
+        return None
+    if text.strip().rstrip(':').lower() in _SECTION_NAMES:
+        return RuleResult('Title', True, 0.95, 'section_name')
+    if not _NUMBERED_HEADING_PATTERN.match(text) or len(text.split()) > 8:
+        return None
+    # Sin más evidencia la regla queda por debajo del umbral: "1. Install the package with pip"
+    # es un elemento de lista con la misma forma que "1. Introduction"
+    title = text.split(None, 1)[1].strip().rstrip(':')
+    if _SECTION_NUMBER_PATTERN.match(text) or title.lower() in _SECTION_NAMES or _is_title_case(title):
+        return RuleResult('Title', True, 0.92, 'numbered_heading')
+    return RuleResult('Title', True, 0.7, 'numbered_heading')
+
+
+def _is_title_case(text: str) -> bool:
+    """Todas las palabras empiezan en mayúscula, salvo artículos, preposiciones y conjunciones."""
+    words = re.findall(r'[^\W\d_][\w\'\-]*', text)
+    return bool(words) and all(word[0].isupper() or word.lower() in _HEADING_MINOR_WORDS for word in words)
+
+
+def _reference(text: str) -> Optional[RuleResult]:
+    if _NUMBERED_REFERENCE_PATTERN.match(text) and _YEAR_PATTERN.search(text):
+        return RuleResult('Bibliography', True, 0.93, 'numbered_reference')
+    if _AUTHOR_YEAR_REFERENCE_PATTERN.match(text):
+        markers = sum(marker in text for marker in _REFERENCE_MARKERS)
+        return RuleResult('Bibliography', True, 0.9 if markers else 0.75, 'author_year_reference')
+    return None
+
+
+class RuleBasedClassifier:
+    """
+    Deterministic classifier for blocks whose category is obvious from their text: one-character
+    fragments, page numbers, figure and table captions, section headings and reference-list
+    entries. Every rule returns a confidence; the first rule that matches wins, and the caller
+    sends to the LLM the blocks without a match or with a confidence below its threshold.
+    """
+
+    RULES: List[Tuple[str, Callable[[str], Optional[RuleResult]]]] = [
+        ('fragment', _fragment),
+        ('page_number', _page_number),
+        ('caption', _caption),
+        ('heading', _heading),
+        ('reference', _reference),
+    ]
+
+    def classify(self, text: Optional[str]) -> Optional[RuleResult]:
+        """
+        Classifies a text block.
+
+        :param text:
+        :return: The result of the first matching rule, or ``None``.
+        """
+        text = (text or '').strip()
+        for _, rule in self.RULES:
+            result = rule(text)
+            if result is not None:
+                return result
+        return None
@@ -0,0 +1,190 @@
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+# Límite de filas y columnas expandidas por rowspan/colspan, para que un HTML mal formado no explote
+_MAX_SPAN = 100
+_WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+@dataclass(frozen=True)
+class TableExtraction:
+    """
+    Table converted from the structure inferred by the partitioner.
+
+    Attributes:
+        markdown (str): The table as Markdown, with the first row as header.
+        score (float): Between 0 and 1, the lowest of the quality checks.
+        checks (dict): Value of every quality check (``fill``, ``consistency``, ``coverage``).
+        rows (int): Number of rows, header included.
+        columns (int): Number of columns after expanding the spans.
+    """
+    markdown: str
+    score: float
+    checks: dict = field(default_factory=dict)
+    rows: int = 0
+    columns: int = 0
+
+    def failed_checks(self, threshold: float) -> List[str]:
+        """Names of the checks below the threshold."""
+        return [name for name, value in self.checks.items() if value < threshold]
+
+
+class _TableParser(HTMLParser):
+    """Collects the cells of the outermost ``<table>``, with their rowspan and colspan."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows: List[List[Tuple[str, int, int]]] = []
+        self._depth = 0
+        self._row: Optional[List[Tuple[str, int, int]]] = None
+        self._cell: Optional[List[str]] = None
+        self._spans = (1, 1)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self._depth += 1
+            return
+        if self._depth != 1:
+            # Las tablas anidadas se leen como texto de la celda que las contiene
+            return
+        if tag == 'tr':
+            self._close_row()
+            self._row = []
+        elif tag in ('td', 'th'):
+            self._close_cell()
+            if self._row is None:
+                self._row = []
+            attributes = dict(attrs)
+            self._cell = []
+            self._spans = (self._span(attributes.get('rowspan')), self._span(attributes.get('colspan')))
+        elif tag == 'br' and self._cell is not None:
+            self._cell.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag == 'table':
+            if self._depth == 1:
+                self._close_row()
+            self._depth = max(self._depth - 1, 0)
+        elif self._depth == 1 and tag in ('td', 'th'):
+            self._close_cell()
+        elif self._depth == 1 and tag == 'tr':
+            self._close_row()
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _close_cell(self):
+        if self._cell is None:
+            return
+        text = ' '.join(''.join(self._cell).split())
+        self._row.append((text, *self._spans))
+        self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row:
+            self.rows.append(self._row)
+        self._row = None
+
+    @staticmethod
+    def _span(value: Optional[str]) -> int:
+        try:
+            return min(max(int(value), 1), _MAX_SPAN)
+        except (TypeError, ValueError):
+            return 1
+
+
+class HTMLTableExtractor:
+    """
+    Converts the ``text_as_html`` that unstructured infers for a Table block into Markdown and
+    scores how much it can be trusted, so that only the tables whose structure looks broken are
+    transcribed from their crop by the multimodal model.
+
+    The quality checks are:
+        - ``fill``: share of non-empty cells.
+        - ``consistency``: share of rows that span every column before padding.
+        - ``coverage``: share of the words of the OCR text of the block found in the cells.
+    """
+
+    def extract(self, html: Optional[str], text: Optional[str] = None) -> Optional[TableExtraction]:
+        """
+        Converts a table.
+
+        :param html: ``text_as_html`` of the block.
+        :param text: OCR text of the block, compared with the cells.
+        :return: The extraction, or ``None`` if the HTML has no table with at least two rows and two columns.
+        """
+        if not html:
+            return None
+        parser = _TableParser()
+        parser.feed(html)
+        parser.close()
+        grid, widths = self._expand(parser.rows)
+        columns = max(widths, default=0)
+        if len(grid) < 2 or columns < 2:
+            return None
+        for row in grid:
+            row.extend([''] * (columns - len(row)))
+
+        cells = [cell for row in grid for cell in row]
+        checks = {
+            'fill': sum(bool(cell) for cell in cells) / len(cells),
+            'consistency': sum(width == columns for width in widths) / len(widths),
+            'coverage': self._coverage(text, cells),
+        }
+        return TableExtraction(
+            markdown=self._to_markdown(grid),
+            score=min(checks.values()),
+            checks=checks,
+            rows=len(grid),
+            columns=columns
+        )
+
+    ########################################################
+
+    @staticmethod
+    def _expand(rows: List[List[Tuple[str, int, int]]]) -> Tuple[List[List[str]], List[int]]:
+        """
+        Places the cells on a grid, repeating the text of the spanned cells so that every row of
+        the Markdown keeps its meaning. Also returns the width each row reaches without padding.
+        """
+        grid: List[List[str]] = []
+        # Celdas que ocupan filas siguientes: (fila, columna) -> texto
+        pending = {}
+        for row_index, row in enumerate(rows):
+            cells: List[str] = []
+            column = 0
+            for text, rowspan, colspan in row:
+                while (row_index, column) in pending:
+                    cells.append(pending.pop((row_index, column)))
+                    column += 1
+                for offset in range(colspan):
+                    cells.append(text)
+                    for extra_row in range(1, rowspan):
+                        pending[(row_index + extra_row, column + offset)] = text
+                column += colspan
+            while (row_index, column) in pending:
+                cells.append(pending.pop((row_index, column)))
+                column += 1
+            grid.append(cells)
+        return grid, [len(cells) for cells in grid]
+
+    @staticmethod
+    def _coverage(text: Optional[str], cells: List[str]) -> float:
+        words = set(_WORD_PATTERN.findall((text or '').lower()))
+        if not words:
+            return 1.0
+        table_words = set(_WORD_PATTERN.findall(' '.join(cells).lower()))
+        return len(words & table_words) / len(words)
+
+    @staticmethod
+    def _to_markdown(grid: List[List[str]]) -> str:
+        def line(cells: List[str]) -> str:
+            return '| ' + ' | '.join(cell.replace('|', '\\|') for cell in cells) + ' |'
+
+        header, *body = grid
+        separator = '| ' + ' | '.join('---' for _ in header) + ' |'
+        return '\n'.join([line(header), separator, *(line(row) for row in body)])
@@ -1,18 +1,21 @@
+import atexit
 import logging
 import os
-import pickle
+import time
 
 from llama_index.core import Settings
 from llama_index.core.extractors import QuestionsAnsweredExtractor, KeywordExtractor, SummaryExtractor
-from llama_index.core.ingestion import IngestionPipeline
-from llama_index.core.node_parser import SemanticSplitterNodeParser
 
 from lib.DirectoryLoader import Unstructured_UF_Loader
 from lib.Watcher import File2NodesWatcher
-from lib.library_custom.llama_index.transformations import Unstructured_Medatata_PostProcessor
-from lib.library_custom.llama_index.transformations import Unstructured_SectionTitle_Metadata
-from lib.library_custom.llama_index.transformations import Unstructured_Filter
-from lib.library_custom.llama_index.transformations import DictionaryToMetadata
+from lib.Manifest import IngestionManifest
+from lib.Concurrency import get_governor, get_llm_guard
+from lib.Coordination import LeaseCoordinator
+from lib.Metrics import MetricsServer, get_metrics
+from lib.Cache import BlockResultCache, EmbeddingCache, ImageTranscriptionCache, LLMResponseCache, StageCheckpointStore
+from lib.Pipeline import build_transformations
+from lib.library_custom.llama_index.Embedddings import CachedEmbedding
+from lib.library_custom.llama_index.ingestion import CheckpointedIngestionPipeline
 from lib.library_custom.langchain.models import GCP_Model
 
 from config import Config
@@ -22,54 +25,107 @@ logger.propagate = True
 
 logger.info("Starting Ingestion")
 
+# Per-stage metrics: local endpoint (/metrics and /metrics.json) and a summary file per run
+if Config.metrics_port is not None:
+    MetricsServer(get_metrics(), host=Config.metrics_host, port=Config.metrics_port).start()
+atexit.register(
+    get_metrics().write_summary,
+    os.path.join(Config.metrics_dir, f"run-{time.strftime('%Y%m%d-%H%M%S')}.json")
+)
+
+# Global concurrency budgets shared by the loader, the post-processor, the LLM and the embeddings,
+# so the total work in flight stays bounded however many files are processed at once
+get_governor().configure(
+    partition=Config.partition_concurrency,
+    llm=Config.llm_concurrency,
+    embedding=Config.embedding_concurrency
+)
+# Client-side quota, backoff and circuit breaker shared by every Gemini call
+get_llm_guard().configure(
+    requests_per_minute=Config.llm_requests_per_minute,
+    tokens_per_minute=Config.llm_tokens_per_minute,
+    max_attempts=Config.llm_max_attempts,
+    failure_threshold=Config.llm_circuit_failures,
+    reset_seconds=Config.llm_circuit_reset_seconds
+)
+
 # Create a loader instance
-loader = Unstructured_UF_Loader(image_path_output=Config.images_dir)
+loader = Unstructured_UF_Loader(
+    image_path_output=Config.images_dir,
+    execution_mode=Config.loader_execution_mode,
+    max_workers=Config.loader_max_workers,
+    pages_per_shard=Config.loader_pages_per_shard,
+    partition_strategy=Config.loader_partition_strategy
+)
 logger.info("Loader created")
 
 
-# Create a GCP model instance this is an LLM for langchain
-gcp_model = GCP_Model(model_name=Config.llm.model)
+# Create a GCP model instance this is an LLM for langchain. Its responses are cached by model,
+# parameters, prompt and image, so a rerun after a crash does not pay for the same prompts again
+llm_cache = LLMResponseCache(
+    os.path.join(Config.cache_dir, 'llm_responses.sqlite'),
+    max_bytes=Config.llm_cache_max_bytes
+)
+gcp_model = GCP_Model(model_name=Config.llm.model, response_cache=llm_cache, cache_mode=Config.llm_cache_mode)
+atexit.register(lambda: logger.info(f"Caché de respuestas del LLM: {llm_cache.stats()}"))
 logger.info("GCP Model created")
 
-# Define the transformations
-transformation = [
-
-    Unstructured_Medatata_PostProcessor(
-        gcp_model=gcp_model,
-        meta_folder_path=Config.meta_dir
-    ),
-
-    Unstructured_SectionTitle_Metadata(),
-
-    Unstructured_Filter(filter_block_type=["UncategorizedText"]),
-
-    DictionaryToMetadata(meta_folder_path=Config.meta_dir),
-
-    SemanticSplitterNodeParser( # Tenemos que separar las tablas
-        buffer_size=1,
-        embed_model=Config.embed_model,
-        include_metadata=True,
-        include_prev_next_rel=True
-    ),
-
-    # SummaryExtractor(llm=Config.llm), # No funciona
-
-    # KeywordExtractor(), # No funciona
-
-    # QuestionsAnsweredExtractor(questions=3), # No funciona
+# Persistent caches so that re-ingesting a modified file only repeats the LLM and
+# embedding work of the blocks that changed
+block_cache = BlockResultCache(os.path.join(Config.cache_dir, 'blocks.sqlite'))
+# Transcriptions of Image/Table crops, reused for identical or near-identical crops of any file
+image_cache = ImageTranscriptionCache(os.path.join(Config.cache_dir, 'images.sqlite'))
+embed_model = CachedEmbedding(
+    embed_model=Config.embed_model,
+    cache=EmbeddingCache(os.path.join(Config.cache_dir, 'embeddings.sqlite'))
+)
 
-    Config.embed_model
-]
+# Define the transformations
+transformation = build_transformations(
+    gcp_model=gcp_model,
+    embed_model=embed_model,
+    meta_folder_path=Config.meta_dir,
+    block_cache=block_cache,
+    image_cache=image_cache,
+    context_window=Config.postprocessor_context_window,
+    batch_size=Config.postprocessor_batch_size,
+    max_batch_tokens=Config.postprocessor_max_batch_tokens,
+    rule_confidence=Config.postprocessor_rule_confidence,
+    table_quality_threshold=Config.postprocessor_table_quality,
+    async_concurrency=Config.postprocessor_async_concurrency
+)
 
-# Create a pipeline instance
-pipeline = IngestionPipeline(transformations=transformation)
+# Create a pipeline instance that checkpoints the output of every stage, so a rerun
+# resumes from the last completed stage
+pipeline = CheckpointedIngestionPipeline(
+    transformations=transformation,
+    checkpoint_store=StageCheckpointStore(os.path.join(Config.cache_dir, 'checkpoints.sqlite'))
+)
+pipeline.invalidate_changed_stages()
+
+# Distributed mode: every node leases the files it processes from a coordinator in the shared
+# base directory, heartbeats while it works and releases its leases on exit
+coordinator = None
+if Config.distributed:
+    coordinator = LeaseCoordinator(
+        Config.leases_path,
+        lease_seconds=Config.lease_seconds,
+        max_attempts=Config.lease_max_attempts,
+        failed_retry_seconds=Config.lease_failed_retry_seconds
+    )
+    atexit.register(coordinator.close)
 
 # Create a watcher instance
 watcher = File2NodesWatcher(
     watch_directory=Config.source_dir,
     nodes_output_directory=Config.out_dir,
     file_reader=loader,
-    ingestion_pipeline=pipeline
+    ingestion_pipeline=pipeline,
+    manifest=IngestionManifest(Config.manifest_path, pipeline_version=Config.pipeline_version),
+    queue_path=Config.queue_path,
+    tombstones_path=Config.tombstones_path,
+    num_workers=Config.num_workers,
+    coordinator=coordinator
 )
 # watcher.start_watch()
 
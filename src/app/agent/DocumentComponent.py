@@ -10,6 +10,11 @@ from llama_index.core.base.base_query_engine import BaseQueryEngine
 from llama_index.core.schema import BaseNode, Document
 from llama_index.core.tools import QueryEngineTool, ToolMetadata
 
+try:
+    from lib.NodeStore import NodeStore
+except ModuleNotFoundError:
+    from ..lib.NodeStore import NodeStore
+
 logger = logging.getLogger(__name__)
 logger.propagate = True
 
@@ -43,7 +48,7 @@ class DocumentComponent:
                  ):
         """
         Inicializa un nuevo DocumentComponent.
-        :param pkl_path:
+        :param pkl_path: Ruta del almacén de nodos (directorio ``.nodes``) o de un archivo .pkl antiguo.
         :param verbose:
         """
         self.verbose = verbose
@@ -184,6 +189,28 @@ class DocumentComponent:
 
     # ---- Cargo los nodos ----
     def _load_nodes(self, pkl_path: str):
+        """Carga la lista de nodos desde un almacén de nodos o desde un archivo .pkl antiguo."""
+        if NodeStore.is_node_store(pkl_path):
+            nodes = self._load_nodes_from_store(pkl_path)
+        else:
+            nodes = self._load_nodes_from_pkl(pkl_path)
+        if self.verbose:
+            logger.info(f"Cargados {len(nodes)} nodos desde {pkl_path}")
+        # Validar que si los elementos de la lista cargada son de tipo Document, se transformen a TextNode
+        documents = [node for node in nodes if isinstance(node, Document)]
+        other_nodes = [node for node in nodes if not isinstance(node, Document)]
+        new_nodes = Settings.text_splitter(documents)
+        all_nodes = new_nodes + other_nodes
+        if self.verbose and len(documents) > 0:
+            logger.info(f"Transformados {len(documents)} nodos Document a TextNode")
+        return all_nodes
+
+    def _load_nodes_from_store(self, store_path: str) -> List[BaseNode]:
+        """Carga los nodos desde un almacén de nodos (JSONL + embeddings float32)."""
+        with NodeStore(store_path) as store:
+            return list(store.iter_nodes())
+
+    def _load_nodes_from_pkl(self, pkl_path: str) -> List[BaseNode]:
         """Carga la lista de nodos desde el archivo .pkl."""
         try:
             with open(pkl_path, 'rb') as file:
@@ -191,19 +218,10 @@ class DocumentComponent:
                 if not isinstance(nodes, list) or not all(isinstance(node, BaseNode) for node in nodes):
                     logger.error("El archivo .pkl debe contener una lista de objetos BaseNode o sus herederos.")
                     raise ValueError("El archivo .pkl debe contener una lista de objetos BaseNode o sus herederos.")
-                if self.verbose:
-                    logger.info(f"Cargados {len(nodes)} nodos desde {pkl_path}")
-                # Validar que si los elementos de la lista cargada son de tipo Document, se transformen a TextNode
-                documents = [node for node in nodes if isinstance(node, Document)]
-                other_nodes = [node for node in nodes if not isinstance(node, Document)]
-                new_nodes = Settings.text_splitter(documents)
-                all_nodes = new_nodes + other_nodes
-                if self.verbose and len(documents) > 0:
-                    logger.info(f"Transformados {len(documents)} nodos Document a TextNode")
-                return all_nodes
+                return nodes
         except FileNotFoundError:
             logger.error(f"No se encontró el archivo {pkl_path}")
             raise FileNotFoundError(f"No se encontró el archivo {pkl_path}")
         except pickle.PickleError as e:
             logger.error(f"Error al cargar el archivo .pkl: {e}")
-            raise RuntimeError(f"Error al cargar el archivo .pkl: {e}")
\ No newline at end of file
+            raise RuntimeError(f"Error al cargar el archivo .pkl: {e}")
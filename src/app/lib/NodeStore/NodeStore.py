@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+
+logger = logging.getLogger(__name__)
+logger.propagate = True
+
+NODES_FILE_NAME = 'nodes.jsonl'
+OFFSETS_FILE_NAME = 'offsets.npy'
+EMBEDDINGS_FILE_NAME = 'embeddings.npy'
+NODE_STORE_SUFFIX = '.nodes'
+
+# Tamaño fijo de la cabecera .npy: permite reescribir el número de filas tras cada lote
+_NPY_HEADER_SIZE = 128
+
+
+def _json_default(value: Any) -> Any:
+    """Convierte los tipos de numpy que llegan en la metadata desde los DataFrames."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class _AppendableNpy:
+    """
+    Archivo ``.npy`` al que se le pueden añadir filas. La cabecera ocupa siempre
+    ``_NPY_HEADER_SIZE`` bytes y se reescribe con el número de filas en cada ``flush``,
+    de modo que el archivo es legible (y mapeable en memoria) en todo momento.
+    """
+
+    def __init__(self, path: str, dtype: np.dtype, row_shape: Tuple[int, ...] = ()):
+        self._dtype = np.dtype(dtype)
+        self._row_shape = tuple(row_shape)
+        self._rows = 0
+        self._file = open(path, 'wb')
+        self._file.write(self._header())
+
+    @property
+    def rows(self) -> int:
+        return self._rows
+
+    def append(self, array: np.ndarray):
+        array = np.ascontiguousarray(array, dtype=self._dtype).reshape((-1,) + self._row_shape)
+        self._file.write(array.tobytes())
+        self._rows += array.shape[0]
+
+    def flush(self):
+        self._file.flush()
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.seek(position)
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def _header(self) -> bytes:
+        header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+            self._dtype.str, (self._rows,) + self._row_shape
+        )
+        header = header.ljust(_NPY_HEADER_SIZE - 10 - 1) + '\n'
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+class NodeStoreWriter:
+    """
+    Escribe nodos de Llama-Index en un almacén de nodos por lotes, a medida que se generan.
+
+    El almacén es un directorio con:
+        - ``nodes.jsonl``: un nodo por línea (texto, metadata y relaciones, sin el embedding).
+        - ``offsets.npy``: posición en bytes de cada línea, para leer nodos sueltos.
+        - ``embeddings.npy``: matriz float32 contigua con los embeddings, mapeable en memoria.
+
+    Mientras se escribe, el almacén vive en ``<path>.partial`` y solo se mueve a ``path``
+    en ``close``, por lo que un lector nunca ve un almacén a medio escribir.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Directorio de destino del almacén.
+        """
+        self._path = path
+        self._partial_path = f'{path}.partial'
+        if os.path.exists(self._partial_path):
+            shutil.rmtree(self._partial_path)
+        os.makedirs(self._partial_path)
+
+        self._nodes_file = open(os.path.join(self._partial_path, NODES_FILE_NAME), 'wb')
+        self._offsets = _AppendableNpy(os.path.join(self._partial_path, OFFSETS_FILE_NAME), np.uint64)
+        self._offsets.append(np.zeros(1, dtype=np.uint64))
+        self._embeddings: Optional[_AppendableNpy] = None
+        self._count = 0
+        self._closed = False
+
+    @property
+    def path(self) -> str:
+        """Get the final path of the store."""
+        return self._path
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, nodes: Sequence[BaseNode]):
+        """
+        Añade un lote de nodos y lo deja persistido en disco.
+
+        :param nodes:
+        """
+        lines = []
+        ends = []
+        embeddings = []
+        position = self._nodes_file.tell()
+        for node in nodes:
+            record = doc_to_json(node)
+            record['__data__'].pop('embedding', None)
+            record['embedding_row'] = None
+            if node.embedding is not None:
+                record['embedding_row'] = (self._embeddings.rows if self._embeddings else 0) + len(embeddings)
+                embeddings.append(node.embedding)
+            line = json.dumps(record, ensure_ascii=False, default=_json_default).encode('utf-8') + b'\n'
+            position += len(line)
+            lines.append(line)
+            ends.append(position)
+
+        if embeddings:
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            if self._embeddings is None:
+                self._embeddings = _AppendableNpy(
+                    os.path.join(self._partial_path, EMBEDDINGS_FILE_NAME), np.float32, (matrix.shape[1],)
+                )
+            self._embeddings.append(matrix)
+            self._embeddings.flush()
+
+        self._nodes_file.write(b''.join(lines))
+        self._nodes_file.flush()
+        self._offsets.append(np.asarray(ends, dtype=np.uint64))
+        self._offsets.flush()
+        self._count += len(lines)
+
+    def close(self):
+        """Cierra los archivos y publica el almacén en su ruta final."""
+        if self._closed:
+            return
+        self._nodes_file.close()
+        self._offsets.close()
+        if self._embeddings is not None:
+            self._embeddings.close()
+        if os.path.exists(self._path):
+            shutil.rmtree(self._path)
+        os.replace(self._partial_path, self._path)
+        self._closed = True
+        logger.info(f'Almacén de nodos escrito en {self._path}: {self._count} nodos')
+
+    def abort(self):
+        """Descarta el almacén a medio escribir."""
+        if self._closed:
+            return
+        self._nodes_file.close()
+        self._offsets.close()
+        if self._embeddings is not None:
+            self._embeddings.close()
+        shutil.rmtree(self._partial_path, ignore_errors=True)
+        self._closed = True
+
+    def __enter__(self) -> 'NodeStoreWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class NodeStore:
+    """
+    Lector de un almacén de nodos escrito con ``NodeStoreWriter``.
+
+    Abrirlo solo mapea en memoria los offsets y los embeddings; los nodos se leen
+    y se construyen bajo demanda, uno a uno o por rangos.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Directorio del almacén.
+        """
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"No se encontró el almacén de nodos {path}")
+        self._path = path
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE_NAME), mmap_mode='r')
+        embeddings_path = os.path.join(path, EMBEDDINGS_FILE_NAME)
+        self._embeddings = np.load(embeddings_path, mmap_mode='r') if os.path.exists(embeddings_path) else None
+        self._nodes_file = open(os.path.join(path, NODES_FILE_NAME), 'rb')
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_node_store(path: str) -> bool:
+        """Indica si la ruta es un almacén de nodos."""
+        return os.path.isfile(os.path.join(path, OFFSETS_FILE_NAME))
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> BaseNode:
+        return self.get_node(index)
+
+    def __iter__(self) -> Iterator[BaseNode]:
+        return self.iter_nodes()
+
+    # ---- Embeddings ----
+    @property
+    def embeddings(self) -> Optional[np.ndarray]:
+        """Matriz float32 (mapeada en memoria) con los embeddings, o ``None`` si no hay."""
+        return self._embeddings
+
+    def get_record(self, index: int) -> Dict[str, Any]:
+        """Devuelve el registro JSON crudo de un nodo sin construir el objeto."""
+        return self.get_records(index, index + 1)[0]
+
+    def get_records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Devuelve los registros JSON crudos de un rango de nodos con una sola lectura."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+        begin, end = int(self._offsets[start]), int(self._offsets[stop])
+        with self._lock:
+            self._nodes_file.seek(begin)
+            data = self._nodes_file.read(end - begin)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def node_ids(self) -> List[str]:
+        """Devuelve los ids de todos los nodos sin construirlos."""
+        node_ids = []
+        for batch_start in range(0, len(self), 10000):
+            node_ids.extend(record['__data__']['id_'] for record in self.get_records(batch_start, batch_start + 10000))
+        return node_ids
+
+    def get_node(self, index: int) -> BaseNode:
+        """Construye el nodo en la posición indicada, con su embedding."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Índice fuera de rango: {index}")
+        return self._record_to_node(self.get_record(index))
+
+    def iter_nodes(self, start: int = 0, stop: Optional[int] = None, batch_size: int = 1000) -> Iterator[BaseNode]:
+        """Itera los nodos de un rango leyendo el archivo por lotes."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for batch_start in range(start, stop, batch_size):
+            for record in self.get_records(batch_start, min(batch_start + batch_size, stop)):
+                yield self._record_to_node(record)
+
+    def close(self):
+        """Cierra el archivo de nodos."""
+        self._nodes_file.close()
+
+    def __enter__(self) -> 'NodeStore':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    ########################################################
+
+    def _record_to_node(self, record: Dict[str, Any]) -> BaseNode:
+        node = json_to_doc(record)
+        row = record.get('embedding_row')
+        if row is not None and self._embeddings is not None:
+            node.embedding = self._embeddings[row].tolist()
+        return node
@@ -0,0 +1 @@
+from .NodeStore import NodeStore, NodeStoreWriter, NODE_STORE_SUFFIX
\ No newline at end of file